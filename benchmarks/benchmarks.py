@@ -0,0 +1,170 @@
+'''
+Benchmarks for matrix assembly, RHS formation and solves
+
+Times the hot paths of em_casing over problem sizes and records
+wall time and peak memory (numpy allocations, via tracemalloc).
+
+Usage:
+    python benchmarks/benchmarks.py            full sweep
+    python benchmarks/benchmarks.py --quick    small sizes only
+    python benchmarks/benchmarks.py --output bench_output.txt
+
+Runs offline; wire_e_field_casing_halfspace is skipped if empymod is not installed.
+'''
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from em_casing import halfspace as chs
+
+casing_length = 1365
+wire_path_x = np.array([-500.,0,800])
+wire_path_y = np.array([200.,250,300])
+
+def measure(function,repeat=1):
+    '''
+    Run function repeat times
+    halfspace.kernel_memo and scalar_kernel_memo are disabled (and emptied) meanwhile,
+    so that every run, and every row of a sweep, times the computation rather than memo hits
+    Returns (best wall time in s, peak traced memory in bytes)
+    '''
+    memos = [chs.kernel_memo,chs.scalar_kernel_memo]
+    maxsizes = [memo.maxsize for memo in memos]
+    for memo in memos:
+        memo.resize(0)
+    times = []
+    tracemalloc.start()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter()-start)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        for (memo,maxsize) in zip(memos,maxsizes):
+            memo.resize(maxsize)
+    return (min(times),peak)
+
+def pad_locations(num_casings,spacing=20):
+    '''
+    x and y locations of num_casings wells on a pad, in rows of 5
+    '''
+    index = np.arange(num_casings)
+    return (list(spacing*(index%5)),list(spacing*(index//5)))
+
+def bench_hankel_J1_201(sizes):
+    funii = lambda x:chs.fii(x,5,5,0.125,0.18)
+    for num_radii in sizes['num_segments']:
+        radii = np.linspace(0.09,0.11,num_radii)
+        def run():
+            for r in radii:
+                chs.hankel_J1_201(funii,r)
+        yield ({'num_radii':num_radii},run)
+
+def bench_form_gamma_casing(sizes):
+    for num_segments in sizes['num_segments']:
+        yield ({'num_segments':num_segments},
+               lambda:chs.form_gamma_casing(casing_length=casing_length,num_segments=num_segments))
+
+def bench_form_gamma_casing_to_casing(sizes):
+    for num_segments in sizes['num_segments']:
+        yield ({'num_segments':num_segments},
+               lambda:chs.form_gamma_casing_to_casing(0,0,casing_length,num_segments,
+                                                      20,0,casing_length,num_segments))
+
+def bench_form_A_many_casings(sizes):
+    num_segments = sizes['num_segments_many']
+    for num_casings in sizes['num_casings']:
+        xs, ys = pad_locations(num_casings)
+        yield ({'num_casings':num_casings,'num_segments':num_segments},
+               lambda:chs.form_A_many_casings(xs,ys,casing_lengths=casing_length,
+                                              nums_segments=num_segments))
+
+def bench_form_b_many_casings(sizes):
+    num_segments = sizes['num_segments_many']
+    for num_casings in sizes['num_casings']:
+        xs, ys = pad_locations(num_casings)
+        yield ({'num_casings':num_casings,'num_segments':num_segments},
+               lambda:chs.form_b_many_casings(wire_path_x,wire_path_y,xs,ys,
+                                              casing_lengths=casing_length,
+                                              nums_segments=num_segments))
+
+def bench_casing_currents_sweep(sizes):
+    for num_frequencies in sizes['num_frequencies']:
+        frequencies = np.logspace(-2,3,num_frequencies)
+        yield ({'num_frequencies':num_frequencies,'num_segments':280},
+               lambda:chs.casing_currents_sweep(wire_path_x,wire_path_y,frequencies,
+                                                casing_length=casing_length,num_segments=280))
+
+def bench_wire_e_field_casing_halfspace(sizes):
+    try:
+        from em_casing import halfspace_empymod as che
+    except ImportError:
+        return
+    rx = np.linspace(50,2000,100)
+    ry = np.zeros(100)
+    rx_ex_locations = [rx-5,rx+5,ry,ry,1e-3,1e-3]
+    rx_ey_locations = [rx,rx,ry-5,ry+5,1e-3,1e-3]
+    for num_segments in sizes['num_segments']:
+        for num_frequencies in sizes['num_frequencies']:
+            frequencies = np.logspace(-2,3,num_frequencies)
+            def run():
+                for frequency in frequencies:
+                    che.wire_e_field_casing_halfspace(wire_path_x,wire_path_y,
+                                                      rx_ex_locations,rx_ey_locations,
+                                                      frequency,
+                                                      casing_length=casing_length,
+                                                      num_segments=num_segments)
+            yield ({'num_segments':num_segments,'num_frequencies':num_frequencies},run)
+
+benchmarks = [bench_hankel_J1_201,
+              bench_form_gamma_casing,
+              bench_form_gamma_casing_to_casing,
+              bench_form_A_many_casings,
+              bench_form_b_many_casings,
+              bench_casing_currents_sweep,
+              bench_wire_e_field_casing_halfspace]
+
+full_sizes = {'num_segments':[50,100,280,500,1000,2000],
+              'num_segments_many':100,
+              'num_casings':[1,2,5,10,20],
+              'num_frequencies':[1,10,30,60]}
+quick_sizes = {'num_segments':[50,280],
+               'num_segments_many':50,
+               'num_casings':[1,5],
+               'num_frequencies':[1,10]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quick',action='store_true',help='small sizes only')
+    parser.add_argument('--repeat',type=int,default=1,help='report best of this many runs')
+    parser.add_argument('--only',default='',help='only run benchmarks whose name contains this')
+    parser.add_argument('--output',default=None,help='also write results to this file')
+    args = parser.parse_args()
+    sizes = quick_sizes if args.quick else full_sizes
+
+    lines = ['{:<36} {:<40} {:>12} {:>14}'.format('benchmark','parameters','time (s)','peak mem (MB)')]
+    print(lines[0])
+    for benchmark in benchmarks:
+        name = benchmark.__name__[len('bench_'):]
+        if not args.only in name:
+            continue
+        for (parameters,run) in benchmark(sizes):
+            wall_time, peak = measure(run,repeat=args.repeat)
+            parameter_string = ' '.join('{}={}'.format(k,v) for k, v in parameters.items())
+            line = '{:<36} {:<40} {:>12.4f} {:>14.1f}'.format(name,parameter_string,wall_time,peak/2**20)
+            print(line,flush=True)
+            lines.append(line)
+    if args.output is not None:
+        with open(args.output,'w') as f:
+            f.write('\n'.join(lines)+'\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+'''
+Caches for casing interaction matrices
+
+classes:
+
+MatrixCache
+KernelMemo
+'''
+
+import functools
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+def _jsonable(value):
+    '''
+    Convert numpy scalars and arrays to python floats and lists, for hashing
+    Floats are kept at full precision by json
+    '''
+    if isinstance(value,(np.ndarray,np.generic)):
+        return value.tolist()
+    if isinstance(value,(list,tuple)):
+        return [_jsonable(v) for v in value]
+    return value
+
+class MatrixCache:
+    '''
+    Persistent, content-addressed cache of matrices on disk
+
+    Each matrix is stored as a .npy file in directory, named by a sha256 hash of
+    the physical parameters that produced it (see key).
+    Loading a file marks it as recently used; when the total size of the cache
+    exceeds max_bytes, least recently used files are deleted.
+
+    A MatrixCache can be passed as cache= to halfspace.form_gamma_casing, form_A,
+    form_gamma_casing_to_casing and form_A_many_casings.
+    It only holds its directory and settings, so it can be sent to worker processes.
+    '''
+    def __init__(self,directory,max_bytes=2**30,mmap_mode=None):
+        '''
+        directory: where to store .npy files, created if needed
+        max_bytes: size cap of all .npy files in directory
+        mmap_mode: passed to np.load; None (default) loads writable copies into memory,
+            like the arrays returned when a matrix is computed; 'r' returns read-only
+            np.memmap arrays, which avoids reading large matrices that are only
+            partly used, but must be copied (np.array) before being modified
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        os.makedirs(directory,exist_ok=True)
+
+    def key(self,**parameters):
+        '''
+        Hash of parameters, which must be json-serializable after
+        converting numpy scalars and arrays to lists
+        '''
+        import hashlib
+        import json
+        parameters = {name:_jsonable(value) for name, value in parameters.items()}
+        serialized = json.dumps(parameters,sort_keys=True)
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def _path(self,key):
+        return os.path.join(self.directory,key+'.npy')
+
+    def load(self,key):
+        '''
+        Return matrix stored under key, or None if it is not in the cache
+        '''
+        path = self._path(key)
+        try:
+            matrix = np.load(path,mmap_mode=self.mmap_mode)
+        except FileNotFoundError:
+            return None
+        # mark as recently used
+        os.utime(path)
+        return matrix
+
+    def save(self,key,matrix):
+        '''
+        Store matrix under key, then evict least recently used files if over max_bytes
+        '''
+        path = self._path(key)
+        # write to a temporary file and rename, so readers never see partial files
+        temporary_path = path+'.{}.tmp'.format(os.getpid())
+        with open(temporary_path,'wb') as f:
+            np.save(f,matrix)
+        os.replace(temporary_path,path)
+        self.evict()
+
+    def get(self,function,**parameters):
+        '''
+        Return matrix for parameters from the cache,
+        or compute it as function(**parameters) and store it
+        function.__name__ is part of the key
+        '''
+        key = self.key(function=function.__name__,**parameters)
+        matrix = self.load(key)
+        if matrix is None:
+            matrix = function(**parameters)
+            self.save(key,matrix)
+        return matrix
+
+    def files(self):
+        '''
+        List of (path, size in bytes, last use time) of all cached matrices,
+        least recently used first
+        '''
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                path = os.path.join(self.directory,name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((path,stat.st_size,stat.st_mtime))
+        return sorted(files,key=lambda f:f[2])
+
+    def size(self):
+        '''
+        Total size of cached matrices in bytes
+        '''
+        return sum(f[1] for f in self.files())
+
+    def evict(self):
+        '''
+        Delete least recently used matrices until total size is at most max_bytes
+        '''
+        files = self.files()
+        total = sum(f[1] for f in files)
+        for (path,size,last_use) in files:
+            if total<=self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        '''
+        Delete all cached matrices
+        '''
+        for (path,size,last_use) in self.files():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class KernelMemo:
+    '''
+    Bounded in-memory memoization of scalar kernel evaluations, with LRU eviction
+
+    Use as a decorator, or with key, get and put directly for kernels computed in batches.
+    Calls are keyed on the function and its arguments,
+    with floats and complex numbers quantized to digits significant digits,
+    so physically identical evaluations hit even after round-off.
+    Calls with array arguments are not memoized.
+    At most maxsize results are kept; the least recently used is evicted first.
+    maxsize=0 disables memoization.
+
+    hits and misses count memoized calls; info() summarizes them
+    '''
+    def __init__(self,maxsize=10000,digits=12):
+        self.maxsize = maxsize
+        self.digits = digits
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _quantize(self,value):
+        if isinstance(value,(float,np.floating)):
+            return float('{:.{}g}'.format(value,self.digits))
+        if isinstance(value,(complex,np.complexfloating)):
+            return (self._quantize(value.real),self._quantize(value.imag))
+        if isinstance(value,np.ndarray):
+            # not hashable
+            raise TypeError
+        hash(value)
+        return value
+
+    def key(self,name,*args,**kwargs):
+        '''
+        Key of a call to name with args and kwargs, quantized as described above
+        Raises TypeError for unhashable (e.g. array) arguments
+        '''
+        return (name,
+                tuple(self._quantize(a) for a in args),
+                tuple(sorted((k,self._quantize(v)) for k, v in kwargs.items())))
+
+    def get(self,key):
+        '''
+        Result stored under key, counted as a hit, or None
+        '''
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                self._results.move_to_end(key)
+                return self._results[key]
+        return None
+
+    def put(self,key,result):
+        '''
+        Store result under key, counted as a miss, evicting least recently used entries
+        '''
+        if self.maxsize<=0:
+            return
+        with self._lock:
+            self.misses += 1
+            self._results[key] = result
+            while len(self._results)>self.maxsize:
+                self._results.popitem(last=False)
+
+    def __call__(self,function):
+        @functools.wraps(function)
+        def memoized(*args,**kwargs):
+            if self.maxsize<=0:
+                return function(*args,**kwargs)
+            try:
+                key = self.key(function.__name__,*args,**kwargs)
+            except TypeError:
+                return function(*args,**kwargs)
+            result = self.get(key)
+            if result is None:
+                result = function(*args,**kwargs)
+                self.put(key,result)
+            return result
+        return memoized
+
+    def resize(self,maxsize):
+        '''
+        Change maximum number of entries, evicting least recently used entries if needed
+        '''
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._results)>max(maxsize,0):
+                self._results.popitem(last=False)
+
+    def clear(self):
+        '''
+        Forget all results and reset hit and miss counters
+        '''
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        '''
+        Dictionary of hits, misses, current size and maxsize
+        '''
+        return {'hits':self.hits,
+                'misses':self.misses,
+                'size':len(self._results),
+                'maxsize':self.maxsize}
@@ -0,0 +1,256 @@
+'''
+Low-rank compression of the coefficient matrix for many casings
+
+Inter-casing blocks of A (see halfspace.form_A_many_casings) are smooth functions
+of segment depths, so blocks between casings that are not very close are
+numerically low-rank. They are compressed with adaptive cross approximation (ACA),
+which samples only selected rows and columns of the block,
+and stored as factors U, V with block ~= U.dot(V).
+Blocks that do not compress are stored dense, as are the diagonal blocks.
+
+The compressed matrix is never formed; CompressedCasingOperator.matvec
+costs O(sum of block ranks * segments), and aslinearoperator returns a
+scipy LinearOperator for iterative solvers (see solvers).
+
+functions:
+
+aca
+form_A_many_casings_compressed
+
+classes:
+
+CompressedCasingOperator
+
+Uses e^(iwt) time dependence, like halfspace.form_A_many_casings
+'''
+
+import numpy as np
+from .halfspace import (form_gamma_casing_to_casing, _many_casings_arguments,
+                        _diagonal_block, _casing_to_casing_blocks)
+from . import profiling
+
+def aca(get_row,get_column,shape,rtol=1e-6,max_rank=None):
+    '''
+    Adaptive cross approximation with partial pivoting, followed by SVD recompression
+    get_row(i) and get_column(j) return row i and column j of the matrix, of the given shape
+    Stops when the norm of the latest cross is below rtol times the estimated
+    Frobenius norm of the approximation, or at max_rank (default min(shape))
+    Returns (U, V), of shapes (shape[0], rank) and (rank, shape[1])
+    '''
+    m, n = shape
+    if max_rank is None:
+        max_rank = min(m,n)
+    us = []
+    vs = []
+    used_rows = np.zeros(m,dtype=bool)
+    i = 0
+    norm_squared = 0.0
+    while len(us)<max_rank:
+        used_rows[i] = True
+        # residual row
+        row = np.array(get_row(i),dtype=complex)
+        for (u,v) in zip(us,vs):
+            row -= u[i]*v
+        j = np.argmax(abs(row))
+        if row[j]==0:
+            # row is already approximated exactly, try another
+            if np.all(used_rows):
+                break
+            i = np.argmin(used_rows)
+            continue
+        v = row/row[j]
+        # residual column
+        u = np.array(get_column(j),dtype=complex)
+        for (u_previous,v_previous) in zip(us,vs):
+            u -= v_previous[j]*u_previous
+        # update Frobenius norm of the approximation
+        for (u_previous,v_previous) in zip(us,vs):
+            norm_squared += 2*np.real(np.vdot(u_previous,u)*np.vdot(v_previous,v))
+        cross_norm = np.linalg.norm(u)*np.linalg.norm(v)
+        norm_squared += cross_norm**2
+        us.append(u)
+        vs.append(v)
+        if cross_norm<=rtol*np.sqrt(norm_squared) or np.all(used_rows):
+            break
+        # next row: largest entry of the new column among unused rows
+        i = np.argmax(np.where(used_rows,-1,abs(u)))
+    if not us:
+        return (np.zeros((m,0),dtype=complex),np.zeros((0,n),dtype=complex))
+    U = np.array(us).T
+    V = np.array(vs)
+    # recompress: U V = Qu Ru Rv^T Qv^T, truncate the SVD of Ru Rv^T
+    Qu, Ru = np.linalg.qr(U)
+    Qv, Rv = np.linalg.qr(V.T)
+    W, sigma, Zh = np.linalg.svd(Ru.dot(Rv.T))
+    rank = max(1,np.count_nonzero(sigma>rtol*sigma[0]))
+    U = Qu.dot(W[:,:rank]*sigma[:rank])
+    V = Zh[:rank].dot(Qv.T)
+    return (U,V)
+
+class CompressedCasingOperator:
+    '''
+    Coefficient matrix for many casings, as dense diagonal blocks
+    and low-rank or dense inter-casing blocks
+
+    Attributes:
+        shape: shape of the full matrix
+        casing_blocks: slice of rows and columns of each casing
+        diagonal_blocks: dense intra-casing blocks, one per casing
+        blocks: list of (rows, columns, U, V) inter-casing blocks, equal to U.dot(V),
+            or (rows, columns, block, None) for blocks stored dense
+    '''
+    def __init__(self,casing_blocks,diagonal_blocks,blocks):
+        self.casing_blocks = casing_blocks
+        self.diagonal_blocks = diagonal_blocks
+        self.blocks = blocks
+        total_segments = casing_blocks[-1].stop
+        self.shape = (total_segments,total_segments)
+        self.dtype = np.dtype(complex)
+
+    @profiling.timed('CompressedCasingOperator.matvec')
+    def matvec(self,x):
+        '''
+        A.dot(x), for x of shape (N,) or (N, k)
+        '''
+        y = np.zeros(x.shape,dtype=complex)
+        for (block,A_block) in zip(self.casing_blocks,self.diagonal_blocks):
+            y[block] += A_block.dot(x[block])
+        for (rows,columns,U,V) in self.blocks:
+            if V is None:
+                y[rows] += U.dot(x[columns])
+            else:
+                y[rows] += U.dot(V.dot(x[columns]))
+        return y
+
+    def aslinearoperator(self):
+        '''
+        scipy.sparse.linalg.LinearOperator with matvec and matmat
+        '''
+        from scipy.sparse.linalg import LinearOperator
+        return LinearOperator(self.shape,matvec=self.matvec,matmat=self.matvec,dtype=complex)
+
+    def todense(self):
+        '''
+        Full matrix, e.g. to check against halfspace.form_A_many_casings
+        '''
+        A_full = np.zeros(self.shape,dtype=complex)
+        for (block,A_block) in zip(self.casing_blocks,self.diagonal_blocks):
+            A_full[block,block] = A_block
+        for (rows,columns,U,V) in self.blocks:
+            A_full[rows,columns] = U if V is None else U.dot(V)
+        return A_full
+
+    def ranks(self):
+        '''
+        Rank of each inter-casing block, None for blocks stored dense
+        '''
+        return [None if V is None else V.shape[0] for (rows,columns,U,V) in self.blocks]
+
+    def nbytes(self):
+        '''
+        Memory used by all blocks, counting shared diagonal blocks once
+        '''
+        arrays = {id(A_block):A_block for A_block in self.diagonal_blocks}
+        for (rows,columns,U,V) in self.blocks:
+            arrays[id(U)] = U
+            if V is not None:
+                arrays[id(V)] = V
+        return sum(array.nbytes for array in arrays.values())
+
+def _compress_block(block_args,rtol,max_rank):
+    '''
+    ACA of the A block(s) (-Gamma) from form_gamma_casing_to_casing with block_args
+    Returns a list of (U, V) for G12 and, with both_interactions, G21;
+    V is None for blocks that do not compress and are returned dense as U
+    '''
+    block_args = dict(block_args)
+    both_interactions = block_args.pop('both_interactions',False)
+    block_args.pop('cache',None)
+    shape = (block_args['num_segments_1'],block_args['num_segments_2'])
+
+    def compress(block_args,shape):
+        def get_row(i):
+            return -form_gamma_casing_to_casing(rows=[i],**block_args)[0]
+        def get_column(j):
+            return -form_gamma_casing_to_casing(columns=[j],**block_args)[:,0]
+        if max_rank is None:
+            # low rank only pays off below this rank
+            block_max_rank = max(1,shape[0]*shape[1]//(shape[0]+shape[1]))
+        else:
+            block_max_rank = max_rank
+        U, V = aca(get_row,get_column,shape,rtol=rtol,max_rank=block_max_rank)
+        if U.shape[1]>=block_max_rank:
+            return (-form_gamma_casing_to_casing(**block_args),None)
+        return (U,V)
+
+    factors = [compress(block_args,shape)]
+    if both_interactions:
+        # G21 is G12 with the casings swapped
+        swapped_args = {}
+        for key, value in block_args.items():
+            if key[-1]=='1':
+                swapped_args[key[:-1]+'2'] = value
+            elif key[-1]=='2':
+                swapped_args[key[:-1]+'1'] = value
+            else:
+                swapped_args[key] = value
+        factors.append(compress(swapped_args,shape[::-1]))
+    return factors
+
+@profiling.timed('form_A_many_casings_compressed')
+def form_A_many_casings_compressed(xs,
+                                   ys,
+                                   frequency=0.125,
+                                   background_conductivities=0.18,
+                                   casing_lengths=1365,
+                                   nums_segments=280,
+                                   casing_conductivities=1.0e7,
+                                   outer_radii=0.1095,
+                                   inner_radii=0.1095-0.0134,
+                                   rtol=1e-8,
+                                   max_rank=None,
+                                   **kwargs):
+    '''
+    Coefficient matrix for many casings as a CompressedCasingOperator
+    Arguments are as in halfspace.form_A_many_casings
+    Follows Tang et al., 2015
+    Uses e^(iwt) time dependence
+
+    Inter-casing blocks are compressed with aca to relative accuracy rtol,
+    and stored dense if their rank reaches max_rank (by default, the rank
+    above which factors take more memory than the dense block).
+    Blocks related by symmetry share factors, as in form_A_many_casings.
+
+    kwargs are passed to form_A and form_gamma_casing_to_casing
+    '''
+    casings = _many_casings_arguments(xs,
+                                      ys,
+                                      background_conductivities=background_conductivities,
+                                      casing_lengths=casing_lengths,
+                                      nums_segments=nums_segments,
+                                      casing_conductivities=casing_conductivities,
+                                      outer_radii=outer_radii,
+                                      inner_radii=inner_radii)
+    offsets = np.concatenate([[0],np.cumsum([casing[4] for casing in casings])]).astype(int)
+    casing_blocks = [slice(offsets[i],offsets[i+1]) for i in range(len(casings))]
+
+    diagonal_cache = {}
+    diagonal_blocks = [_diagonal_block(casing,frequency,diagonal_cache,**kwargs)
+                       for casing in casings]
+
+    block_list, transposes = _casing_to_casing_blocks(casings,casing_blocks,frequency,**kwargs)
+    blocks = []
+    computed = {}
+    for (rows,columns,block_args) in block_list:
+        factors = _compress_block(block_args,rtol,max_rank)
+        blocks.append((rows,columns)+factors[0])
+        computed[(rows.start,columns.start)] = factors[0]
+        if len(factors)>1:
+            blocks.append((columns,rows)+factors[1])
+    for (rows,columns,scale) in transposes:
+        U, V = computed[(columns.start,rows.start)]
+        if V is None:
+            blocks.append((rows,columns,U.T*scale,None))
+        else:
+            blocks.append((rows,columns,V.T*scale,U.T))
+    return CompressedCasingOperator(casing_blocks,diagonal_blocks,blocks)
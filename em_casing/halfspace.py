@@ -3,408 +3,155 @@ A module for modeling electromagnetic fields in a halfspace with a vertical casi
 
 functions:
 
+profile
+dlf_filter
+hankel_lamda
+hankel_J1
 hankel_J1_140
 hankel_J1_201
 fii
 fij
 Zii
 Zij
+gamma_casing_toeplitz_hankel
+graded_segment_edges
+gamma_casing_segments
 form_gamma_casing
 form_gamma_casing_to_casing
+casing_diagonal
 form_A
+casing_currents_sweep
+casing_currents_adaptive
 form_A_many_casings
 HED_Ez
 HEB_Ez
+VED_Ex
+VED_Ey
+casing_e_field_matrix
+VED_Hx
+VED_Hy
+casing_h_field_matrix
 form_b_analytic
+form_b_segments
 form_b
+form_b_many_casings
+form_b_many_sources
+
+Timing instrumentation of the hot paths is off by default,
+see profiling and profile (with profile() as stats: ...; print(stats.summary()))
+
+Filter tables W140, ab140 and Wab201 are built from filters on first use
 
 BEWARE: This module uses an e^(-iwt) convention for A, but an e^(iwt) convention for b.
 TODO: Use a consistent sign convention
 '''
 
+import functools
 import numpy as np
-from tqdm import tqdm
+from .cache import KernelMemo
+from . import profiling
+from .profiling import profile
 
 mu0 = 4e-7*np.pi
-W140 = [-6.76671159511e-14,
-        3.39808396836e-13,
-        -7.43411889153e-13,
-        8.93613024469e-13,
-        -5.47341591896e-13,
-        -5.84920181906e-14,
-        5.20780672883e-13,
-        -6.92656254606e-13,
-        6.88908045074e-13,
-        -6.39910528298e-13,
-        5.82098912530e-13,
-        -4.84912700478e-13,
-        3.54684337858e-13,
-        -2.10855291368e-13,
-        1.00452749275e-13,
-        5.58449957721e-15,
-        -5.67206735175e-14,
-        1.09107856853e-13,
-        -6.04067500756e-14,
-        8.84512134731e-14,
-        2.22321981827e-14,
-        8.38072239207e-14,
-        1.23647835900e-13,
-        1.44351787234e-13,
-        2.94276480713e-13,
-        3.39965995918e-13,
-        6.17024672340e-13,
-        8.25310217692e-13,
-        1.32560792613e-12,
-        1.90949961267e-12,
-        2.93458179767e-12,
-        4.33454210095e-12,
-        6.55863288798e-12,
-        9.78324910827e-12,
-        1.47126365223e-11,
-        2.20240108708e-11,
-        3.30577485691e-11,
-        4.95377381480e-11,
-        7.43047574433e-11,
-        1.11400535181e-10,
-        1.67052734516e-10,
-        2.50470107577e-10,
-        3.75597211630e-10,
-        5.63165204681e-10,
-        8.44458166896e-10,
-        1.26621795331e-09,
-        1.89866561359e-09,
-        2.84693620927e-09,
-        4.26886170263e-09,
-        6.40104325574e-09,
-        9.59798498616e-09,
-        1.43918931885e-08,
-        2.15798696769e-08,
-        3.23584600810e-08,
-        4.85195105813e-08,
-        7.27538583183e-08,
-        1.09090191748e-07,
-        1.63577866557e-07,
-        2.45275193920e-07,
-        3.67784458730e-07,
-        5.51470341585e-07,
-        8.26916206192e-07,
-        1.23991037294e-06,
-        1.85921554669e-06,
-        2.78777669034e-06,
-        4.18019870272e-06,
-        6.26794044911e-06,
-        9.39858833064e-06,
-        1.40925408889e-05,
-        2.11312291505e-05,
-        3.16846342900e-05,
-        4.75093313246e-05,
-        7.12354794719e-05,
-        1.06810848460e-04,
-        1.60146590551e-04,
-        2.40110903628e-04,
-        3.59981158972e-04,
-        5.39658308918e-04,
-        8.08925141201e-04,
-        1.21234066243e-03,
-        1.81650387595e-03,
-        2.72068483151e-03,
-        4.07274689463e-03,
-        6.09135552241e-03,
-        9.09940027636e-03,
-        1.35660714813e-02,
-        2.01692550906e-02,
-        2.98534800308e-02,
-        4.39060697220e-02,
-        6.39211368217e-02,
-        9.16763946228e-02,
-        1.28368795114e-01,
-        1.73241920046e-01,
-        2.19830379079e-01,
-        2.51193131178e-01,
-        2.32380049895e-01,
-        1.17121080205e-01,
-        -1.17252913088e-01,
-        -3.52148528535e-01,
-        -2.71162871370e-01,
-        2.91134747110e-01,
-        3.17192840623e-01,
-        -4.93075681595e-01,
-        3.11223091821e-01,
-        -1.36044122543e-01,
-        5.12141261934e-02,
-        -1.90806300761e-02,
-        7.57044398633e-03,
-        -3.25432753751e-03,
-        1.49774676371e-03,
-        -7.24569558272e-04,
-        3.62792644965e-04,
-        -1.85907973641e-04,
-        9.67201396593e-05,
-        -5.07744171678e-05,
-        2.67510121456e-05,
-        -1.40667136728e-05,
-        7.33363699547e-06,
-        -3.75638767050e-06,
-        1.86344211280e-06,
-        -8.71623576811e-07,
-        3.61028200288e-07,
-        -1.05847108097e-07,
-        -1.51569361490e-08,
-        6.67633241420e-08,
-        -8.33741579804e-08,
-        8.31065906136e-08,
-        -7.53457009758e-08,
-        6.48057680299e-08,
-        -5.37558016587e-08,
-        4.32436265303e-08,
-        -3.37262648712e-08,
-        2.53558687098e-08,
-        -1.81287021528e-08,
-        1.20228328586e-08,
-        -7.10898040664e-09,
-        3.53667004588e-09,
-        -1.36030600198e-09,
-        3.52544249042e-10,
-        -4.53719284366e-11]
-ab140 = 10**(-7.91001919000+np.arange(140)*0.0879671439570)
-
-Wab201 = np.array([[4.1185887075357082e-06,  1.5020099209519960e-03,  4.7827871332506182e-10],
-    [4.6623077830484039e-06, -1.0381698214761684e-02, -2.9784175503440788e-09],
-    [5.2778064058937756e-06,  3.6840860097595164e-02,  9.7723832770897220e-09],
-    [5.9745606155328603e-06, -8.9903380392274704e-02, -2.2382340996085809e-08],
-    [6.7632974390298035e-06,  1.7082286536833860e-01,  4.0446774329470848e-08],
-    [7.6561600412698171e-06, -2.7115749656836280e-01, -6.1734815854553919e-08],
-    [8.6668946776271221e-06,  3.7649328091859574e-01,  8.3293912185608189e-08],
-    [9.8110623273521872e-06, -4.7220778569122657e-01, -1.0249453502284080e-07],
-    [1.1106278265924788e-05,  5.4778211089647089e-01,  1.1780779749909977e-07],
-    [1.2572483264760042e-05, -5.9823516853035097e-01, -1.2870061460834850e-07],
-    [1.4232250593579901e-05,  6.2345791612185331e-01,  1.3559243438349901e-07],
-    [1.6111133551969887e-05, -6.2650436648257724e-01, -1.3921010821521872e-07],
-    [1.8238058880617237e-05,  6.1197225351173345e-01,  1.4065745722769670e-07],
-    [2.0645772109076137e-05, -5.8470173866140451e-01, -1.4074881908375281e-07],
-    [2.3371341696506312e-05,  5.4911055789616858e-01,  1.4051720878600928e-07],
-    [2.6456729726989950e-05, -5.0878861684860843e-01, -1.4040746687777830e-07],
-    [2.9949437945688260e-05,  4.6652106345430200e-01,  1.4127886061686993e-07],
-    [3.3903239082024059e-05, -4.2426478870289325e-01, -1.4315595655055356e-07],
-    [3.8379004719130766e-05,  3.8339538911933357e-01,  1.4689283208027915e-07],
-    [4.3445642455208216e-05, -3.4472344791723936e-01, -1.5210916706348747e-07],
-    [4.9181156785051293e-05,  3.0876891466890510e-01,  1.5989801550138741e-07],
-    [5.5673850034776868e-05, -2.7570439368364807e-01, -1.6940918407911260e-07],
-    [6.3023681838995322e-05,  2.4562331000974616e-01,  1.8227089415749844e-07],
-    [7.1343808090545215e-05, -2.1839207265400126e-01, -1.9695856878603369e-07],
-    [8.0762323056016586e-05,  1.9393194321380827e-01,  2.1603952427106760e-07],
-    [9.1424231478173270e-05, -1.7198162962644575e-01, -2.3691320619292838e-07],
-    [1.0349368102719458e-04,  1.5242270280410272e-01,  2.6369843208466607e-07],
-    [1.1715648947091054e-04, -1.3494945901825492e-01, -2.9202021404039016e-07],
-    [1.3262300547161834e-04,  1.1946763189654602e-01,  3.2852445086324662e-07],
-    [1.5013134705348249e-04, -1.0565870880444576e-01, -3.6589094553627693e-07],
-    [1.6995106759902750e-04,  9.3482355548033913e-02,  4.1487501036863030e-07],
-    [1.9238730581535294e-04, -8.2612525279836244e-02, -4.6327136995173986e-07],
-    [2.1778548356175115e-04,  7.3077763526174969e-02,  5.2852697369750518e-07],
-    [2.4653662386513240e-04, -6.4536481281701225e-02, -5.9034983719954077e-07],
-    [2.7908337099788406e-04,  5.7096310621587334e-02,  6.7710211611560898e-07],
-    [3.1592680530155527e-04, -5.0384859605213800e-02, -7.5512942807901028e-07],
-    [3.5763415767542709e-04,  4.4599557396733047e-02,  8.7062473466409799e-07],
-    [4.0484754250000483e-04, -3.9316995063444334e-02, -9.6788530918130449e-07],
-    [4.5829384344501882e-04,  3.4838544754296139e-02,  1.1222658353725904e-06],
-    [5.1879590436097246e-04, -3.0664946477420088e-02, -1.2417228058919743e-06],
-    [5.8728519754599128e-04,  2.7221072240291456e-02,  1.4493467036899140e-06],
-    [6.6481616442494776e-04, -2.3901586108434601e-02, -1.5932456559208080e-06],
-    [7.5258244942583781e-04,  2.1281566646364738e-02,  1.8747045814274419e-06],
-    [8.5193527698548301e-04, -1.8612484595521447e-02, -2.0433320340041385e-06],
-    [9.6440425461164468e-04,  1.6655386303461400e-02,  2.4285695351967146e-06],
-    [1.0917209222795108e-03, -1.4472420076504743e-02, -2.6179926456520528e-06],
-    [1.2358454107222641e-03,  1.3057747649606617e-02,  3.1511729661391781e-06],
-    [1.3989966190390965e-03, -1.1226286001060300e-02, -3.3492412032881268e-06],
-    [1.5836863762264436e-03,  1.0266818557930830e-02,  4.0964186613549959e-06],
-    [1.7927581125735061e-03, -8.6738022421653585e-03, -4.2758275751239154e-06],
-    [2.0294306362957340e-03,  8.1103368670848164e-03,  5.3371197552207799e-06],
-    [2.2973476893787268e-03, -6.6573628142085938e-03, -5.4435423773626499e-06],
-    [2.6006340455800008e-03,  6.4551189810889585e-03,  6.9725766921672099e-06],
-    [2.9439590142573526e-03, -5.0524015117839084e-03, -6.9045562968161745e-06],
-    [3.3326083277104117e-03,  5.1989014270506263e-03,  9.1397025436977438e-06],
-    [3.7725655187922052e-03, -3.7597430078747883e-03, -8.7148373033635960e-06],
-    [4.2706040416570154e-03,  4.2640545165292636e-03,  1.2029590806160379e-05],
-    [4.8343915539089625e-03, -2.6994965688974474e-03, -1.0927976968519436e-05],
-    [5.4726079656493079e-03,  3.5928000560587229e-03,  1.5912526719455299e-05],
-    [6.1950790728715292e-03, -1.8061291289989019e-03, -1.3582559661331659e-05],
-    [7.0129278325854246e-03,  3.1436470898586703e-03,  2.1176226828087565e-05],
-    [7.9387456086585442e-03, -1.0244200001620755e-03, -1.6678205993448338e-05],
-    [8.9867860248264830e-03,  2.8888297674091743e-03,  2.8384979250408712e-05],
-    [1.0173184409377162e-02, -3.0605070741955765e-04, -2.0132088397797457e-05],
-    [1.1516206210016314e-02,  2.8125907445050334e-03,  3.8372045311188108e-05],
-    [1.3036528203437736e-02,  3.9337862066047565e-04, -2.3702184335455945e-05],
-    [1.4757556829019875e-02,  2.9102041487017727e-03,  5.2385308850007940e-05],
-    [1.6705788547622769e-02,  1.1170884769911178e-03, -2.6854373943701261e-05],
-    [1.8911217773465227e-02,  3.1876763415953362e-03,  7.2318581557902158e-05],
-    [2.1407798659484324e-02,  1.9097806429850762e-03, -2.8535361884516687e-05],
-    [2.4233967845691123e-02,  3.6621020321465411e-03,  1.0108123118106823e-04],
-    [2.7433236218606032e-02,  2.8203783587849949e-03, -2.6788477540644352e-05],
-    [3.1054858792331431e-02,  4.3626885599390430e-03,  1.4319185407094621e-04],
-    [3.5154593024557458e-02,  3.9050024915686802e-03, -1.8108424211338017e-05],
-    [3.9795557242315927e-02,  5.3324923486866077e-03,  2.0573561552327273e-04],
-    [4.5049202393557801e-02,  5.2303399394270488e-03,  3.6361648565843316e-06],
-    [5.0996412085361466e-02,  6.6309348458396984e-03,  2.9991264692859609e-04],
-    [5.7728747844643331e-02,  6.8775540687037451e-03,  4.8993332079278846e-05],
-    [6.5349858773045680e-02,  8.3371689988226087e-03,  4.4354733854670903e-04],
-    [7.3977077298642363e-02,  8.9468564745410102e-03,  1.3589101811995494e-04],
-    [8.3743225592195963e-02,  1.0554326601376745e-02,  6.6515823521273764e-04],
-    [9.4798660459030126e-02,  1.1562765604509096e-02,  2.9451991608624389e-04],
-    [1.0731358818908403e-01,  1.3414536265660639e-02,  1.0105553806271136e-03],
-    [1.2148068500391276e-01,  1.4879837399735491e-02,  5.7533964792254050e-04],
-    [1.3751806344428075e-01,  1.7084241336519569e-02,  1.5535077418254303e-03],
-    [1.5567263036799733e-01,  1.9088092654441269e-02,  1.0621193133794828e-03],
-    [1.7622388825676111e-01,  2.1768513715084332e-02,  2.4128970258747457e-03],
-    [1.9948823835583873e-01,  2.4416120601223806e-02,  1.8929698186109245e-03],
-    [2.2582385189647586e-01,  2.7711234465350204e-02,  3.7800177772191607e-03],
-    [2.5563618439697788e-01,  3.1127164234404547e-02,  3.2937343278959356e-03],
-    [2.8938421793905067e-01,  3.5184140220277452e-02,  5.9612179800391544e-03],
-    [3.2758752752368947e-01,  3.9497913113638941e-02,  5.6295935320552241e-03],
-    [3.7083428029819565e-01,  4.4449762157204989e-02,  9.4422526803168080e-03],
-    [4.1979029080811425e-01,  4.9758433269983887e-02,  9.4810228247137925e-03],
-    [4.7520927168614446e-01,  5.5667457114992429e-02,  1.4979159139973408e-02],
-    [5.3794443759467447e-01,  6.1949790434151823e-02,  1.5745093424331037e-02],
-    [6.0896164107289685e-01,  6.8682064905571841e-02,  2.3708966370000140e-02],
-    [6.8935424252422239e-01,  7.5616743950118387e-02,  2.5740590762136872e-02],
-    [7.8035994327803426e-01,  8.2584983563572259e-02,  3.7232782843117498e-02],
-    [8.8337984088275090e-01,  8.9193635262987042e-02,  4.1225008900614292e-02],
-    [1.0000000000000000e+00,  9.4874686942005279e-02,  5.7507103212277359e-02],
-    [1.1320158709991752e+00,  9.8891681869094042e-02,  6.4044642846235691e-02],
-    [1.2814599321940212e+00,  1.0004294654495730e-01,  8.6091796551857253e-02],
-    [1.4506329812931589e+00,  9.7016844329802857e-02,  9.4717139804457451e-02],
-    [1.6421395578187052e+00,  8.7789596149914384e-02,  1.2172497389177185e-01],
-    [1.8589280418463421e+00,  7.0509767592855419e-02,  1.2853597000398900e-01],
-    [2.1043360464154781e+00,  4.2778853484849347e-02,  1.5450777327408322e-01],
-    [2.3821418024579781e+00,  3.5584532926218175e-03,  1.4755964090969320e-01],
-    [2.6966223273530128e+00, -4.7210453264879347e-02,  1.5621399202016978e-01],
-    [3.0526192726543444e+00, -1.0489787743225988e-01,  1.1147620703185755e-01],
-    [3.4556134647626755e+00, -1.6020950407348281e-01,  7.7489831356083380e-02],
-    [3.9118092861497971e+00, -1.9459781573132096e-01, -2.7628266850147711e-02],
-    [4.4282301962435247e+00, -1.8490774599542381e-01, -1.0198730178317840e-01],
-    [5.0128268625854631e+00, -1.0754165020025190e-01, -2.2039889971111640e-01],
-    [5.6745995670177445e+00,  3.6037727487476613e-02, -2.1185762869925318e-01],
-    [6.4237367714291338e+00,  1.9759013047489976e-01, -1.6052415083152241e-01],
-    [7.2717719763787807e+00,  2.6132313321851336e-01,  9.1649025798681089e-02],
-    [8.2317612875478190e+00,  1.1713996822458939e-01,  2.3792823877700942e-01],
-    [9.3184844237807365e+00, -1.8758779281301441e-01,  2.6075777853738125e-01],
-    [1.0548672261378394e+01, -3.0238114997462151e-01, -1.5662188259001042e-01],
-    [1.1941264417849103e+01,  4.8163135684567732e-02, -2.8932081756330175e-01],
-    [1.3517700840802913e+01,  3.6399529664885466e-01,  1.3148519116247689e-02],
-    [1.5302251891207787e+01, -1.4910233461562913e-01,  4.2691302759079564e-01],
-    [1.7322392002874359e+01, -2.6373490348543854e-01, -4.0005050006489040e-01],
-    [1.9609222670922968e+01,  4.0362661807718703e-01,  1.1513789407450359e-01],
-    [2.2197951281441636e+01, -3.1409794650104578e-01,  9.3748244358717620e-02],
-    [2.5128433154258410e+01,  1.8179369405131079e-01, -1.6037231301955096e-01],
-    [2.8445785143962375e+01, -9.0738718042631769e-02,  1.5071857939129532e-01],
-    [3.2201080245997971e+01,  4.2946487545160242e-02, -1.2120369075996129e-01],
-    [3.6452133901787732e+01, -2.0586135807067835e-02,  9.4110656079982341e-02],
-    [4.1264394108610787e+01,  1.0392667161913182e-02, -7.3742238434584328e-02],
-    [4.6711949038112273e+01, -5.6117848068723023e-03,  5.9038567576124905e-02],
-    [5.2878667676447755e+01,  3.2402025511569896e-03, -4.8288117528475852e-02],
-    [5.9859491047029913e+01, -1.9858724388273777e-03,  4.0197054299576880e-02],
-    [6.7761893895170928e+01,  1.2807317326135252e-03, -3.3919787720641081e-02],
-    [7.6707539338295589e+01, -8.6253791756068252e-04,  2.8918247156763971e-02],
-    [8.6834151956244213e+01,  6.0296590782143555e-04, -2.4845271759013743e-02],
-    [9.8297638159222487e+01, -4.3548936996943465e-04,  2.1470449751150148e-02],
-    [1.1127448647797397e+02,  3.2375891570874245e-04, -1.8635828020057092e-02],
-    [1.2596448473034971e+02, -2.4698212240059978e-04,  1.6229579362363859e-02],
-    [1.4259379589698909e+02,  1.9279062274925971e-04, -1.4170085406786529e-02],
-    [1.6141844006140866e+02, -1.5357911509105972e-04,  1.2396084121011890e-02],
-    [1.8272823602144376e+02,  1.2453787849367440e-04, -1.0860414401084047e-02],
-    [2.0685126325595743e+02, -1.0255126402954421e-04,  9.5259444245356633e-03],
-    [2.3415891294197226e+02,  8.5558482209476271e-05, -8.3628577447233381e-03],
-    [2.6507160578622688e+02, -7.2170928476334345e-05,  7.3468029551253195e-03],
-    [3.0006526470124555e+02,  6.1436863283080017e-05, -6.4576043210966359e-03],
-    [3.3967864197737873e+02, -5.2693349406473615e-05,  5.6783439955994880e-03],
-    [3.8452161375783919e+02,  4.5471255142623729e-05, -4.9946949167265437e-03],
-    [4.3528456951608860e+02, -3.9433284158653591e-05,  4.3944258108608806e-03],
-    [4.9274904109325632e+02,  3.4332971164795619e-05, -3.8670264019660858e-03],
-    [5.5779973493719069e+02, -2.9987212220165472e-05,  3.4034180355556670e-03],
-    [6.3143815278803334e+02,  2.6257657435614391e-05, -2.9957260668529964e-03],
-    [7.1479801051045558e+02, -2.3037978256349448e-05,  2.6370977166248776e-03],
-    [8.0916269245647072e+02,  2.0245071331016652e-05, -2.3215540117372982e-03],
-    [9.1598501008114988e+02, -1.7812925644382519e-05,  2.0438677474690805e-03],
-    [1.0369095690092008e+03,  1.5688305607849465e-05, -1.7994616759226389e-03],
-    [1.1737980889093292e+03, -1.3827679492110470e-05,  1.5843226896713463e-03],
-    [1.3287580659938624e+03,  1.2195005442258958e-05, -1.3949288614414647e-03],
-    [1.5041752194232211e+03, -1.0760110818279243e-05,  1.2281869708886250e-03],
-    [1.7027502211507524e+03,  9.4974857670959145e-06, -1.0813786997088304e-03],
-    [1.9275402746900081e+03, -8.3853711343938338e-06,  9.5211407460757294e-04],
-    [2.1820061829391980e+03,  7.4050612540713192e-06, -8.3829103020448140e-04],
-    [2.4700656297055034e+03, -6.5403682860228500e-06,  7.3806018220987763e-04],
-    [2.7961534952362003e+03,  5.7772102413267325e-06, -6.4979406671247244e-04],
-    [3.1652901343571971e+03, -5.1032933218796731e-06,  5.7206022901230412e-04],
-    [3.5831586684094545e+03,  4.5078641320869195e-06, -5.0359764543483573e-04],
-    [4.0561924809477755e+03, -3.9815111951817114e-06,  4.4329604122300101e-04],
-    [4.5916742642604040e+03,  3.5159993210292339e-06, -3.9017773206623073e-04],
-    [5.1978481416012310e+03, -3.1041249680128287e-06,  3.4338166974098888e-04],
-    [5.8840465913361650e+03,  2.7395854235553632e-06, -3.0214941633163506e-04],
-    [6.6608341270911405e+03, -2.4168587823583312e-06,  2.6581280850704716e-04],
-    [7.5401699459601114e+03,  2.1310948134441218e-06, -2.3378310479588391e-04],
-    [8.5355920488578286e+03, -1.8780185742021288e-06,  2.0554143583887405e-04],
-    [9.6624256676814348e+03,  1.6538488252707735e-06, -1.8063040107732216e-04],
-    [1.0938019208165191e+04, -1.4552318768651144e-06,  1.5864667598176302e-04],
-    [1.2382011340936813e+04,  1.2791890865306748e-06, -1.3923451235168759e-04],
-    [1.4016633352832258e+04, -1.1230741959148155e-06,  1.2208003098625932e-04],
-    [1.5867051413382505e+04,  9.8453630538596172e-07, -1.0690622166177854e-04],
-    [1.7961754025908867e+04, -8.6148574493190796e-07,  9.3468580362568137e-05],
-    [2.0332990628312182e+04,  7.5206242699701732e-07, -8.1551328581234316e-05],
-    [2.3017268096126892e+04, -6.5460810334682633e-07,  7.0964174631531072e-05],
-    [2.6055912791858576e+04,  5.6764451596029765e-07, -6.1539592468666665e-05],
-    [2.9495706813754354e+04, -4.8985884555184997e-07,  5.3130609116145443e-05],
-    [3.3389608239508460e+04,  4.2009674106879252e-07, -4.5609105983126460e-05],
-    [3.7797566453568354e+04, -3.5736212641225517e-07,  3.8864648584181207e-05],
-    [4.2787445110585410e+04,  3.0082215969939671e-07, -3.2803856352344075e-05],
-    [4.8436066944688770e+04, -2.4981510481639669e-07,  2.7350296775876261e-05],
-    [5.4830396510166145e+04,  2.0385823466866512e-07, -2.2444816150805301e-05],
-    [6.2068879062685897e+04, -1.6265189071584773e-07,  1.8046076281584239e-05],
-    [7.0262956194088882e+04,  1.2607416700611311e-07, -1.4130826937491561e-05],
-    [7.9538781555028458e+04, -9.4158417913450858e-08,  1.0693106849359383e-05],
-    [9.0039163080228551e+04,  6.7043911217063425e-08, -7.7412053314530284e-06],
-    [1.0192576161830177e+05, -4.4891090827293947e-08,  5.2910576443698300e-06],
-    [1.1538157981559623e+05,  2.7761325666544702e-08, -3.3552268362550323e-06],
-    [1.3061377957221285e+05, -1.5480404355710375e-08,  1.9282956206367452e-06],
-    [1.4785687144693290e+05,  7.5327300141098751e-09, -9.7253712572058755e-07],
-    [1.6737632511421290e+05, -3.0524770418657847e-09,  4.1100807632959352e-07],
-    [1.8947265645880660e+05,  9.5877856096830783e-10, -1.3553176263207053e-07],
-    [2.1448605423174356e+05, -2.0575286298055636e-10,  3.0748587523233524e-08],
-    [2.4280161749832361e+05,  2.2414416956474645e-11, -3.5668195345476294e-09]])
+# opt-in memoization of the Toeplitz and Hankel kernels of form_gamma_casing (assembly='toeplitz'),
+# per frequency and casing, shared by form_A, form_A_many_casings, casing_currents_sweep
+# and solvers.casing_operator, e.g. kernel_memo.resize(256) for repeated sweeps;
+# each entry holds 3*num_segments-1 complex values, kernel_memo.info() reports hits and misses
+kernel_memo = KernelMemo(maxsize=0)
+# opt-in memoization of the scalar Gii, Gij and _VEB_Ez evaluations of the loop and quad paths,
+# e.g. scalar_kernel_memo.resize(10000)
+scalar_kernel_memo = KernelMemo(maxsize=0)
+
+def __getattr__(name):
+    '''
+    Filter tables W140, ab140 and Wab201 are built on first access, see filters
+    '''
+    if name in ('W140','ab140'):
+        from .filters import gs140
+        ab140, W140 = gs140()
+        return W140 if name=='W140' else ab140
+    elif name=='Wab201':
+        from .filters import key201
+        return key201()
+    raise AttributeError('module '+__name__+' has no attribute '+name)
 
+@profiling.timed('complex_quad')
 def complex_quad(func, a, b, **kwargs):
     from scipy.integrate import quad
     def real_func(y,x,*rargs,**rkwargs):
+        profiling.count('complex_quad evaluations')
         return np.real(func(y,x,*rargs,**rkwargs))
     def imag_func(y,x,*iargs,**ikwargs):
+        profiling.count('complex_quad evaluations')
         return np.imag(func(y,x,*iargs,**ikwargs))
     real_integral = quad(real_func, a, b, **kwargs)
     imag_integral = quad(imag_func, a, b, **kwargs)
     return (real_integral[0] + 1j*imag_integral[0], real_integral[1:], imag_integral[1:])
 
 
+@functools.lru_cache(maxsize=None)
+def dlf_filter(filter_name='key201'):
+    '''
+    Digital linear filter for Hankel transforms of order 1
+    Returns (base, weights), both read-only contiguous arrays of length n_filter
+    filter_name: 'key201' follows Key 2012 (Wab201)
+                 'gs140' follows Guptasarma and Singh (1997) (ab140, W140)
+    The filters module is imported on the first call; each filter is looked up
+    once and cached, since hankel_J1 calls this for every transform
+    '''
+    from . import filters
+    if filter_name=='key201':
+        Wab201 = filters.key201()
+        base = np.ascontiguousarray(Wab201[:,0])
+        weights = np.ascontiguousarray(Wab201[:,2])
+        base.flags.writeable = False
+        weights.flags.writeable = False
+        return (base,weights)
+    elif filter_name=='gs140':
+        return filters.gs140()
+    else:
+        raise ValueError('filter '+filter_name+' not recognized')
+
+def hankel_lamda(r, filter_name='key201'):
+    '''
+    lamda values at which to evaluate kernels for Hankel transforms at radii r
+    r is a scalar or array of radii (e.g. inner and outer radius, many casings)
+    Returns array of shape np.shape(r)+(n_filter,)
+    '''
+    base = dlf_filter(filter_name)[0]
+    return base/np.asarray(r,dtype=float)[...,None]
+
+@profiling.timed('hankel_J1')
+def hankel_J1(K, r, filter_name='key201'):
+    '''
+    Compute many Hankel transforms of order 1 with one matrix product:
+    f(r) = integral 0 -> inf (K(lamda) * J1(r*lamda) * d lamda)
+    K is the kernel evaluated at hankel_lamda(r,filter_name),
+        an array of shape (..., n_filter), e.g. (n_cases, n_filter)
+    r is a scalar or array broadcastable against K.shape[:-1]
+    Returns array of shape K.shape[:-1]
+    '''
+    weights = dlf_filter(filter_name)[1]
+    return np.dot(K,weights)/r
+
 def hankel_J1_140(function, r):
     '''
     Compute Hankel transform of order 1:
     f(r) = integral 0 -> inf (function(lamda) * J1(r*lamda) * d lamda)
     Follows Guptasarma and Singh (1997)
     '''
-    # a = -7.91001919000
-    # s = 0.0879671439570
-    # lamda = 10**(a+np.arange(140)*s)/r
-    lamda = ab140/r
-    K = function(lamda)
-    f = np.dot(K,W140)
-    return f/r
+    K = function(hankel_lamda(r,'gs140'))
+    return hankel_J1(K,r,'gs140')
 
+@profiling.timed('hankel_J1_201')
 def hankel_J1_201(function, r):
     '''
     Compute Hankel transform of order 1:
     f(r) = integral 0 -> inf (function(lamda) * J1(r*lamda) * d lamda)
     Follows Key 2012
     '''
-    lamda = Wab201[:,0]/r
-    K = function(lamda)
-    f = np.dot(K,Wab201[:,2])
-    return f/r
+    K = function(hankel_lamda(r,'key201'))
+    return hankel_J1(K,r,'key201')
 
 def fii(lamda,z,dz,frequency,conductivity):
     '''
@@ -439,21 +186,24 @@ def fij(lamda,zi,zj,dz,frequency,conductivity):
     result *= lamda**2/s**2
     return result
 
+@profiling.timed('Gii')
+@scalar_kernel_memo
 def Gii(zi,
         dz,
         frequency=0.125,
         background_conductivity=0.18,
         outer_radius=0.1095,
-        inner_radius=0.1095-0.0134):
+        inner_radius=0.1095-0.0134,
+        filter_name='key201'):
     '''
     Form ith diagonal of integrated Green's matrix to solve for casing current densities
     Follows Tang et al., 2015
     Uses e^(-iwt) convention
     '''
-    funii = lambda x:fii(x,zi,dz,frequency,background_conductivity)
-    result = outer_radius*hankel_J1_201(funii,outer_radius)
-    result -= inner_radius*hankel_J1_201(funii,inner_radius)
-    result = -result/2/background_conductivity
+    radii = np.array([outer_radius,inner_radius])
+    K = fii(hankel_lamda(radii,filter_name),zi,dz,frequency,background_conductivity)
+    result = radii*hankel_J1(K,radii,filter_name)
+    result = -(result[0]-result[1])/2/background_conductivity
     return result
 
 def Zii(zi,
@@ -483,34 +233,38 @@ def Aii_old(zi,
             background_conductivity=0.18,
             casing_conductivity=1.0e7,
             outer_radius=0.1095,
-            inner_radius=0.1095-0.0134):
+            inner_radius=0.1095-0.0134,
+            filter_name='gs140'):
     '''
     Form ith diagonal of coefficient matrix to solve for casing current densities
     Follows Tang et al., 2015
     Uses e^(-iwt) convention
     '''
-    funii = lambda x:fii(x,zi,dz,frequency,background_conductivity)
-    result = outer_radius*hankel_J1_140(funii,outer_radius)
-    result -= inner_radius*hankel_J1_140(funii,inner_radius)
-    result = 1/casing_conductivity + result/2/background_conductivity
+    radii = np.array([outer_radius,inner_radius])
+    K = fii(hankel_lamda(radii,filter_name),zi,dz,frequency,background_conductivity)
+    result = radii*hankel_J1(K,radii,filter_name)
+    result = 1/casing_conductivity + (result[0]-result[1])/2/background_conductivity
     return result
 
+@profiling.timed('Gij')
+@scalar_kernel_memo
 def Gij(zi,
         zj,
         dz,
         frequency=0.125,
         background_conductivity=0.18,
         outer_radius=0.1095,
-        inner_radius=0.1095-0.0134):
+        inner_radius=0.1095-0.0134,
+        filter_name='key201'):
     '''
     Form i,jth element of coefficient matrix
     Follows Tang et al., 2015
     Uses e^(-iwt) convention
     '''
-    funij = lambda x:fij(x,zi,zj,dz,frequency,background_conductivity)
-    result = outer_radius*hankel_J1_201(funij,outer_radius)
-    result -= inner_radius*hankel_J1_201(funij,inner_radius)
-    result = -result/2/background_conductivity
+    radii = np.array([outer_radius,inner_radius])
+    K = fij(hankel_lamda(radii,filter_name),zi,zj,dz,frequency,background_conductivity)
+    result = radii*hankel_J1(K,radii,filter_name)
+    result = -(result[0]-result[1])/2/background_conductivity
     return result
 
 def Zij(zi,
@@ -543,37 +297,319 @@ def Aij_old(zi,
             background_conductivity=0.18,
             casing_conductivity=1.0e7,
             outer_radius=0.1095,
-            inner_radius=0.1095-0.0134):
+            inner_radius=0.1095-0.0134,
+            filter_name='gs140'):
     '''
     Form i,jth element of coefficient matrix
     Follows Tang et al., 2015
     Uses e^(-iwt) convention
     '''
-    funij = lambda x:fij(x,zi,zj,dz,frequency,background_conductivity)
-    result = outer_radius*hankel_J1_140(funij,outer_radius)
-    result -= inner_radius*hankel_J1_140(funij,inner_radius)
-    result /= 2*background_conductivity
+    radii = np.array([outer_radius,inner_radius])
+    K = fij(hankel_lamda(radii,filter_name),zi,zj,dz,frequency,background_conductivity)
+    result = radii*hankel_J1(K,radii,filter_name)
+    result = (result[0]-result[1])/2/background_conductivity
     return result
 
+def _gamma_casing_geometry(outer_radius=0.1095,
+                           inner_radius=0.1095-0.0134,
+                           casing_length=1365,
+                           num_segments=280,
+                           filter_name='key201'):
+    '''
+    Frequency-independent part of gamma_casing_toeplitz_hankel
+    Returns a dictionary of segment length, offsets and filter abscissae divided by radius
+    '''
+    dz = casing_length/num_segments
+    radii = np.array([outer_radius,inner_radius])[:,None]
+    geometry = {'dz':dz,
+                'num_segments':num_segments,
+                'filter_name':filter_name,
+                # |zi-zj| +- dz/2 and zi+zj +- dz/2 are all odd multiples of dz/2,
+                # (2n+1)*dz/2 for n = 0..2N-1
+                'offsets':dz/2*(2*np.arange(2*num_segments)+1)[None,:,None],
+                # outer and inner radius, shape (2,1)
+                'radii':radii,
+                # lamda for outer and inner radius, shape (2,1,n_filter)
+                'lamda':hankel_lamda(radii,filter_name)}
+    return geometry
+
+def _gamma_casing_toeplitz_hankel(geometry,frequency,background_conductivity):
+    '''
+    Frequency-dependent part of gamma_casing_toeplitz_hankel
+    geometry is from _gamma_casing_geometry
+    frequency is a scalar or an array of frequencies;
+    kernels are evaluated as one (frequency x radius x offset x filter) array
+    '''
+    dz = geometry['dz']
+    n = geometry['num_segments']
+    radii = geometry['radii']
+    lamda = geometry['lamda']
+    filter_name = geometry['filter_name']
+    k_squared = -1j*2*np.pi*np.asarray(frequency)[...,None,None,None]*mu0*background_conductivity
+    s = np.sqrt(lamda**2 + k_squared)
+    scale = lamda**2/s**2
+
+    # exponentials at every distinct offset
+    exponentials = np.exp(-s*geometry['offsets'])
+
+    # Toeplitz part: source segment integral of the direct term
+    # |zi-zj| = k*dz, so |zi-zj|+dz/2 is offset k and |zi-zj|-dz/2 is offset k-1
+    k_toeplitz = np.empty(s.shape[:-2]+(n,s.shape[-1]),dtype=complex)
+    k_toeplitz[...,0,:] = 2*exponentials[...,0,:] - 2
+    k_toeplitz[...,1:,:] = exponentials[...,1:n,:] - exponentials[...,:n-1,:]
+    k_toeplitz *= scale
+    # Hankel part: source segment integral of the image term
+    # zi+zj = (m+1)*dz, so zi+zj-dz/2 is offset m and zi+zj+dz/2 is offset m+1
+    k_hankel = exponentials[...,:2*n-1,:] - exponentials[...,1:,:]
+    k_hankel *= scale
+
+    t = radii*hankel_J1(k_toeplitz,radii,filter_name)
+    h = radii*hankel_J1(k_hankel,radii,filter_name)
+    toeplitz = -(t[...,0,:]-t[...,1,:])/2/background_conductivity
+    hankel = -(h[...,0,:]-h[...,1,:])/2/background_conductivity
+    return (toeplitz,hankel)
+
+def _gamma_casing_toeplitz_hankel_memoized(geometry,frequency,background_conductivity):
+    '''
+    _gamma_casing_toeplitz_hankel, with the result for each frequency kept in kernel_memo
+    Only frequencies not in kernel_memo are computed, as one batch
+    '''
+    if kernel_memo.maxsize<=0:
+        return _gamma_casing_toeplitz_hankel(geometry,frequency,background_conductivity)
+    frequencies = np.asarray(frequency,dtype=float)
+    radii = geometry['radii'].ravel()
+    keys = [kernel_memo.key('toeplitz_hankel',f,background_conductivity,geometry['dz'],
+                            geometry['num_segments'],radii[0],radii[1],geometry['filter_name'])
+            for f in frequencies.ravel()]
+    results = [kernel_memo.get(key) for key in keys]
+    missing = [ii for (ii,result) in enumerate(results) if result is None]
+    if missing:
+        toeplitz, hankel = _gamma_casing_toeplitz_hankel(geometry,
+                                                         frequencies.ravel()[missing],
+                                                         background_conductivity)
+        for (ii,t,h) in zip(missing,toeplitz,hankel):
+            t.setflags(write=False)
+            h.setflags(write=False)
+            results[ii] = (t,h)
+            kernel_memo.put(keys[ii],results[ii])
+    toeplitz = np.stack([t for (t,h) in results]).reshape(frequencies.shape+(-1,))
+    hankel = np.stack([h for (t,h) in results]).reshape(frequencies.shape+(-1,))
+    return (toeplitz,hankel)
+
+def gamma_casing_toeplitz_hankel(frequency=0.125,
+                                 background_conductivity=0.18,
+                                 outer_radius=0.1095,
+                                 inner_radius=0.1095-0.0134,
+                                 casing_length=1365,
+                                 num_segments=280,
+                                 filter_name='key201',
+                                 **kwargs):
+    '''
+    Distinct elements of integrated Green's tensor matrix for a uniformly discretized casing
+    From Tang et al, 2015
+    Uses e^(-iwt) convention
+
+    On a uniform grid, Gamma[i,j] depends only on |zi-zj| and zi+zj, so
+        Gamma[i,j] = toeplitz[abs(i-j)] + hankel[i+j]
+    toeplitz has num_segments elements, hankel has 2*num_segments-1 elements.
+    Kernels for all offsets and both radii are evaluated as one array
+    and transformed with one matrix product (see hankel_J1).
+
+    frequency can be an array, in which case toeplitz and hankel have
+    shape np.shape(frequency)+(num_segments,) and np.shape(frequency)+(2*num_segments-1,)
+    Results are kept per frequency in kernel_memo, if it is enabled
+
+    kwargs are unused
+    '''
+    geometry = _gamma_casing_geometry(outer_radius=outer_radius,
+                                      inner_radius=inner_radius,
+                                      casing_length=casing_length,
+                                      num_segments=num_segments,
+                                      filter_name=filter_name)
+    return _gamma_casing_toeplitz_hankel_memoized(geometry,frequency,background_conductivity)
+
+def graded_segment_edges(casing_length=1365,num_segments=280,grading=0.5,lattice=None):
+    '''
+    Segment edges from the top (0) to the bottom (casing_length) of a casing,
+    with segments graded to be shortest at both ends, where current density varies fastest
+    grading: 0 gives uniform segments, 1 gives cosine (Chebyshev) spacing,
+        values in between blend the two
+    lattice: if given, edges are rounded to multiples of casing_length/lattice,
+        e.g. to keep them on the grid of a uniform discretization;
+        lattice must be large enough to keep every segment
+    Returns array of num_segments+1 edges
+    '''
+    t = np.linspace(0,1,num_segments+1)
+    edges = casing_length*((1-grading)*t+grading*(1-np.cos(np.pi*t))/2)
+    if lattice is not None:
+        edges = np.round(edges*lattice/casing_length)*casing_length/lattice
+        if np.any(np.diff(edges)<=0):
+            raise ValueError('lattice is too coarse for num_segments and grading')
+    return edges
+
+def _segment_centers(casing_length=1365,num_segments=280,segment_edges=None):
+    '''
+    Depths of segment centers and segment lengths, as arrays
+    Uniform segments unless segment_edges is given
+    '''
+    if segment_edges is None:
+        dz = casing_length/num_segments
+        return (dz*(np.arange(num_segments)+0.5),np.full(num_segments,dz))
+    segment_edges = np.asarray(segment_edges,dtype=float)
+    return ((segment_edges[:-1]+segment_edges[1:])/2,np.diff(segment_edges))
+
+def _add_segment_direct_kernels(kernels,zs,edges,s,coefficients,expm1_lengths,start,stop,leaf_size):
+    '''
+    Add the transformed direct terms of gamma_casing_segments for segments start to stop
+    (as both observation and source segments) to kernels
+    exp(-s*(zi-ej)) factors into exp(-s*(zi-c))*exp(-s*(c-ej)) for any c between ej and zi,
+    so pairs on either side of the middle edge c are one matrix product over the filter;
+    both halves are then done the same way, down to blocks of leaf_size segments
+    The source segment integral is exp(-s*d)*expm1(-s*dz), d the distance to the near edge
+    '''
+    if stop-start<=leaf_size:
+        block = slice(start,stop)
+        index = np.arange(stop-start)
+        below = index[:,None]>index[None,:]
+        # distance to the near edge; on the diagonal, half the segment length
+        near = abs(np.where(below,
+                            zs[block,None]-edges[None,start+1:stop+1],
+                            edges[None,start:stop]-zs[block,None]))
+        K = np.exp(-s[:,None,None,:]*near[...,None])*expm1_lengths[:,None,block,:]
+        K[:,index,index,:] = 2*np.expm1(-s[:,None,:]*near[index,index,None])
+        kernels[:,block,block] += np.einsum('fijm,fm->fij',K,coefficients)
+        return
+    middle = (start+stop)//2
+    c = edges[middle]
+    lower = slice(start,middle)
+    upper = slice(middle,stop)
+    # observation below c, source above c
+    left = coefficients[:,None,:]*np.exp(-s[:,None,:]*(zs[upper,None]-c))
+    right = np.exp(-s[:,None,:]*(c-edges[start+1:middle+1,None]))*expm1_lengths[:,lower,:]
+    kernels[:,upper,lower] += left@np.swapaxes(right,-1,-2)
+    # observation above c, source below c
+    left = coefficients[:,None,:]*np.exp(-s[:,None,:]*(c-zs[lower,None]))
+    right = np.exp(-s[:,None,:]*(edges[middle:stop,None]-c))*expm1_lengths[:,upper,:]
+    kernels[:,lower,upper] += left@np.swapaxes(right,-1,-2)
+    _add_segment_direct_kernels(kernels,zs,edges,s,coefficients,expm1_lengths,start,middle,leaf_size)
+    _add_segment_direct_kernels(kernels,zs,edges,s,coefficients,expm1_lengths,middle,stop,leaf_size)
+
+@profiling.timed('gamma_casing_segments')
+def gamma_casing_segments(segment_edges,
+                          frequency=0.125,
+                          background_conductivity=0.18,
+                          outer_radius=0.1095,
+                          inner_radius=0.1095-0.0134,
+                          filter_name='key201',
+                          leaf_size=8,
+                          **kwargs):
+    '''
+    Integrated Green's tensor matrix for a casing with arbitrary segment edges
+    From Tang et al, 2015
+    Uses e^(-iwt) convention
+
+    Gamma[i,j] is the field at the center of segment i due to unit current density
+    on segment j, from segment_edges[j] to segment_edges[j+1].
+    As in gamma_casing_toeplitz_hankel, the exponentials of the source segment integral
+    are differenced before the Hankel transform, and all transforms are matrix products
+    over the filter: one for the image term, and one per block of a bisection of the
+    segments for the direct term (see _add_segment_direct_kernels), so there are
+    O(N log N) exponentials for N segments, wherever the edges are.
+    With uniform edges, this is the same matrix as gamma_casing_toeplitz_hankel,
+    to about 1e-12 of its largest element.
+
+    frequency can be an array: returns stacked matrices
+    leaf_size: number of segments below which blocks are evaluated directly
+
+    kwargs are unused
+    '''
+    frequencies = np.asarray(frequency,dtype=float)
+    edges = np.asarray(segment_edges,dtype=float)
+    zs = (edges[:-1]+edges[1:])/2
+    n = len(zs)
+    radii = np.array([outer_radius,inner_radius])
+    weights = dlf_filter(filter_name)[1]
+    # outer and inner radius transforms as one sum over the filter
+    lamda = hankel_lamda(radii,filter_name).ravel()
+    s = np.sqrt(lamda**2 - 1j*2*np.pi*frequencies.reshape(-1,1)*mu0*background_conductivity)
+    coefficients = np.concatenate((-weights,weights))/2/background_conductivity*lamda**2/s**2
+    expm1_lengths = np.expm1(-s[:,None,:]*np.diff(edges)[:,None])
+
+    # image term: exp(-s*(zi+ej)) = exp(-s*zi)*exp(-s*ej)
+    left = coefficients[:,None,:]*np.exp(-s[:,None,:]*zs[:,None])
+    right = -np.exp(-s[:,None,:]*edges[:-1,None])*expm1_lengths
+    G = left@np.swapaxes(right,-1,-2)
+    _add_segment_direct_kernels(G,zs,edges,s,coefficients,expm1_lengths,0,n,leaf_size)
+    return G.reshape(frequencies.shape+(n,n))
+
+@profiling.timed('form_gamma_casing')
 def form_gamma_casing(frequency=0.125,
                       background_conductivity=0.18,
                       outer_radius=0.1095,
                       inner_radius=0.1095-0.0134,
                       casing_length=1365,
                       num_segments=280,
+                      assembly='toeplitz',
+                      filter_name='key201',
+                      cache=None,
+                      segment_edges=None,
                       **kwargs):
     '''
     Form integrated Green's tensor matrix to solve for casing current densities
     From Tang et al, 2015
     Return conjugate to convert to e^(iwt) convention
 
+    assembly: 'toeplitz' evaluates each distinct kernel once and scatters it
+        into the matrix (see gamma_casing_toeplitz_hankel)
+        With 'toeplitz', frequency can be an array: returns stacked matrices,
+        of shape np.shape(frequency)+(num_segments,num_segments)
+        'loop' calls Gii and Gij for every element
+    filter_name: Hankel transform filter, see dlf_filter
+    cache: optional cache.MatrixCache; if given, Gamma is loaded from it when available,
+        and computed and stored otherwise
+    segment_edges: optional array of num_segments+1 segment edges from the top of the casing,
+        e.g. from graded_segment_edges; casing_length, num_segments and assembly are then
+        ignored, and Gamma is formed with gamma_casing_segments
+
     kwargs are unused
     '''
+    if cache is not None:
+        # uniform segments are keyed as before segment_edges existed
+        edges = {} if segment_edges is None else {'segment_edges':segment_edges}
+        return cache.get(form_gamma_casing,
+                         frequency=frequency,
+                         background_conductivity=background_conductivity,
+                         outer_radius=outer_radius,
+                         inner_radius=inner_radius,
+                         casing_length=casing_length,
+                         num_segments=num_segments,
+                         filter_name=filter_name,
+                         **edges)
+    if segment_edges is not None:
+        G = gamma_casing_segments(segment_edges,
+                                  frequency=frequency,
+                                  background_conductivity=background_conductivity,
+                                  outer_radius=outer_radius,
+                                  inner_radius=inner_radius,
+                                  filter_name=filter_name)
+        return np.conj(G)
+    if assembly=='toeplitz':
+        toeplitz, hankel = gamma_casing_toeplitz_hankel(
+            frequency=frequency,
+            background_conductivity=background_conductivity,
+            outer_radius=outer_radius,
+            inner_radius=inner_radius,
+            casing_length=casing_length,
+            num_segments=num_segments,
+            filter_name=filter_name)
+        ii, jj = np.indices((num_segments,num_segments))
+        G = toeplitz[...,abs(ii-jj)] + hankel[...,ii+jj]
+        return np.conj(G)
+    elif assembly!='loop':
+        raise ValueError('assembly '+assembly+' not recognized')
     dz = casing_length/num_segments
     zs = dz*(np.arange(num_segments)+0.5)
     G = np.ones((num_segments,num_segments))*1j
-    #TODO: vectorize or parallelize
-    #TODO: skip half of Gij computations (symmetry)
     for ii in np.arange(num_segments):
         zi = zs[ii]
         for jj in np.arange(num_segments):
@@ -584,7 +620,8 @@ def form_gamma_casing(frequency=0.125,
                                frequency=frequency,
                                background_conductivity=background_conductivity,
                                outer_radius=outer_radius,
-                               inner_radius=inner_radius
+                               inner_radius=inner_radius,
+                               filter_name=filter_name
                               )
             else:
                 G[ii,jj] = Gij(zi,
@@ -593,10 +630,12 @@ def form_gamma_casing(frequency=0.125,
                                frequency=frequency,
                                background_conductivity=background_conductivity,
                                outer_radius=outer_radius,
-                               inner_radius=inner_radius
+                               inner_radius=inner_radius,
+                               filter_name=filter_name
                               )
     return np.conj(G)
 
+@profiling.timed('form_gamma_casing_to_casing')
 def form_gamma_casing_to_casing(x1,y1,
                                 casing_length_1,
                                 num_segments_1,
@@ -610,6 +649,11 @@ def form_gamma_casing_to_casing(x1,y1,
                                 outer_radius_2=0.1095,
                                 inner_radius_2=0.1095-0.0134,
                                 both_interactions=False,
+                                integration='analytic',
+                                order=10,
+                                cache=None,
+                                rows=None,
+                                columns=None,
                                 **kwargs):
     '''
     Form casing-to-casing part of integrated greens function (Gamma)
@@ -621,36 +665,93 @@ def form_gamma_casing_to_casing(x1,y1,
         and return two matrices, one for 1->2 (G12) and one for 2->1 (G21).
         G21 is a num_segments_2 by num_segments_1 matrix
 
+    integration: 'analytic' evaluates all segment pairs at once with _VEB_Ez_analytic,
+            using order Gauss-Legendre nodes
+        'quad' calls _VEB_Ez (scipy.integrate.quad) for each pair
+    cache: optional cache.MatrixCache; if given, matrices are loaded from it when available,
+        and computed and stored otherwise
+    rows, columns: optional indices of casing 1 and casing 2 segments,
+        to compute only those rows and columns of G12 (and columns and rows of G21),
+        e.g. to sample a block for low-rank compression; the cache is not used
+
     NOTE: if both casings have segments of equal length, G12 = G21.T
         Thus, both_interactions is only needed if 
         casing_length_1/num_segments_1 != casing_length_2/num_segments_2 
     '''
+    if cache is not None and rows is None and columns is None:
+        casing_args_1 = dict(casing_length_1=casing_length_1,
+                             num_segments_1=num_segments_1,
+                             outer_radius_1=outer_radius_1,
+                             inner_radius_1=inner_radius_1)
+        casing_args_2 = dict(casing_length_2=casing_length_2,
+                             num_segments_2=num_segments_2,
+                             outer_radius_2=outer_radius_2,
+                             inner_radius_2=inner_radius_2)
+        common_args = dict(frequency=frequency,
+                           background_conductivity=background_conductivity,
+                           integration=integration,
+                           order=order)
+        G12 = cache.get(form_gamma_casing_to_casing,
+                        x1=x1,y1=y1,x2=x2,y2=y2,
+                        **casing_args_1,**casing_args_2,**common_args)
+        if not both_interactions:
+            return G12
+        # G21 is G12 with the casings swapped
+        casing_args_1_as_2 = {key[:-1]+'2':value for key, value in casing_args_1.items()}
+        casing_args_2_as_1 = {key[:-1]+'1':value for key, value in casing_args_2.items()}
+        G21 = cache.get(form_gamma_casing_to_casing,
+                        x1=x2,y1=y2,x2=x1,y2=y1,
+                        **casing_args_2_as_1,**casing_args_1_as_2,**common_args)
+        return (G12,G21)
     casing_area_1 = np.pi*(outer_radius_1**2-inner_radius_1**2)
     casing_area_2 = np.pi*(outer_radius_2**2-inner_radius_2**2)
     segment_length_1 = casing_length_1/num_segments_1
     segment_length_2 = casing_length_2/num_segments_2
     z1 = segment_length_1*(np.arange(num_segments_1)+0.5)
     z2 = segment_length_2*(np.arange(num_segments_2)+0.5)
+    if rows is not None:
+        z1 = z1[rows]
+    if columns is not None:
+        z2 = z2[columns]
+    num_segments_1 = len(z1)
+    num_segments_2 = len(z2)
     k_squared = -1j*2*np.pi*frequency*mu0*background_conductivity
     drho_squared = (x2-x1)**2+(y2-y1)**2
 
-    G12 = 0j*np.zeros((num_segments_1,num_segments_2))
-    if both_interactions:
-        G21 = 0j*np.zeros((num_segments_2,num_segments_1))
-
-    for ii in tqdm(range(num_segments_1)):
-        zi = z1[ii]
-        for jj in range(num_segments_2):
-            zj = z2[jj]
-            G12[ii,jj] = _VEB_Ez(zi,zj-segment_length_2/2,zj+segment_length_2/2,
-                                  drho_squared,k_squared,
-                                  conductivity=background_conductivity
-                                 )
-            if both_interactions:
-                G21[jj,ii] = _VEB_Ez(zj,zi-segment_length_1/2,zi+segment_length_1/2,
+    if integration=='analytic':
+        G12 = _VEB_Ez_analytic(z1[:,None],
+                               z2[None,:]-segment_length_2/2,
+                               z2[None,:]+segment_length_2/2,
+                               drho_squared,k_squared,
+                               conductivity=background_conductivity,
+                               order=order)
+        if both_interactions:
+            G21 = _VEB_Ez_analytic(z2[:,None],
+                                   z1[None,:]-segment_length_1/2,
+                                   z1[None,:]+segment_length_1/2,
+                                   drho_squared,k_squared,
+                                   conductivity=background_conductivity,
+                                   order=order)
+    elif integration=='quad':
+        G12 = 0j*np.zeros((num_segments_1,num_segments_2))
+        if both_interactions:
+            G21 = 0j*np.zeros((num_segments_2,num_segments_1))
+        for ii in range(num_segments_1):
+            zi = z1[ii]
+            for jj in range(num_segments_2):
+                zj = z2[jj]
+                G12[ii,jj] = _VEB_Ez(zi,zj-segment_length_2/2,zj+segment_length_2/2,
                                       drho_squared,k_squared,
                                       conductivity=background_conductivity
                                      )
+                if both_interactions:
+                    G21[jj,ii] = _VEB_Ez(zj,zi-segment_length_1/2,zi+segment_length_1/2,
+                                          drho_squared,k_squared,
+                                          conductivity=background_conductivity
+                                         )
+    else:
+        raise ValueError('integration '+integration+' not recognized')
+
     G12 *= casing_area_2
     if both_interactions:
         G21 *= casing_area_1
@@ -658,6 +759,29 @@ def form_gamma_casing_to_casing(x1,y1,
     else:
         return G12
 
+def casing_diagonal(casing_conductivity=1.0e7,
+                    num_segments=280,
+                    casing_areas=None,
+                    outer_radius=0.1095,
+                    inner_radius=0.1095-0.0134):
+    '''
+    Diagonal of A = diag(casing_diagonal) - Gamma: 1/casing conductivity of each segment
+    casing_conductivity: a scalar, or an array of num_segments per-segment conductivities,
+        e.g. lower over corroded intervals
+    casing_areas: optional array of num_segments per-segment cross-sectional areas
+        Gamma is formed for the nominal annulus of outer_radius and inner_radius,
+        so a segment of area a is represented by the nominal area with
+        effective conductivity casing_conductivity*a/nominal area;
+        current densities are then currents divided by the nominal area
+    Returns array of num_segments
+    '''
+    conductivity = np.broadcast_to(np.asarray(casing_conductivity,dtype=float),(num_segments,))
+    if casing_areas is not None:
+        nominal_area = np.pi*(outer_radius**2-inner_radius**2)
+        conductivity = conductivity*np.broadcast_to(casing_areas,(num_segments,))/nominal_area
+    return 1/conductivity
+
+@profiling.timed('form_A')
 def form_A(frequency=0.125,
            background_conductivity=0.18,
            casing_conductivity=1.0e7,
@@ -665,6 +789,11 @@ def form_A(frequency=0.125,
            inner_radius=0.1095-0.0134,
            casing_length=1365,
            num_segments=280,
+           assembly='toeplitz',
+           filter_name='key201',
+           cache=None,
+           segment_edges=None,
+           casing_areas=None,
            **kwargs):
     '''
     Form coefficient matrix to solve for casing current densities
@@ -672,6 +801,12 @@ def form_A(frequency=0.125,
     Follows Tang et al., 2015
     Uses e^(iwt) time dependence
 
+    assembly, filter_name, cache and segment_edges are passed to form_gamma_casing
+    With assembly='toeplitz' or segment_edges, frequency can be an array: returns stacked matrices
+    casing_conductivity can be per-segment, and casing_areas gives optional per-segment
+    cross-sectional areas (see casing_diagonal); both only change the diagonal,
+    so Gamma (and a cached Gamma) is the same for every profile
+
     kwargs are unused
     '''
     # dz = casing_length/num_segments
@@ -708,9 +843,328 @@ def form_A(frequency=0.125,
                           outer_radius=outer_radius,
                           inner_radius=inner_radius,
                           casing_length=casing_length,
-                          num_segments=num_segments)
-    return (np.identity(num_segments)+0j)/casing_conductivity - G
+                          num_segments=num_segments,
+                          assembly=assembly,
+                          filter_name=filter_name,
+                          cache=cache,
+                          segment_edges=segment_edges)
+    diagonal = casing_diagonal(casing_conductivity,
+                               num_segments=G.shape[-1],
+                               casing_areas=casing_areas,
+                               outer_radius=outer_radius,
+                               inner_radius=inner_radius)
+    return np.diag(diagonal+0j) - G
+
+def casing_currents_sweep(wire_path_x,
+                          wire_path_y,
+                          frequencies,
+                          wire_current=1,
+                          background_conductivity=0.18,
+                          casing_conductivity=1.0e7,
+                          outer_radius=0.1095,
+                          inner_radius=0.1095-0.0134,
+                          casing_length=1365,
+                          num_segments=280,
+                          filter_name='key201',
+                          frequency_chunk=8,
+                          casing_areas=None,
+                          return_segments=False,
+                          **kwargs):
+    '''
+    Solve for casing current densities of a single casing at many frequencies
+    Follows Tang et al., 2015
+    Uses e^(iwt) time dependence
+
+    Segment offsets and filter abscissae divided by radius are computed once;
+    per frequency, only the kernel exponentials and the solve remain.
+    Kernels are evaluated for frequency_chunk frequencies at a time,
+    which bounds memory at frequency_chunk*6*num_segments*n_filter complex values;
+    with kernel_memo enabled, kernels already in it are not recomputed
+    casing_conductivity and casing_areas can be per-segment, see casing_diagonal
+
+    Returns (A, b, j), stacked along the first axis:
+        A is (num_frequencies, num_segments, num_segments)
+        b and j are (num_frequencies, num_segments)
+    With return_segments, returns (A, b, j, zs, dz, area), where zs are segment centers,
+    dz are segment lengths and area is the nominal casing area, so that
+    segment moments are j*area*dz
+
+    kwargs are unused
+    '''
+    frequencies = np.atleast_1d(frequencies)
+    geometry = _gamma_casing_geometry(outer_radius=outer_radius,
+                                      inner_radius=inner_radius,
+                                      casing_length=casing_length,
+                                      num_segments=num_segments,
+                                      filter_name=filter_name)
+    ii, jj = np.indices((num_segments,num_segments))
+    toeplitz_index = abs(ii-jj)
+    hankel_index = ii+jj
+    identity = np.diag(casing_diagonal(casing_conductivity,
+                                       num_segments=num_segments,
+                                       casing_areas=casing_areas,
+                                       outer_radius=outer_radius,
+                                       inner_radius=inner_radius))
+
+    A = np.empty((len(frequencies),num_segments,num_segments),dtype=complex)
+    for start in range(0,len(frequencies),frequency_chunk):
+        chunk = slice(start,start+frequency_chunk)
+        toeplitz, hankel = _gamma_casing_toeplitz_hankel_memoized(geometry,
+                                                                  frequencies[chunk],
+                                                                  background_conductivity)
+        A[chunk] = identity - np.conj(toeplitz[:,toeplitz_index] + hankel[:,hankel_index])
+    b = form_b_analytic(wire_path_x,
+                        wire_path_y,
+                        wire_current=wire_current,
+                        frequency=frequencies,
+                        background_conductivity=background_conductivity,
+                        casing_length=casing_length,
+                        num_segments=num_segments)
+    with profiling.timer('np.linalg.solve'):
+        j = np.linalg.solve(A,b[...,None])[...,0]
+    if return_segments:
+        zs, dz = _segment_centers(casing_length,num_segments)
+        area = np.pi*(outer_radius**2-inner_radius**2)
+        return (A,b,j,zs,dz,area)
+    return (A,b,j)
+
+def casing_currents_adaptive(wire_path_x,
+                             wire_path_y,
+                             wire_current=1,
+                             frequency=0.125,
+                             background_conductivity=0.18,
+                             casing_conductivity=1.0e7,
+                             outer_radius=0.1095,
+                             inner_radius=0.1095-0.0134,
+                             casing_length=1365,
+                             num_segments=20,
+                             segment_edges=None,
+                             rtol=1e-3,
+                             max_segments=2000,
+                             filter_name='key201',
+                             **kwargs):
+    '''
+    Solve for casing current densities of a single casing,
+    splitting segments until the solution converges
+    Follows Tang et al., 2015
+    Uses e^(iwt) time dependence
+
+    Starts from segment_edges, or num_segments uniform segments.
+    Each iteration also solves with every segment split in two; segments where
+    either half differs from the unsplit current density by more than rtol*max|j|
+    are split, and the others are kept.
+    Stops when no segment needs splitting, or when splitting would exceed max_segments.
 
+    Returns (segment_edges, j, converged), where converged is False if max_segments stopped
+    refinement; segment_edges and j are from the last solve with split segments,
+    or without them if they would exceed max_segments
+
+    kwargs are passed to form_A and form_b
+    '''
+    if segment_edges is None:
+        segment_edges = np.linspace(0,casing_length,num_segments+1)
+    segment_edges = np.asarray(segment_edges,dtype=float)
+    casing_args = {'frequency':frequency,
+                   'background_conductivity':background_conductivity,
+                   'casing_conductivity':casing_conductivity,
+                   'outer_radius':outer_radius,
+                   'inner_radius':inner_radius,
+                   'filter_name':filter_name}
+    casing_args.update(kwargs)
+
+    def solve(edges):
+        A = form_A(segment_edges=edges,**casing_args)
+        b = form_b(wire_path_x,wire_path_y,wire_current=wire_current,
+                   segment_edges=edges,**casing_args)
+        with profiling.timer('np.linalg.solve'):
+            return np.linalg.solve(A,b)
+
+    j = solve(segment_edges)
+    while True:
+        midpoints = (segment_edges[:-1]+segment_edges[1:])/2
+        split_edges = np.sort(np.concatenate((segment_edges,midpoints)))
+        j_split = solve(split_edges)
+        error = np.maximum(abs(j_split[0::2]-j),abs(j_split[1::2]-j))/np.max(abs(j_split))
+        refine = error>rtol
+        if not np.any(refine):
+            return (split_edges,j_split,True)
+        if len(segment_edges)-1+np.count_nonzero(refine)>max_segments:
+            if len(split_edges)-1<=max_segments:
+                return (split_edges,j_split,False)
+            return (segment_edges,j,False)
+        segment_edges = np.sort(np.concatenate((segment_edges,midpoints[refine])))
+        j = solve(segment_edges)
+
+def _casing_to_casing_block(i1_block,i2_block,block_args,shared_name=None,shape=None):
+    '''
+    Compute one inter-casing block of A for form_A_many_casings
+    (rows i1_block, columns i2_block), and the (i2_block, i1_block) block
+    if block_args['both_interactions'] is True
+    If shared_name is given, write block(s) into the shared memory array of that name and shape,
+    otherwise return them as a list of (rows, columns, block)
+    Module level so that it can be pickled for process pools
+    '''
+    G = form_gamma_casing_to_casing(**block_args)
+    if block_args.get('both_interactions',False):
+        A_blocks = [(i1_block,i2_block,-G[0]),(i2_block,i1_block,-G[1])]
+    else:
+        A_blocks = [(i1_block,i2_block,-G)]
+    if shared_name is None:
+        return A_blocks
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shared_name)
+    try:
+        A_full = np.ndarray(shape,dtype=complex,buffer=shm.buf)
+        for (rows,columns,A_block) in A_blocks:
+            A_full[rows,columns] = A_block
+        del A_full
+    finally:
+        shm.close()
+
+def _fill_casing_to_casing_blocks(A_full,blocks,n_workers=None,executor=None,shared_name=None):
+    '''
+    Fill inter-casing blocks of A_full, serially or with a pool of workers
+    blocks is a list of (row slice, column slice, form_gamma_casing_to_casing arguments)
+    shared_name: name of the multiprocessing.shared_memory block that holds A_full;
+        if given, workers write blocks into it in place, otherwise they return them
+    Returns A_full
+    '''
+    if n_workers is None and executor is None:
+        for (i1_block,i2_block,block_args) in blocks:
+            for (rows,columns,A_block) in _casing_to_casing_block(i1_block,i2_block,block_args):
+                A_full[rows,columns] = A_block
+        return A_full
+
+    from concurrent.futures import ProcessPoolExecutor
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        if shared_name is not None:
+            futures = [executor.submit(_casing_to_casing_block,i1_block,i2_block,block_args,
+                                       shared_name,A_full.shape)
+                       for (i1_block,i2_block,block_args) in blocks]
+            for future in futures:
+                future.result()
+        else:
+            futures = [executor.submit(_casing_to_casing_block,i1_block,i2_block,block_args)
+                       for (i1_block,i2_block,block_args) in blocks]
+            for future in futures:
+                for (rows,columns,A_block) in future.result():
+                    A_full[rows,columns] = A_block
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return A_full
+
+def _many_casings_arguments(xs,ys,**arguments):
+    '''
+    Per-casing arguments for form_A_many_casings
+    Arguments can be single values, applied to all casings, or list-likes of the same length as xs
+    Returns a list of (x, y, background_conductivity, casing_length, num_segments,
+    casing_conductivity, outer_radius, inner_radius) tuples, one per casing,
+    with arguments in that order after xs and ys
+    '''
+    num_casings = len(xs)
+    assert (num_casings==len(ys)),'xs and ys must be of the same length'
+    arguments = {'xs': xs,'ys': ys,**arguments}
+    # ensure that all dictionary values are lists of length num_casings
+    for key, value in arguments.items():
+        try:
+            # TypeError if value is not a list
+            num_elements = len(value)
+            # AssertionError if list is not of correct length
+            assert num_elements==num_casings, '{} must either be a scalar or have the same length as xs and ys'.format(key)
+        except TypeError:
+            # value is a scalar
+            # make it a list of num_casings elements
+            arguments[key] = [value]*num_casings
+    return list(zip(*arguments.values()))
+
+def _diagonal_block(casing,frequency,diagonal_cache,**kwargs):
+    '''
+    Intra-casing block of A for a casing tuple from _many_casings_arguments,
+    computed once for each distinct set of casing properties and stored in diagonal_cache
+    '''
+    (x, y, background_conductivity, casing_length, num_segments,
+     casing_conductivity, outer_radius, inner_radius) = casing
+    # per-segment conductivity profiles are keyed by their values
+    properties = (background_conductivity, casing_length, num_segments,
+                  tuple(np.ravel(casing_conductivity)), outer_radius, inner_radius)
+    if not properties in diagonal_cache:
+        diagonal_cache[properties] = form_A(frequency=frequency,
+                                            background_conductivity=background_conductivity,
+                                            casing_conductivity=casing_conductivity,
+                                            outer_radius=outer_radius,
+                                            inner_radius=inner_radius,
+                                            casing_length=casing_length,
+                                            num_segments=num_segments,
+                                            **kwargs)
+    return diagonal_cache[properties]
+
+def _casing_to_casing_blocks(casings,casing_blocks,frequency,**kwargs):
+    '''
+    Inter-casing blocks of A needed for casings from _many_casings_arguments
+    Returns (blocks, transposes):
+        blocks is a list of (rows, columns, form_gamma_casing_to_casing arguments)
+        transposes is a list of (rows, columns, scale) of blocks that are
+        the transpose of a computed block times scale
+    '''
+    num_casings = len(casings)
+    blocks = []
+    transposes = []
+    for i1 in range(num_casings):
+        (x1, y1, background_conductivity_1, casing_length_1, num_segments_1,
+         casing_conductivity_1, outer_radius_1, inner_radius_1) = casings[i1]
+        for i2 in range(i1+1, num_casings):
+            (x2, y2, background_conductivity_2, casing_length_2, num_segments_2,
+             casing_conductivity_2, outer_radius_2, inner_radius_2) = casings[i2]
+            casing_args_1 = dict(x1=x1,
+                                 y1=y1,
+                                 casing_length_1=casing_length_1,
+                                 num_segments_1=num_segments_1,
+                                 outer_radius_1=outer_radius_1,
+                                 inner_radius_1=inner_radius_1)
+            casing_args_2 = dict(x2=x2,
+                                 y2=y2,
+                                 casing_length_2=casing_length_2,
+                                 num_segments_2=num_segments_2,
+                                 outer_radius_2=outer_radius_2,
+                                 inner_radius_2=inner_radius_2)
+            if background_conductivity_1!=background_conductivity_2:
+                # compute each direction with the background conductivity of the receiving casing
+                blocks.append((casing_blocks[i1],casing_blocks[i2],
+                               dict(frequency=frequency,
+                                    background_conductivity=background_conductivity_1,
+                                    both_interactions=False,
+                                    **casing_args_1,**casing_args_2,**kwargs)))
+                casing_args_1_as_2 = {key[:-1]+'2':value for key, value in casing_args_1.items()}
+                casing_args_2_as_1 = {key[:-1]+'1':value for key, value in casing_args_2.items()}
+                blocks.append((casing_blocks[i2],casing_blocks[i1],
+                               dict(frequency=frequency,
+                                    background_conductivity=background_conductivity_2,
+                                    both_interactions=False,
+                                    **casing_args_2_as_1,**casing_args_1_as_2,**kwargs)))
+            elif casing_length_1/num_segments_1!=casing_length_2/num_segments_2:
+                # G21 is not related to G12, compute both
+                blocks.append((casing_blocks[i1],casing_blocks[i2],
+                               dict(frequency=frequency,
+                                    background_conductivity=background_conductivity_1,
+                                    both_interactions=True,
+                                    **casing_args_1,**casing_args_2,**kwargs)))
+            else:
+                # exploit symmetry: G21 = G12.T, up to the casing area of the source casing
+                blocks.append((casing_blocks[i1],casing_blocks[i2],
+                               dict(frequency=frequency,
+                                    background_conductivity=background_conductivity_1,
+                                    both_interactions=False,
+                                    **casing_args_1,**casing_args_2,**kwargs)))
+                area_1 = outer_radius_1**2-inner_radius_1**2
+                area_2 = outer_radius_2**2-inner_radius_2**2
+                transposes.append((casing_blocks[i2],casing_blocks[i1],area_1/area_2))
+    return (blocks,transposes)
+
+@profiling.timed('form_A_many_casings')
 def form_A_many_casings(xs,
                         ys,
                         frequency=0.125,
@@ -720,6 +1174,9 @@ def form_A_many_casings(xs,
                         casing_conductivities=1.0e7,
                         outer_radii=0.1095,
                         inner_radii=0.1095-0.0134,
+                        n_workers=None,
+                        executor=None,
+                        shared_memory=True,
                         **kwargs):
     '''
     Form coefficient matrix to solve for casing current densities
@@ -727,100 +1184,83 @@ def form_A_many_casings(xs,
     Follows Tang et al., 2015
     Uses e^(iwt) time dependence
     xs and ys are list-likes of x/y locations of casings
-    frequency, background_conductivity are single values
+    frequency is a single value
     All other arguments can be single values or list-likes
     If single values, they are applied to all casings
     If list-likes, they must be of the same length as xs and ys
+    Per-segment casing conductivity profiles (see form_A) are given as
+    a list-like with one scalar or array per casing
+    Casing i occupies rows and columns sum(nums_segments[:i]):sum(nums_segments[:i+1])
 
-    kwargs are unused
+    Diagonal blocks are computed once for each distinct set of casing properties.
+    Inter-casing blocks are computed one-way and transposed if segment lengths
+    and background conductivities are equal, and both ways otherwise.
+    If background conductivities differ, each block uses the background conductivity
+    of the receiving casing (the casing of its rows).
+
+    Inter-casing blocks are independent, and can be computed in parallel:
+    n_workers: number of processes in a concurrent.futures.ProcessPoolExecutor
+    executor: an existing concurrent.futures executor to use instead
+    If neither is given, blocks are computed serially
+    shared_memory: if True, A_full is assembled in multiprocessing.shared_memory
+        and workers write blocks into it in place, instead of returning them;
+        it is copied out once, when complete, and the shared memory is released
+
+    kwargs are passed to form_A and form_gamma_casing_to_casing,
+    e.g. cache=cache.MatrixCache(directory) to reuse blocks across runs
     '''
 
-    # Parse arguments
-    num_casings = len(xs)
-    assert (num_casings==len(ys)),'xs and ys must be of the same length'
-    # check if arguments are list-like
-    list_like = {}
-    arguments = {'xs': xs,
-                 'ys': ys,
-                 'background_conductivities': background_conductivities,
-                 'casing_lengths': casing_lengths,
-                 'nums_segments': nums_segments,
-                 'casing_conductivities': casing_conductivities, 
-                 'outer_radii': outer_radii,
-                 'inner_radii': inner_radii
-                }
-    # ensure that all dictionary values are lists of length num_casings,
-    # see which arguments were passed in as scalars
-    for key, value in arguments.items():
-        try:
-            # TypeError if value is not a list
-            num_elements = len(value)
-            # AssertionError if list is not of correct length
-            assert num_elements==num_casings, '{} must either be a scalar or have the same length as xs and ys'.format(key)
-            list_like[key] = True
-        except TypeError:
-            # value is a scalar
-            list_like[key] = False
-            # make it a list of num_casings elements
-            arguments[key] = [value]*num_casings
+    casings = _many_casings_arguments(xs,
+                                      ys,
+                                      background_conductivities=background_conductivities,
+                                      casing_lengths=casing_lengths,
+                                      nums_segments=nums_segments,
+                                      casing_conductivities=casing_conductivities,
+                                      outer_radii=outer_radii,
+                                      inner_radii=inner_radii)
+    num_casings = len(casings)
 
     # Create A and fill entries
-    total_segments = sum(arguments['nums_segments'])
-    A_full = 0j*np.zeros((total_segments,total_segments))
-
-    # If all casings are identical, aside from x and y locations
-    properties_list_like = [is_list for key, is_list in list_like.items() if not key in ['xs', 'ys']]
-    if not any(properties_list_like):
-        # only compute inter-casing matrices one-way, and reuse.
-        # form diagonal block intra-casing matrix (only need one)
-        A_diag = form_A(frequency=frequency,
-                        background_conductivity=background_conductivities,
-                        casing_conductivity=casing_conductivities,
-                        outer_radius=outer_radii,
-                        inner_radius=inner_radii,
-                        casing_length=casing_lengths,
-                        num_segments=nums_segments,
-                        **kwargs)
-        for i1, (x1, y1, background_conductivity, casing_length, num_segments,
-                 casing_conductivity, outer_radius, inner_radius
-                ) in enumerate(zip(*arguments.values())):
-            i1_start = i1*num_segments
-            i1_end = (i1+1)*num_segments
-            A_full[i1_start:i1_end, i1_start:i1_end] = A_diag
-            # form all needed inter-casing interaction matrices
-            for i2 in range(i1+1, num_casings):
-                x2 = xs[i2]
-                y2 = ys[i2]
-                i2_start = i2*num_segments
-                i2_end = (i2+1)*num_segments
-                A_full[i1_start:i1_end,i2_start:i2_end] = -form_gamma_casing_to_casing(
-                    x1,
-                    y1,
-                    casing_length,
-                    num_segments,
-                    x2,
-                    y2,
-                    casing_length,
-                    num_segments,
-                    frequency=frequency,
-                    background_conductivity=background_conductivity,
-                    outer_radius_1=outer_radius,
-                    inner_radius_1=inner_radius,
-                    outer_radius_2=outer_radius,
-                    inner_radius_2=inner_radius,
-                    both_interactions=False,
-                    **kwargs)
-                # exploit symmetry
-                A_full[i2_start:i2_end,i1_start:i1_end] = A_full.T[i2_start:i2_end,i1_start:i1_end]
+    # casing i occupies rows and columns offsets[i]:offsets[i+1]
+    offsets = np.concatenate([[0],np.cumsum([casing[4] for casing in casings])]).astype(int)
+    total_segments = offsets[-1]
+    shape = (total_segments,total_segments)
+    casing_blocks = [slice(offsets[i],offsets[i+1]) for i in range(num_casings)]
+    shm = None
+    if shared_memory and (n_workers is not None or executor is not None):
+        from multiprocessing import shared_memory as sm
+        shm = sm.SharedMemory(create=True,size=max(total_segments**2*16,1))
+        A_full = np.ndarray(shape,dtype=complex,buffer=shm.buf)
+        A_full[:] = 0
     else:
-        raise NotImplementedError('casings of different sizes or properties has not yet been implemented')
-        '''
-        # must compute inter-casing matrices both ways
-        if list_like['background_conductivities']:
-            # must also call casing-to-casing for each background conductivity
-        else:
-            # can use both 12 and 21 matrices from casing-to-casing
-        '''
+        A_full = np.zeros(shape,dtype=complex)
+
+    try:
+        # diagonal intra-casing blocks, computed once for each distinct set of casing properties
+        diagonal_cache = {}
+        for i1, casing in enumerate(casings):
+            A_full[casing_blocks[i1],casing_blocks[i1]] = _diagonal_block(casing,frequency,
+                                                                          diagonal_cache,**kwargs)
+
+        # collect all needed inter-casing interaction matrices
+        blocks, transposes = _casing_to_casing_blocks(casings,casing_blocks,frequency,**kwargs)
+        _fill_casing_to_casing_blocks(A_full,blocks,
+                                      n_workers=n_workers,
+                                      executor=executor,
+                                      shared_name=None if shm is None else shm.name)
+        for (rows,columns,scale) in transposes:
+            A_full[rows,columns] = A_full[columns,rows].T*scale
+        if shm is not None:
+            # the only copy of the assembled matrix, out of shared memory
+            A_full = np.array(A_full)
+    finally:
+        if shm is not None:
+            try:
+                shm.close()
+            except BufferError:
+                # after an error, views of the buffer may still be referenced by the traceback
+                pass
+            shm.unlink()
     return A_full
 
 
@@ -937,6 +1377,8 @@ def VEB_Ez(x, y, z,
            conductivity=1,
            frequency=1,
            current=1,
+           method='quad',
+           order=10,
            epsabs=1e-20,
            epsrel=1e-12,
            limit=200,
@@ -946,13 +1388,24 @@ def VEB_Ez(x, y, z,
     x,y,z are location of observation, either as scalars or arrays
     xp,yp,zp1,zp2 are locations of ends of bipole
     Derived from Hohmann and Ward
-    Integrated using quadrature (scipy.integrate.quad)
     Uses e^(iwt) time dependence
+
+    method: 'quad' integrates VED_Ez using quadrature (scipy.integrate.quad),
+                x,y,z,zp1,zp2 must be scalars; epsabs, epsrel, limit and kwargs go to quad
+            'analytic' uses _VEB_Ez_analytic, with order Gauss-Legendre nodes,
+                and broadcasts over arrays of x,y,z,xp,yp,zp1,zp2
     See Wait, 1952 for analytic integration in terms of 
     generalized cosine and sine integrals.
     '''
     k_squared = -1j*2*np.pi*frequency*mu0*conductivity
     drho_squared = (x-xp)**2+(y-yp)**2
+    if method=='analytic':
+        return _VEB_Ez_analytic(z,zp1,zp2,drho_squared,k_squared,
+                                conductivity=conductivity,
+                                current=current,
+                                order=order)
+    elif method!='quad':
+        raise ValueError('method '+method+' not recognized')
     return _VEB_Ez(z,zp1,zp2,drho_squared,k_squared,
                    conductivity=conductivity,
                    current=current,
@@ -961,6 +1414,8 @@ def VEB_Ez(x, y, z,
                    limit=limit,
                    **kwargs)
 
+@profiling.timed('_VEB_Ez')
+@scalar_kernel_memo
 def _VEB_Ez(z,zp1,zp2,
             drho_squared,
             k_squared,
@@ -990,6 +1445,241 @@ def _VEB_Ez(z,zp1,zp2,
                      )[0]
     return current*ez
 
+@profiling.timed('_VEB_Ez_analytic')
+def _VEB_Ez_analytic(z,zp1,zp2,
+                     drho_squared,
+                     k_squared,
+                     conductivity=1,
+                     current=1,
+                     order=10):
+    '''
+    z component of electric field due to a vertical electric bipole, without scipy.integrate.quad
+    Vectorized alternative to _VEB_Ez: z,zp1,zp2,drho_squared can be arrays
+        that broadcast against each other, e.g. all (zi, zj) pairs of two casings
+    Derived from Hohmann and Ward
+    Uses e^(iwt) time dependence
+
+    In a wholespace, Ez = (d^2/dz^2 + k^2) G / (4 pi sigma), with G = exp(-ikr)/r.
+    The d^2/dz^2 term integrates exactly over the bipole to dG/dz at its ends.
+    The k^2 term is the integral of G, Wait's (1952) generalized cosine and sine integral;
+    with dz = rho*sinh(t) it becomes the integral of exp(-ik rho cosh(t)) dt,
+    which is smooth and is integrated with order Gauss-Legendre nodes.
+    The image term is treated the same way.
+    drho_squared is floored at 1e-24 (1e-12 m) so that coaxial bipoles stay finite
+    '''
+    rho = np.sqrt(np.maximum(drho_squared,1e-24))
+    ik = 1j*np.sqrt(k_squared)
+    # dz from observation to bipole ends: true bipole (z-zp) and image (z+zp)
+    ends = np.array([z-zp1, z-zp2, z+zp2, z+zp1])
+    r = np.sqrt(rho**2+ends**2)
+    ikr = 1j*np.sqrt(k_squared*r**2)
+    dG = -np.exp(-ikr)*(1+ikr)*ends/r**3
+    derivative_term = (dG[0]-dG[1]) - (dG[2]-dG[3])
+
+    # generalized cosine and sine integrals by Gauss-Legendre quadrature
+    nodes, weights = np.polynomial.legendre.leggauss(order)
+    t = np.arcsinh(ends/rho)
+    # true bipole from z-zp2 to z-zp1, image from z+zp1 to z+zp2
+    t_lower = np.array([t[1],t[3]])[...,None]
+    t_upper = np.array([t[0],t[2]])[...,None]
+    t_nodes = (t_upper+t_lower)/2 + (t_upper-t_lower)/2*nodes
+    rho_cosh = np.sqrt(rho**2+(rho*np.sinh(t_nodes))**2)
+    integrals = np.dot(np.exp(-ik*rho_cosh),weights)*(t_upper-t_lower)[...,0]/2
+    integral_term = k_squared*(integrals[0]-integrals[1])
+
+    ez = (derivative_term+integral_term)/4/np.pi/conductivity
+    return current*ez
+
+def VED_Ex(x,y,z,xp=0,yp=0,zp=0,conductivity=1,frequency=1,moment=1):
+    '''
+    x component of electric field due to a vertical electric dipole in a halfspace
+    x,y,z are location of observation in the halfspace or at its surface, either as scalars or arrays
+    xp,yp,zp are location of dipole
+    Derived from Ward and Hohmann
+    Uses e^(iwt) time dependence
+    '''
+    k_squared = -1j*2*np.pi*frequency*mu0*conductivity
+    drho_squared = (x-xp)**2+(y-yp)**2
+    return moment*_VED_Eh(x-xp,zp,z,drho_squared,k_squared,conductivity)
+
+def VED_Ey(x,y,z,xp=0,yp=0,zp=0,conductivity=1,frequency=1,moment=1):
+    '''
+    y component of electric field due to a vertical electric dipole in a halfspace
+    x,y,z are location of observation in the halfspace or at its surface, either as scalars or arrays
+    xp,yp,zp are location of dipole
+    Derived from Ward and Hohmann
+    Uses e^(iwt) time dependence
+    '''
+    k_squared = -1j*2*np.pi*frequency*mu0*conductivity
+    drho_squared = (x-xp)**2+(y-yp)**2
+    return moment*_VED_Eh(y-yp,zp,z,drho_squared,k_squared,conductivity)
+
+def _VED_Eh(dh,zp,z,drho_squared,k_squared,conductivity):
+    '''
+    Horizontal component of electric field due to a vertical electric dipole in halfspace
+    Mostly, helper function for VED_Ex and VED_Ey to avoid recomputing k
+    dh is horizontal distance from dipole to observation along the component (x-xp or y-yp)
+    drho_squared is square of horizontal distance from observation to dipole, as scalar or array
+    z is vertical location of observation, either as scalar or array
+    zp is vertical location of dipole
+    Like _VED_Ez, the image is a dipole of opposite moment at -zp
+    Uses e^(iwt) time dependence
+    '''
+    Eh_true = _VED_Eh_wholespace(dh,drho_squared,z-zp,k_squared,conductivity)
+    Eh_image = _VED_Eh_wholespace(dh,drho_squared,z+zp,k_squared,conductivity)
+    return Eh_true-Eh_image
+
+def _VED_Eh_wholespace(dh,drho_squared,dz,k_squared,conductivity,moment=1):
+    '''
+    Horizontal component of electric field due to a vertical electric dipole in wholespace
+    dh is horizontal distance from dipole to observation along the component
+    drho_squared is square of horizontal distance from observation to dipole, as scalar or array
+    dz is vertical location from observation to dipole, either as scalar or array
+    k_squared = -i omega mu_0 sigma
+    Derived from Ward and Hohmann
+    Uses e^(iwt) time dependence
+    '''
+    r_squared = drho_squared+dz**2
+    kr_squared = k_squared*r_squared
+    ikr = 1j*np.sqrt(kr_squared)
+    r = np.sqrt(r_squared)
+    eh = dh*dz*np.exp(-ikr)/r**5
+    eh *= 3+3*ikr-kr_squared
+    eh *= moment/4/np.pi/conductivity
+    return eh
+
+def _VEB_Eh(dh,z,zp1,zp2,drho_squared,k_squared,conductivity=1,current=1):
+    '''
+    Horizontal component of electric field due to a vertical electric bipole in halfspace
+    from zp1 to zp2, with uniform current
+    The horizontal field of a dipole is a z derivative, so it integrates exactly to
+    terms at the ends of the bipole and of its image
+    Arguments are as in _VED_Eh
+    Uses e^(iwt) time dependence
+    '''
+    def end_term(dz):
+        r = np.sqrt(drho_squared+dz**2)
+        ikr = 1j*np.sqrt(k_squared)*r
+        return dh*(1+ikr)*np.exp(-ikr)/r**3
+    eh = end_term(z-zp2)-end_term(z-zp1)
+    # image
+    eh += end_term(z+zp2)-end_term(z+zp1)
+    return current*eh/4/np.pi/conductivity
+
+@profiling.timed('casing_e_field_matrix')
+def casing_e_field_matrix(x,y,z,zs,xp=0,yp=0,dz=None,conductivity=1,frequency=1):
+    '''
+    Horizontal electric field at observations due to casing segments, per unit moment
+    x,y,z are location of observation in the halfspace or at its surface, either as scalars or arrays
+    zs are depths of casing segment centers, as an array
+    xp,yp are location of casing
+    dz: None treats segments as vertical dipoles at zs (like empymod dipoles)
+        otherwise, segments are vertical bipoles from zs-dz/2 to zs+dz/2, with uniform current
+    Returns (Ex, Ey), each of shape np.shape(x)+(len(zs),)
+    The fields due to casing segment moments (current*dz) are Ex.dot(moments), Ey.dot(moments)
+    frequency can be an array: Ex and Ey then have shape np.shape(frequency)+np.shape(x)+(len(zs),)
+    Uses e^(iwt) time dependence
+    '''
+    observation_ndim = np.broadcast(x,y,z).ndim
+    frequency = np.reshape(frequency,np.shape(frequency)+(1,)*(observation_ndim+1))
+    k_squared = -1j*2*np.pi*frequency*mu0*conductivity
+    dx = np.asarray(x-xp)[...,None]
+    dy = np.asarray(y-yp)[...,None]
+    z = np.asarray(z)[...,None]
+    drho_squared = dx**2+dy**2
+    if dz is None:
+        return (_VED_Eh(dx,zs,z,drho_squared,k_squared,conductivity),
+                _VED_Eh(dy,zs,z,drho_squared,k_squared,conductivity))
+    zp1 = zs-dz/2
+    zp2 = zs+dz/2
+    return (_VEB_Eh(dx,z,zp1,zp2,drho_squared,k_squared,conductivity,current=1/dz),
+            _VEB_Eh(dy,z,zp1,zp2,drho_squared,k_squared,conductivity,current=1/dz))
+
+def VED_Hx(x,y,z,xp=0,yp=0,zp=0,conductivity=1,frequency=1,moment=1):
+    '''
+    x component of magnetic field due to a vertical electric dipole in a halfspace
+    x,y,z are location of observation in the halfspace or at its surface, either as scalars or arrays
+    xp,yp,zp are location of dipole
+    The field is zero at the surface and in the air (TM mode only)
+    Derived from Ward and Hohmann
+    Uses e^(iwt) time dependence
+    '''
+    k_squared = -1j*2*np.pi*frequency*mu0*conductivity
+    drho_squared = (x-xp)**2+(y-yp)**2
+    return -moment*_VED_H(y-yp,zp,z,drho_squared,k_squared)
+
+def VED_Hy(x,y,z,xp=0,yp=0,zp=0,conductivity=1,frequency=1,moment=1):
+    '''
+    y component of magnetic field due to a vertical electric dipole in a halfspace
+    x,y,z are location of observation in the halfspace or at its surface, either as scalars or arrays
+    xp,yp,zp are location of dipole
+    The field is zero at the surface and in the air (TM mode only)
+    Derived from Ward and Hohmann
+    Uses e^(iwt) time dependence
+    '''
+    k_squared = -1j*2*np.pi*frequency*mu0*conductivity
+    drho_squared = (x-xp)**2+(y-yp)**2
+    return moment*_VED_H(x-xp,zp,z,drho_squared,k_squared)
+
+def _VED_H(dh,zp,z,drho_squared,k_squared):
+    '''
+    Magnetic field due to a vertical electric dipole in halfspace, as dh/rho times H_phi
+    Mostly, helper function for VED_Hx and VED_Hy to avoid recomputing k
+    Hx uses dh = -(y-yp), Hy uses dh = x-xp
+    Like _VED_Ez, the image is a dipole of opposite moment at -zp
+    Uses e^(iwt) time dependence
+    '''
+    H_true = _VED_H_wholespace(dh,drho_squared,z-zp,k_squared)
+    H_image = _VED_H_wholespace(dh,drho_squared,z+zp,k_squared)
+    return H_true-H_image
+
+def _VED_H_wholespace(dh,drho_squared,dz,k_squared,moment=1):
+    '''
+    Magnetic field due to a vertical electric dipole in wholespace, as dh/rho times H_phi
+    drho_squared is square of horizontal distance from observation to dipole, as scalar or array
+    dz is vertical location from observation to dipole, either as scalar or array
+    k_squared = -i omega mu_0 sigma
+    Derived from Ward and Hohmann
+    Uses e^(iwt) time dependence
+    '''
+    r = np.sqrt(drho_squared+dz**2)
+    ikr = 1j*np.sqrt(k_squared)*r
+    return moment*dh*(1+ikr)*np.exp(-ikr)/r**3/4/np.pi
+
+@profiling.timed('casing_h_field_matrix')
+def casing_h_field_matrix(x,y,z,zs,xp=0,yp=0,dz=None,conductivity=1,frequency=1,order=10):
+    '''
+    Magnetic field at observations due to casing segments, per unit moment
+    x,y,z are location of observation in the halfspace or at its surface, either as scalars or arrays
+    zs are depths of casing segment centers, as an array
+    xp,yp are location of casing
+    dz: None treats segments as vertical dipoles at zs (like empymod dipoles)
+        otherwise, segments are vertical bipoles from zs-dz/2 to zs+dz/2, with uniform current,
+        integrated with order Gauss-Legendre nodes
+    Returns (Hx, Hy, Hz), each of shape np.shape(x)+(len(zs),)
+    The fields due to casing segment moments (current*dz) are Hx.dot(moments), etc.
+    Hz is zero, and so are Hx and Hy at the surface
+    Multiply by mu0 for B
+    Uses e^(iwt) time dependence
+    '''
+    k_squared = -1j*2*np.pi*frequency*mu0*conductivity
+    dx = np.asarray(x-xp)[...,None]
+    dy = np.asarray(y-yp)[...,None]
+    z = np.asarray(z)[...,None]
+    drho_squared = dx**2+dy**2
+    if dz is None:
+        nodes = np.zeros(1)
+        weights = 2*np.ones(1)
+    else:
+        nodes, weights = np.polynomial.legendre.leggauss(order)
+        nodes = nodes*dz/2
+    hx = 0j
+    hy = 0j
+    for (node,weight) in zip(nodes,weights):
+        hx -= weight/2*_VED_H(dy,zs+node,z,drho_squared,k_squared)
+        hy += weight/2*_VED_H(dx,zs+node,z,drho_squared,k_squared)
+    return (hx,hy,np.zeros(hx.shape,dtype=complex))
+
 def form_b_analytic(wire_path_x,
                     wire_path_y,
                     wire_current = 1,
@@ -997,6 +1687,7 @@ def form_b_analytic(wire_path_x,
                     background_conductivity=0.18,
                     casing_length=1365,
                     num_segments=280,
+                    segment_edges=None,
                     **kwargs):
     '''
     Form the RHS vector to solve for casing currents
@@ -1008,11 +1699,14 @@ def form_b_analytic(wire_path_x,
         These are nodes, so there must be k+1 elements where k is # wire dipoles
     
     NOTE: the analytic solution for Ez only uses the grounding points
+
+    segment_edges: optional segment edges, see form_gamma_casing
+
+    frequency can be an array: returns array of shape np.shape(frequency)+(num_segments,)
     '''
-    dz = casing_length/num_segments
-    zs = dz*(np.arange(num_segments)+0.5)
-    xs = np.zeros(num_segments)
-    ys = np.zeros(num_segments)
+    zs = _segment_centers(casing_length,num_segments,segment_edges)[0]
+    xs = np.zeros(len(zs))
+    ys = np.zeros(len(zs))
     return HEB_Ez(xs,ys,zs,
                   xp1=wire_path_x[0],
                   yp1=wire_path_y[0],
@@ -1020,19 +1714,68 @@ def form_b_analytic(wire_path_x,
                   yp2=wire_path_y[-1],
                   current=wire_current,
                   conductivity=background_conductivity,
-                  frequency=frequency)
+                  frequency=np.asarray(frequency)[...,None])
 
 
+def form_b_segments(wire_path_x,
+                    wire_path_y,
+                    wire_current=1,
+                    frequency=0.125,
+                    background_conductivity=0.18,
+                    casing_length=1365,
+                    num_segments=280,
+                    order=32,
+                    segment_edges=None,
+                    **kwargs):
+    '''
+    Form the RHS vector to solve for casing currents
+    by integrating Ez due to every wire segment along the wire path
+    Uses e^(iwt) time dependence
+
+    wire_path_x, wire_path_y: nodes of the wire path, as in form_b_analytic
+    order: number of Gauss-Legendre nodes per wire segment, at which HED_Ez is summed
+        more nodes are needed for wire segments close to the casing
+
+    All casing segments x wire segments x nodes are evaluated at once.
+    In a halfspace, Ez only depends on the grounding points,
+    so this converges to form_b_analytic for any path
+    segment_edges: optional segment edges, see form_gamma_casing
+
+    frequency can be an array: returns array of shape np.shape(frequency)+(num_segments,)
+    '''
+    zs = _segment_centers(casing_length,num_segments,segment_edges)[0]
+    nodes, weights = np.polynomial.legendre.leggauss(order)
+    dx = np.diff(wire_path_x)
+    dy = np.diff(wire_path_y)
+    # node locations, of shape (wire segments, nodes)
+    t = (nodes+1)/2
+    xps = wire_path_x[:-1,None]+dx[:,None]*t
+    yps = wire_path_y[:-1,None]+dy[:,None]*t
+    moments = wire_current*np.sqrt(dx**2+dy**2)[:,None]*weights/2
+    ez = HED_Ez(0,0,zs[:,None,None],
+                xp=xps,
+                yp=yps,
+                angle=np.arctan2(dy,dx)[:,None],
+                conductivity=background_conductivity,
+                frequency=np.asarray(frequency)[...,None,None,None],
+                moment=moments)
+    return ez.sum(axis=(-2,-1))
+
 def form_b(*args,method='analytic',**kwargs):
     '''
     Wrapper,
     to be changed to point to different functions when desired
+    method: 'analytic' uses form_b_analytic (grounding points only)
+            'segments' uses form_b_segments (every wire segment)
     '''
     if method=='analytic':
         return form_b_analytic(*args,**kwargs)
+    elif method=='segments':
+        return form_b_segments(*args,**kwargs)
     else:
         raise ValueError('method '+method+' not recognized')
 
+@profiling.timed('form_b_many_casings')
 def form_b_many_casings(wire_path_x,
                         wire_path_y,
                         casings_x,
@@ -1053,58 +1796,98 @@ def form_b_many_casings(wire_path_x,
         These are nodes, so there must be k+1 elements where k is # wire dipoles
     
     NOTE: the analytic solution for Ez only uses the grounding points
-    This method is untested.
+    See form_b_many_sources to form the RHS for many wires at once
     '''
+    return form_b_many_sources(wire_path_x[0],
+                               wire_path_y[0],
+                               wire_path_x[-1],
+                               wire_path_y[-1],
+                               casings_x,
+                               casings_y,
+                               wire_currents=wire_current,
+                               frequency=frequency,
+                               background_conductivities=background_conductivities,
+                               casing_lengths=casing_lengths,
+                               nums_segments=nums_segments)[:,0]
 
+@profiling.timed('form_b_many_sources')
+def form_b_many_sources(xp1,
+                        yp1,
+                        xp2,
+                        yp2,
+                        casings_x=[0],
+                        casings_y=[0],
+                        wire_currents=1,
+                        frequency=0.125,
+                        background_conductivities=0.18,
+                        casing_lengths=1365,
+                        nums_segments=280,
+                        block_size=2**13,
+                        **kwargs):
+    '''
+    Form the RHS vectors to solve for casing currents for many wires and many casings
+    Uses e^(iwt) time dependence
+
+    xp1,yp1,xp2,yp2 are grounding points of each wire, as scalars or arrays of length n_sources
+    wire_currents is a scalar or an array of length n_sources
+    casings_x and casings_y are casing locations
+    background_conductivities, casing_lengths and nums_segments are scalars
+        or lists of the same length as casings_x and casings_y
+    block_size: number of elements of b computed per HEB_Ez call
+
+    Returns array of shape (total_segments, n_sources),
+    with casings stacked in the same order as form_A_many_casings
+
+    NOTE: the analytic solution for Ez only uses the grounding points
+    '''
     # Parse arguments
     num_casings = len(casings_x)
     assert (num_casings==len(casings_y)),'casings_x and casings_y must be of the same length'
-    # check if arguments are list-like
-    list_like = {}
     arguments = {'casings_x': casings_x,
                  'casings_y': casings_y,
                  'background_conductivities': background_conductivities,
                  'casing_lengths': casing_lengths,
                  'nums_segments': nums_segments
                 }
-    # ensure that all dictionary values are lists of length num_casings,
-    # see which arguments were passed in as scalars
+    # ensure that all dictionary values are lists of length num_casings
     for key, value in arguments.items():
         try:
             # TypeError if value is not a list
             num_elements = len(value)
             # AssertionError if list is not of correct length
             assert num_elements==num_casings, '{} must either be a scalar or have the same length as casings_x and casings_y'.format(key)
-            list_like[key] = True
         except TypeError:
             # value is a scalar
-            list_like[key] = False
             # make it a list of num_casings elements
             arguments[key] = [value]*num_casings
 
-    # Create b and fill entries
-    # total_segments = sum(arguments['nums_segments'])
-    # b_full = 0j*np.zeros((total_segments,total_segments))
-    b_full = np.array([])
-
-    # If all background_conductivities are identical
-    # properties_list_like = [is_list for key, is_list in list_like.items() if key in ['background_conductivities']]
-
-    for i1, (casing_x, casing_y, background_conductivity, casing_length, num_segments
-            ) in enumerate(zip(*arguments.values())):
-        dz = casing_length/num_segments
-        zs = dz*(np.arange(num_segments)+0.5)
-        xs = np.array([casing_x]*num_segments)
-        ys = np.array([casing_y]*num_segments)
-        b_casing = HEB_Ez(xs,ys,zs,
-                          xp1=wire_path_x[0],
-                          yp1=wire_path_y[0],
-                          xp2=wire_path_x[-1],
-                          yp2=wire_path_y[-1],
-                          current=wire_current,
-                          conductivity=background_conductivity,
-                          frequency=frequency)
-        b_full = np.append(b_full, b_casing)
+    # sources along the last axis
+    xp1, yp1, xp2, yp2, wire_currents = np.broadcast_arrays(
+        *[np.atleast_1d(a)[None,:] for a in (xp1,yp1,xp2,yp2,wire_currents)])
+    num_sources = xp1.shape[1]
 
+    # every casing's segments along the first axis, with the casing's location and
+    # background conductivity repeated for each segment, so that b is filled by
+    # broadcast HEB_Ez calls over all casings and sources at once; rows are done in
+    # blocks of about block_size elements, which keeps temporaries in cache
+    nums_segments = np.asarray(arguments['nums_segments'])
+    casing = np.repeat(np.arange(num_casings),nums_segments)
+    starts = np.cumsum(nums_segments)-nums_segments
+    dz = (np.asarray(arguments['casing_lengths'],dtype=float)/nums_segments)[casing]
+    zs = (dz*(np.arange(len(casing))-starts[casing]+0.5))[:,None]
+    x = np.asarray(arguments['casings_x'],dtype=float)[casing][:,None]
+    y = np.asarray(arguments['casings_y'],dtype=float)[casing][:,None]
+    conductivity = np.asarray(arguments['background_conductivities'],dtype=float)[casing][:,None]
+    b_full = np.empty((len(casing),num_sources),dtype=complex)
+    block_rows = max(1,block_size//num_sources)
+    for start in range(0,len(casing),block_rows):
+        rows = slice(start,start+block_rows)
+        b_full[rows] = HEB_Ez(x[rows],y[rows],zs[rows],
+                              xp1=xp1,
+                              yp1=yp1,
+                              xp2=xp2,
+                              yp2=yp2,
+                              current=wire_currents,
+                              conductivity=conductivity[rows],
+                              frequency=frequency)
     return b_full
-
@@ -1,10 +1,12 @@
 '''
 Functions for modeling in a halfspace that require empymod
+empymod is imported when a function is first called, not with this module
 '''
 
 import numpy as np
-from empymod import bipole
-from halfspace import form_A, form_b
+from .halfspace import form_A, form_b, casing_e_field_matrix, casing_h_field_matrix
+from .solvers import solve_casing_fft
+from . import profiling
 
 def wire_e_field_casing_halfspace(tx_path_x,
                                   tx_path_y,
@@ -19,7 +21,10 @@ def wire_e_field_casing_halfspace(tx_path_x,
                                   inner_radius=0.1095-0.0134,
                                   num_segments=280,
                                   wire_current=1,
-                                  srcpts=1):
+                                  srcpts=1,
+                                  solver='dense',
+                                  casing_method='empymod',
+                                  casing_areas=None):
     '''
     Compute EM field at rx_locations due to a wire in the presence of a steel casing
 
@@ -41,13 +46,233 @@ def wire_e_field_casing_halfspace(tx_path_x,
         NOT YET IMPLEMENTED: casing assumed to be at 0,0
         casing well head location, as [x,y]
 
+    casing_conductivity, casing_areas :
+        casing conductivity, a scalar or per-segment array, and optional
+        per-segment cross-sectional areas, e.g. for corroded intervals
+        (see halfspace.casing_diagonal); b does not depend on either
+
+    solver : str
+        'dense' forms A and uses np.linalg.solve
+        'fft' uses solvers.solve_casing_fft, which never forms A;
+            raises RuntimeError if it does not converge
+
+    casing_method : str
+        'empymod' computes the field due to casing segments with empymod
+        'analytic' uses closed-form halfspace fields (halfspace.casing_e_field_matrix),
+            for receivers in the halfspace or at its surface; the wire field still uses empymod
+
     '''
+    sources = _wire_and_casing_sources(tx_path_x,
+                                       tx_path_y,
+                                       frequency,
+                                       background_conductivity=background_conductivity,
+                                       casing_length=casing_length,
+                                       casing_conductivity=casing_conductivity,
+                                       outer_radius=outer_radius,
+                                       inner_radius=inner_radius,
+                                       num_segments=num_segments,
+                                       casing_areas=casing_areas,
+                                       wire_current=wire_current,
+                                       solver=solver)
+    return _receiver_fields(sources,
+                            rx_ex_locations,
+                            rx_ey_locations,
+                            frequency,
+                            background_conductivity=background_conductivity,
+                            srcpts=srcpts,
+                            casing_method=casing_method)
 
-    # TODO: set well location as origin
-    # TODO: compute magnetic field too
-    # TODO: allow multiple frequencies
+def wire_e_field_casing_halfspace_chunks(tx_path_x,
+                                         tx_path_y,
+                                         rx_ex_locations,
+                                         rx_ey_locations,
+                                         frequency,
+                                         background_conductivity=0.18,
+                                         casing_location=[0,0],
+                                         casing_length=1365,
+                                         casing_conductivity=1.0e7,
+                                         outer_radius=0.1095,
+                                         inner_radius=0.1095-0.0134,
+                                         num_segments=280,
+                                         wire_current=1,
+                                         srcpts=1,
+                                         solver='dense',
+                                         casing_method='empymod',
+                                         chunk_size=4096,
+                                         out=None,
+                                         casing_areas=None):
+    '''
+    Compute EM field at many receivers due to a wire in the presence of a steel casing,
+    chunk_size receivers at a time
 
-    # discretizations
+    A generator: casing currents are solved once, on the first iteration,
+    then each iteration computes fields for the next chunk of receivers,
+    so peak memory depends on chunk_size, not on the number of receivers
+
+    Parameters are as in wire_e_field_casing_halfspace, and
+
+    rx_ex_locations, rx_ey_locations : list of lists
+        Ex and Ey receivers must be the same in number
+
+    chunk_size : int
+        number of receivers per chunk
+
+    out : array, optional
+        complex array of shape (2, number of receivers), e.g. from np.lib.format.open_memmap
+        out[0] and out[1] are filled with Ex and Ey, chunk by chunk
+
+    Yields
+    ------
+    (receivers, field_x, field_y) for each chunk, where receivers is the slice of
+    receiver indices in the chunk, and field_x and field_y are total fields
+    '''
+    num_receivers = _num_receivers(rx_ex_locations)
+    if _num_receivers(rx_ey_locations)!=num_receivers:
+        raise ValueError('rx_ex_locations and rx_ey_locations must have the same number of receivers')
+    sources = _wire_and_casing_sources(tx_path_x,
+                                       tx_path_y,
+                                       frequency,
+                                       background_conductivity=background_conductivity,
+                                       casing_length=casing_length,
+                                       casing_conductivity=casing_conductivity,
+                                       outer_radius=outer_radius,
+                                       inner_radius=inner_radius,
+                                       num_segments=num_segments,
+                                       casing_areas=casing_areas,
+                                       wire_current=wire_current,
+                                       solver=solver)
+    for start in range(0,num_receivers,chunk_size):
+        receivers = slice(start,min(start+chunk_size,num_receivers))
+        fields = _receiver_fields(sources,
+                                  _chunk_locations(rx_ex_locations,receivers,num_receivers),
+                                  _chunk_locations(rx_ey_locations,receivers,num_receivers),
+                                  frequency,
+                                  background_conductivity=background_conductivity,
+                                  srcpts=srcpts,
+                                  casing_method=casing_method)
+        field_x, field_y = fields[:2]
+        if out is not None:
+            out[0,receivers] = field_x
+            out[1,receivers] = field_y
+        yield (receivers,field_x,field_y)
+
+def wire_h_field_casing_halfspace(tx_path_x,
+                                  tx_path_y,
+                                  rx_locations,
+                                  frequency,
+                                  background_conductivity=0.18,
+                                  casing_location=[0,0],
+                                  casing_length=1365,
+                                  casing_conductivity=1.0e7,
+                                  outer_radius=0.1095,
+                                  inner_radius=0.1095-0.0134,
+                                  num_segments=280,
+                                  wire_current=1,
+                                  srcpts=1,
+                                  solver='dense',
+                                  casing_method='empymod',
+                                  casing_areas=None):
+    '''
+    Compute magnetic field H at rx_locations due to a wire in the presence of a steel casing
+    Multiply by mu0 for B
+
+    Parameters are as in wire_e_field_casing_halfspace, except
+
+    rx_locations : list
+        point receiver coordinates (m), at the surface or in boreholes:
+            empymod format
+            [x,y,z]
+            z can be a scalar even when x and y are arrays
+
+    casing_method : str
+        'empymod' computes the field due to casing segments with empymod
+        'analytic' uses closed-form halfspace fields (halfspace.casing_h_field_matrix)
+
+    Returns
+    -------
+    (field_x,field_y,field_z,
+     field_x_wire,field_y_wire,field_z_wire,
+     field_x_casing,field_y_casing,field_z_casing)
+    '''
+    from empymod import bipole
+    sources = _wire_and_casing_sources(tx_path_x,
+                                       tx_path_y,
+                                       frequency,
+                                       background_conductivity=background_conductivity,
+                                       casing_length=casing_length,
+                                       casing_conductivity=casing_conductivity,
+                                       outer_radius=outer_radius,
+                                       inner_radius=inner_radius,
+                                       num_segments=num_segments,
+                                       casing_areas=casing_areas,
+                                       wire_current=wire_current,
+                                       solver=solver)
+    lx = sources['lx']
+    ly = sources['ly']
+    zs = sources['zs']
+    rx_locations = list(rx_locations[:3])
+    # receiver azimuth and dip of x, y and z components
+    orientations = [[0,0],[90,0],[0,90]]
+    empy_args = {'depth':[0],
+                 'res':[1e20,1/background_conductivity],
+                 'freqtime':frequency,
+                 'verb':0,
+                 'epermH':[0,1],
+                 'epermV':[0,1],
+                 'mrec':True}
+
+    # compute field due to wire, all segments in one bipole call per component
+    fields_wire = []
+    for orientation in orientations:
+        all_field_wire = bipole(src=[lx[:-1],lx[1:],ly[:-1],ly[1:],1e-2,1e-2],
+                                rec=rx_locations+orientation,
+                                srcpts=srcpts,
+                                **empy_args)
+        fields_wire.append(np.dot(all_field_wire,sources['wire_moment']))
+
+    # compute field due to casing
+    if casing_method=='empymod':
+        # casing segments as vertical (dip 90) unit dipoles
+        all_fields_casing = [bipole(src=[np.zeros(num_segments),np.zeros(num_segments),zs,0,90],
+                                    rec=rx_locations+orientation,
+                                    **empy_args)
+                             for orientation in orientations]
+    elif casing_method=='analytic':
+        all_fields_casing = casing_h_field_matrix(*rx_locations,zs,
+                                                  conductivity=background_conductivity,
+                                                  frequency=frequency)
+    else:
+        raise ValueError('casing_method '+casing_method+' not recognized')
+    fields_casing = [np.dot(all_field_casing,sources['casing_moment'])
+                     for all_field_casing in all_fields_casing]
+
+    # sum all fields
+    fields = [field_wire+field_casing
+              for (field_wire,field_casing) in zip(fields_wire,fields_casing)]
+
+    return tuple(fields+fields_wire+fields_casing)
+
+def _num_receivers(rx_locations):
+    '''
+    Number of receivers in empymod format [x1,x2,y1,y2,z1,z2], where entries may be scalars
+    '''
+    return np.broadcast(*[np.asarray(c) for c in rx_locations]).size
+
+def _chunk_locations(rx_locations,receivers,num_receivers):
+    '''
+    Receivers in slice receivers, as full-length arrays in empymod format
+    '''
+    return [np.broadcast_to(c,(num_receivers,))[receivers] for c in rx_locations]
+
+def _wire_sources(tx_path_x,tx_path_y,wire_current=1):
+    '''
+    Wire path without zero length segments
+    Returns a dictionary of wire sources:
+        'lx', 'ly': wire path without zero length segments
+        'wire_moment': wire segment moments
+    '''
+    tx_path_x = np.asarray(tx_path_x)
+    tx_path_y = np.asarray(tx_path_y)
     # need wire segment lengths
     dlx = np.diff(tx_path_x)
     dly = np.diff(tx_path_y)
@@ -58,6 +283,37 @@ def wire_e_field_casing_halfspace(tx_path_x,
     lx = tx_path_x[nonzero_length]
     ly = tx_path_y[nonzero_length]
     segment_lengths = all_segment_lengths[all_segment_lengths>0]
+    return {'lx':lx,
+            'ly':ly,
+            'wire_moment':segment_lengths*wire_current}
+
+def _wire_and_casing_sources(tx_path_x,
+                             tx_path_y,
+                             frequency,
+                             background_conductivity=0.18,
+                             casing_length=1365,
+                             casing_conductivity=1.0e7,
+                             outer_radius=0.1095,
+                             inner_radius=0.1095-0.0134,
+                             num_segments=280,
+                             wire_current=1,
+                             solver='dense',
+                             casing_areas=None):
+    '''
+    Solve for casing currents due to a wire
+    Returns a dictionary of wire and casing sources:
+        'lx', 'ly': wire path without zero length segments
+        'wire_moment': wire segment moments
+        'zs': casing segment depths
+        'casing_moment': casing segment moments
+    '''
+    # TODO: set well location as origin
+    # TODO: allow multiple frequencies
+
+    # discretizations
+    sources = _wire_sources(tx_path_x,tx_path_y,wire_current=wire_current)
+    lx = sources['lx']
+    ly = sources['ly']
     # casing discretization
     dz = casing_length/num_segments
     zs = dz*(np.arange(num_segments)+0.5)
@@ -73,69 +329,113 @@ def wire_e_field_casing_halfspace(tx_path_x,
                    'casing_length':casing_length,
                    'outer_radius':outer_radius,
                    'inner_radius':inner_radius,
-                   'num_segments':num_segments}
-    # form A
-    A = form_A(**casing_args)
+                   'num_segments':num_segments,
+                   'casing_areas':casing_areas}
     # form b
     b = form_b(**casing_args)
     # solve for casing currents
-    j_casing = np.linalg.solve(A,b)
+    if solver=='dense':
+        A = form_A(**casing_args)
+        with profiling.timer('np.linalg.solve'):
+            j_casing = np.linalg.solve(A,b)
+    elif solver=='fft':
+        j_casing, stats = solve_casing_fft(b,**casing_args)
+        if stats['info']!=0:
+            raise RuntimeError('solve_casing_fft did not converge: gmres info '+str(stats['info'])
+                               +', relative residual '+'{:.1e}'.format(stats['residual_norm']))
+    else:
+        raise ValueError('solver '+solver+' not recognized')
     casing_area = np.pi*(outer_radius**2-inner_radius**2)
     i_casing = j_casing*casing_area
     casing_moment = i_casing*dz
 
+    sources['zs'] = zs
+    sources['casing_moment'] = casing_moment
+    return sources
+
+def _receiver_fields(sources,
+                     rx_ex_locations,
+                     rx_ey_locations,
+                     frequency,
+                     background_conductivity=0.18,
+                     srcpts=1,
+                     casing_method='empymod'):
+    '''
+    Fields at receivers due to sources from _wire_and_casing_sources
+    frequency can be an array, with sources['casing_moment'] of shape (len(frequency), num_segments):
+    each source type is then evaluated for all frequencies at once, and fields have
+    shape (len(frequency), number of receivers)
+    Returns (field_x,field_y,field_x_wire,field_y_wire,field_x_casing,field_y_casing)
+    '''
+    from empymod import bipole
+    lx = sources['lx']
+    ly = sources['ly']
+    zs = sources['zs']
+    num_segments = len(zs)
+    frequencies = np.atleast_1d(frequency)
+    casing_moment = np.asarray(sources['casing_moment']).reshape(len(frequencies),num_segments)
+
     # convert inputs to empymod format
+    # squeeze=False: results are always (frequencies, receivers, sources)
     empy_wire_args = {'src':[lx[:-1],lx[1:],ly[:-1],ly[1:],1e-2,1e-2],
                       'rec':rx_ex_locations,
                       'depth':[0],
                       'res':[1e20,1/background_conductivity],
-                      'freqtime':frequency,
+                      'freqtime':frequencies,
                       'srcpts':srcpts,
                       'verb':0,
                       'epermH':[0,1],
-                      'epermV':[0,1]}
+                      'epermV':[0,1],
+                      'squeeze':False}
     rx_locations_ex_average = [(rx_ex_locations[0]+rx_ex_locations[1])/2, 
                                (rx_ex_locations[2]+rx_ex_locations[3])/2,
                                (rx_ex_locations[4]+rx_ex_locations[5])/2]
     rx_locations_ey_average = [(rx_ey_locations[0]+rx_ey_locations[1])/2, 
                                (rx_ey_locations[2]+rx_ey_locations[3])/2,
                                (rx_ey_locations[4]+rx_ey_locations[5])/2]
-    empy_casing_args = {'src':[0,0,zs],
-                        'rec':rx_locations_ex_average,
+    # casing segments as vertical (dip 90) unit dipoles, all in one bipole call
+    empy_casing_args = {'src':[np.zeros(num_segments),np.zeros(num_segments),zs,0,90],
+                        'rec':rx_locations_ex_average+[0,0],
                         'depth':[0],
                         'res':[1e20,1/background_conductivity],
-                        'freqtime':frequency,
-                        'ab':13,
+                        'freqtime':frequencies,
                         'verb':0,
                         'epermH':[0,1],
-                        'epermV':[0,1]}
+                        'epermV':[0,1],
+                        'squeeze':False}
 
     # compute field due to wire
-    wire_moment = segment_lengths*wire_current
+    wire_moment = sources['wire_moment']
     all_field_x_wire = bipole(**empy_wire_args)
     field_x_wire = np.dot(all_field_x_wire,wire_moment)
     empy_wire_args['rec'] = rx_ey_locations
     all_field_y_wire = bipole(**empy_wire_args)
     field_y_wire = np.dot(all_field_y_wire,wire_moment)
 
-    # compute field due to casing
-    field_x_casing = 1j*np.zeros(len(rx_ex_locations[0]))
-    field_y_casing = 1j*np.zeros(len(rx_ey_locations[0]))
-    for iz in range(len(zs)):
-        empy_casing_args['src'] = [0,0,zs[iz]]
-        # x
-        empy_casing_args['rec'] = rx_locations_ex_average
-        empy_casing_args['ab'] = 13
-        field_x_casing += casing_moment[iz]*dipole(**empy_casing_args)
-        # y
-        empy_casing_args['rec'] = rx_locations_ey_average
-        empy_casing_args['ab'] = 23
-        field_y_casing += casing_moment[iz]*dipole(**empy_casing_args)
+    # compute field due to casing, as (frequencies, receivers, segments)
+    if casing_method=='empymod':
+        # x: receiver azimuth 0, dip 0
+        all_field_x_casing = bipole(**empy_casing_args)
+        # y: receiver azimuth 90, dip 0
+        empy_casing_args['rec'] = rx_locations_ey_average+[90,0]
+        all_field_y_casing = bipole(**empy_casing_args)
+    elif casing_method=='analytic':
+        field_args = {'conductivity':background_conductivity,
+                      'frequency':frequencies}
+        all_field_x_casing = casing_e_field_matrix(*rx_locations_ex_average,zs,**field_args)[0]
+        all_field_y_casing = casing_e_field_matrix(*rx_locations_ey_average,zs,**field_args)[1]
+        all_field_x_casing = all_field_x_casing.reshape(len(frequencies),-1,num_segments)
+        all_field_y_casing = all_field_y_casing.reshape(len(frequencies),-1,num_segments)
+    else:
+        raise ValueError('casing_method '+casing_method+' not recognized')
+    field_x_casing = np.einsum('frs,fs->fr',all_field_x_casing,casing_moment)
+    field_y_casing = np.einsum('frs,fs->fr',all_field_y_casing,casing_moment)
 
     # sum all fields
     field_x = field_x_casing + field_x_wire
     field_y = field_y_casing + field_y_wire
 
-    return(field_x,field_y,field_x_wire,field_y_wire,field_x_casing,field_y_casing)
-
-
+    fields = (field_x,field_y,field_x_wire,field_y_wire,field_x_casing,field_y_casing)
+    if np.ndim(frequency)==0:
+        fields = tuple(field[0] for field in fields)
+    return fields
@@ -0,0 +1,316 @@
+'''
+Reusable casing model for many source configurations
+
+The coefficient matrix of a casing depends only on the casing and background,
+not on the source, so CasingModel forms it once and keeps its LU factorization.
+Each new wire layout then costs one RHS, one pair of triangular solves,
+and, with receivers set, one matrix-vector product for the casing field.
+
+    model = CasingModel(frequency=1,background_conductivity=0.1)
+    model.set_receivers(rx_x,rx_y,rx_z)
+    ex, ey = model.casing_fields(wire_paths)
+    derivatives = model.jacobian(wire_paths)
+
+casing_fields is only the field due to casing currents. The field of the wire itself
+does not depend on the casing and is not computed by CasingModel: the total field
+needs the wire field of each layout at the receivers (e.g. from empymod.bipole),
+which total_fields adds to the casing field. Wire fields can be computed once and
+reused, e.g. for every casing profile or casing model at the same frequency:
+
+    ex, ey = model.total_fields(wire_paths,(ex_wire,ey_wire))
+
+Derivatives of the casing field (jacobian) use the adjoint method: one solve
+with the transpose of the factorized A for all receivers, instead of a forward
+solve per parameter. They cover only the casing field of casing_fields: the
+wire field, and its dependence on background conductivity, is not included.
+The background conductivity term is a central finite-difference approximation.
+
+Per-segment casing conductivity and area (e.g. corroded intervals) only change
+the diagonal of A (see halfspace.casing_diagonal). Gamma is kept, so
+set_casing_profile refactorizes without recomputing it, and solve_profile solves
+for a modified profile with a Woodbury update of the existing factorization:
+
+    b = model.form_b(wire_paths)
+    for profile in damage_scenarios:
+        j = model.solve_profile(b,casing_conductivity=profile)
+
+classes:
+
+CasingModel
+
+Uses e^(iwt) time dependence, like halfspace.form_A and halfspace.form_b
+'''
+
+import numpy as np
+from .halfspace import (form_gamma_casing, form_b_many_sources, casing_e_field_matrix,
+                        casing_diagonal)
+from . import profiling
+
+class CasingModel:
+    '''
+    A single casing in a halfspace, with its coefficient matrix factorized once
+
+    Attributes:
+        gamma: Gamma matrix (e^(iwt) convention), from halfspace.form_gamma_casing
+        diagonal: 1/effective casing conductivity of each segment, from halfspace.casing_diagonal
+        A: coefficient matrix, diag(diagonal) - gamma
+        lu: LU factorization of A, from scipy.linalg.lu_factor
+        zs: depths of segment centers
+        dz: segment length
+        area: nominal casing cross-sectional area; current densities j are
+            segment currents divided by this area
+        receiver_matrix: None, or casing field per unit segment moment at receivers,
+            of shape (2, number of receivers, num_segments), from set_receivers
+        receivers: None, or receiver locations (x, y, z) from set_receivers
+    '''
+    def __init__(self,
+                 frequency=0.125,
+                 background_conductivity=0.18,
+                 casing_conductivity=1.0e7,
+                 outer_radius=0.1095,
+                 inner_radius=0.1095-0.0134,
+                 casing_length=1365,
+                 num_segments=280,
+                 filter_name='key201',
+                 cache=None,
+                 casing_areas=None):
+        '''
+        Form and factorize the coefficient matrix
+        Parameters are as in halfspace.form_A: casing_conductivity can be per-segment,
+        and casing_areas are optional per-segment cross-sectional areas
+        '''
+        self.frequency = frequency
+        self.background_conductivity = background_conductivity
+        self.casing_conductivity = casing_conductivity
+        self.casing_areas = casing_areas
+        self.outer_radius = outer_radius
+        self.inner_radius = inner_radius
+        self.casing_length = casing_length
+        self.num_segments = num_segments
+        self.filter_name = filter_name
+        self.dz = casing_length/num_segments
+        self.zs = self.dz*(np.arange(num_segments)+0.5)
+        self.area = np.pi*(outer_radius**2-inner_radius**2)
+        self.gamma = form_gamma_casing(frequency=frequency,
+                                       background_conductivity=background_conductivity,
+                                       outer_radius=outer_radius,
+                                       inner_radius=inner_radius,
+                                       casing_length=casing_length,
+                                       num_segments=num_segments,
+                                       filter_name=filter_name,
+                                       cache=cache)
+        self.factorize()
+        self.receiver_matrix = None
+        self.receivers = None
+
+    def factorize(self):
+        '''
+        Form A from gamma, casing_conductivity and casing_areas, and compute its LU factorization
+        '''
+        from scipy.linalg import lu_factor
+        self.diagonal = self._diagonal(self.casing_conductivity,self.casing_areas)
+        self.A = np.diag(self.diagonal+0j) - self.gamma
+        with profiling.timer('lu_factor'):
+            self.lu = lu_factor(self.A)
+
+    def _diagonal(self,casing_conductivity,casing_areas):
+        return casing_diagonal(casing_conductivity,
+                               num_segments=self.num_segments,
+                               casing_areas=casing_areas,
+                               outer_radius=self.outer_radius,
+                               inner_radius=self.inner_radius)
+
+    def set_casing_profile(self,casing_conductivity=None,casing_areas=None):
+        '''
+        Change the casing conductivity and/or per-segment areas (None keeps the current values),
+        and refactorize A; gamma is reused
+        '''
+        if casing_conductivity is not None:
+            self.casing_conductivity = casing_conductivity
+        if casing_areas is not None:
+            self.casing_areas = casing_areas
+        self.factorize()
+
+    @profiling.timed('CasingModel.solve_profile')
+    def solve_profile(self,b,casing_conductivity=None,casing_areas=None):
+        '''
+        Casing current densities for RHS b (see solve) with a different casing profile,
+        without changing the model (None keeps the model's values)
+
+        The profile only changes the diagonal of A, at the r segments where it differs:
+        A' = A + E D E^T, with E the r columns of the identity and D the diagonal changes.
+        By the Woodbury identity, with x = A^-1 b and Y = A^-1 E,
+            A'^-1 b = x - Y (D^-1 + E^T Y)^-1 E^T x
+        which costs r + 1 triangular solves with the existing factorization
+        and an r x r solve, instead of a new factorization
+        '''
+        if casing_conductivity is None:
+            casing_conductivity = self.casing_conductivity
+        if casing_areas is None:
+            casing_areas = self.casing_areas
+        change = self._diagonal(casing_conductivity,casing_areas) - self.diagonal
+        changed = np.flatnonzero(change)
+        x = self.solve(b)
+        if len(changed)==0:
+            return x
+        from scipy.linalg import lu_solve
+        E = np.zeros((self.num_segments,len(changed)))
+        E[changed,np.arange(len(changed))] = 1
+        with profiling.timer('lu_solve'):
+            Y = lu_solve(self.lu,E)
+        capacitance = np.diag(1/change[changed]) + Y[changed]
+        return x - Y.dot(np.linalg.solve(capacitance,x[changed]))
+
+    def form_b(self,wire_paths,wire_current=1,background_conductivity=None):
+        '''
+        RHS for each wire layout
+        wire_paths is a list of (wire_path_x,wire_path_y), as in halfspace.form_b
+        All RHS are formed at once with halfspace.form_b_many_sources
+        background_conductivity: defaults to the model's
+        Returns array of shape (num_segments, len(wire_paths))
+        '''
+        if background_conductivity is None:
+            background_conductivity = self.background_conductivity
+        return form_b_many_sources([x[0] for (x,y) in wire_paths],
+                                   [y[0] for (x,y) in wire_paths],
+                                   [x[-1] for (x,y) in wire_paths],
+                                   [y[-1] for (x,y) in wire_paths],
+                                   wire_currents=wire_current,
+                                   frequency=self.frequency,
+                                   background_conductivities=background_conductivity,
+                                   casing_lengths=self.casing_length,
+                                   nums_segments=self.num_segments)
+
+    def solve(self,b):
+        '''
+        Casing current densities for RHS b, of shape (num_segments,) or (num_segments, n_sources)
+        '''
+        from scipy.linalg import lu_solve
+        with profiling.timer('lu_solve'):
+            return lu_solve(self.lu,b)
+
+    def currents(self,wire_paths,wire_current=1):
+        '''
+        Casing current densities for each wire layout in wire_paths (see form_b)
+        Returns array of shape (num_segments, len(wire_paths))
+        '''
+        return self.solve(self.form_b(wire_paths,wire_current=wire_current))
+
+    def moments(self,j_casing):
+        '''
+        Segment moments (current*dz) from casing current densities
+        '''
+        return j_casing*self.area*self.dz
+
+    def set_receivers(self,x,y,z):
+        '''
+        Precompute the casing field per unit segment moment at point receivers,
+        with halfspace.casing_e_field_matrix
+        x,y,z are receiver locations in the halfspace or at its surface, as arrays
+        (z can be a scalar)
+        '''
+        self.receivers = (x,y,z)
+        self.receiver_matrix = self._receiver_matrix(self.background_conductivity)
+
+    def _receiver_matrix(self,background_conductivity):
+        '''
+        Casing field per unit segment moment at the receivers, of shape (2, number of receivers, num_segments)
+        '''
+        Ex, Ey = casing_e_field_matrix(*self.receivers,self.zs,
+                                       conductivity=background_conductivity,
+                                       frequency=self.frequency)
+        return np.stack((Ex,Ey))
+
+    def casing_fields(self,wire_paths,wire_current=1):
+        '''
+        Ex and Ey at receivers (see set_receivers) due to casing currents,
+        for each wire layout in wire_paths (see form_b)
+        The field due to the wire itself is not included
+        Returns (Ex, Ey), each of shape (number of receivers, len(wire_paths))
+        '''
+        if self.receiver_matrix is None:
+            raise ValueError('receivers not set, call set_receivers first')
+        moments = self.moments(self.currents(wire_paths,wire_current=wire_current))
+        fields = self.receiver_matrix.dot(moments)
+        return (fields[0],fields[1])
+
+    def total_fields(self,wire_paths,wire_fields,wire_current=1):
+        '''
+        Ex and Ey at receivers (see set_receivers) due to casing currents and the wire,
+        for each wire layout in wire_paths (see form_b)
+        wire_fields: precomputed (Ex, Ey) of the wires alone, for the same receivers,
+            layouts and wire_current, each of shape (number of receivers, len(wire_paths))
+        Returns (Ex, Ey), each of shape (number of receivers, len(wire_paths))
+        '''
+        casing_fields = self.casing_fields(wire_paths,wire_current=wire_current)
+        wire_fields = [np.asarray(field) for field in wire_fields]
+        if len(wire_fields)!=2 or any(field.shape!=casing_fields[0].shape for field in wire_fields):
+            raise ValueError('wire_fields must be (Ex, Ey), each of shape '+str(casing_fields[0].shape))
+        return (casing_fields[0]+wire_fields[0],casing_fields[1]+wire_fields[1])
+
+    @profiling.timed('CasingModel.jacobian')
+    def jacobian(self,wire_paths,wire_current=1,background_relative_step=1e-4):
+        '''
+        Derivatives of the casing fields at receivers (see casing_fields)
+        for each wire layout in wire_paths, by the adjoint method
+        The wire field is not included
+
+        With d = R j (R: receiver_matrix times segment area and length) and A j = b,
+        the adjoint fields W = R A^-1 are found with one transposed solve with the
+        factorization of A, for all receivers at once. Then
+            dd/dp = dR/dp j + W (db/dp - dA/dp j)
+        Casing conductivity enters only the diagonal of A, so its derivatives are
+        products of W and j, and are exact.
+        Background conductivity enters gamma, b and R, whose derivatives are
+        approximated by central finite differences, with a step of
+        background_relative_step times background_conductivity; the error is
+        of second order in the step. This evaluates gamma, b and R at two
+        conductivities (two gamma assemblies, no extra factorizations or solves)
+
+        Returns a dictionary of derivatives of (Ex, Ey) with respect to
+            'background_conductivity': finite-difference approximation,
+                shape (2, number of receivers, len(wire_paths))
+            'casing_conductivity': the same change of conductivity in every segment, same shape
+            'segment_conductivity': conductivity of each segment,
+                shape (2, number of receivers, num_segments, len(wire_paths))
+        '''
+        from scipy.linalg import lu_solve
+        if self.receiver_matrix is None:
+            raise ValueError('receivers not set, call set_receivers first')
+        scale = self.area*self.dz
+        num_receivers = self.receiver_matrix.shape[1]
+        R = self.receiver_matrix.reshape(2*num_receivers,self.num_segments)*scale
+        with profiling.timer('lu_solve'):
+            # A^T W^T = R^T
+            W = lu_solve(self.lu,R.T,trans=1).T
+        b = self.form_b(wire_paths,wire_current=wire_current)
+        j = self.solve(b)
+
+        # casing conductivity: the diagonal is proportional to 1/sigma_k,
+        # so dA/dsigma_k = -e_k e_k^T diagonal_k/sigma_k
+        casing_conductivity = np.broadcast_to(self.casing_conductivity,(self.num_segments,))
+        d_segment = W[:,:,None]*(j*(self.diagonal/casing_conductivity)[:,None])[None]
+
+        # background conductivity, by central differences: dA/dsigma = -dgamma/dsigma
+        step = background_relative_step*self.background_conductivity
+        conductivities = self.background_conductivity+np.array([step,-step])
+        gammas = [form_gamma_casing(frequency=self.frequency,
+                                    background_conductivity=conductivity,
+                                    outer_radius=self.outer_radius,
+                                    inner_radius=self.inner_radius,
+                                    casing_length=self.casing_length,
+                                    num_segments=self.num_segments,
+                                    filter_name=self.filter_name)
+                  for conductivity in conductivities]
+        bs = [self.form_b(wire_paths,wire_current=wire_current,background_conductivity=conductivity)
+              for conductivity in conductivities]
+        receiver_matrices = [self._receiver_matrix(conductivity) for conductivity in conductivities]
+        d_gamma = (gammas[0]-gammas[1])/(2*step)
+        d_b = (bs[0]-bs[1])/(2*step)
+        d_R = (receiver_matrices[0]-receiver_matrices[1]).reshape(R.shape)*scale/(2*step)
+        d_background = d_R.dot(j) + W.dot(d_b+d_gamma.dot(j))
+
+        shape = (2,num_receivers)
+        return {'background_conductivity':d_background.reshape(shape+(-1,)),
+                'casing_conductivity':d_segment.sum(axis=1).reshape(shape+(-1,)),
+                'segment_conductivity':d_segment.reshape(shape+d_segment.shape[1:])}
@@ -0,0 +1,109 @@
+'''
+Opt-in timing instrumentation for the hot paths of em_casing
+
+Instrumented functions record call counts and accumulated wall time in registry,
+but only while it is enabled; when disabled, the cost is one attribute check per call.
+
+    from em_casing import halfspace
+    with halfspace.profile() as stats:
+        A = halfspace.form_A_many_casings(xs,ys)
+    print(stats.summary())
+
+Times are inclusive: a Gij call includes its hankel_J1_201 calls.
+Calls made in worker processes (form_A_many_casings with n_workers) are not recorded.
+
+functions:
+
+timed
+timer
+count
+profile
+'''
+
+import functools
+import time
+from contextlib import contextmanager
+
+class Registry:
+    '''
+    Call counts and accumulated time, by name
+    '''
+    def __init__(self):
+        self.enabled = False
+        self.stats = {}
+
+    def add(self,name,elapsed=0.0,calls=1):
+        entry = self.stats.setdefault(name,[0,0.0])
+        entry[0] += calls
+        entry[1] += elapsed
+
+    def reset(self):
+        self.stats = {}
+
+    def summary(self):
+        '''
+        Table of calls, total and mean time per name, slowest first
+        '''
+        lines = ['{:<36} {:>12} {:>12} {:>12}'.format('name','calls','total (s)','mean (ms)')]
+        for name, (calls, total) in sorted(self.stats.items(),key=lambda item:-item[1][1]):
+            mean = 1e3*total/calls if calls else 0.0
+            lines.append('{:<36} {:>12d} {:>12.4f} {:>12.4f}'.format(name,calls,total,mean))
+        return '\n'.join(lines)
+
+registry = Registry()
+
+def timed(name):
+    '''
+    Decorator that records calls to and time spent in a function under name
+    '''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args,**kwargs):
+            if not registry.enabled:
+                return function(*args,**kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args,**kwargs)
+            finally:
+                registry.add(name,time.perf_counter()-start)
+        return wrapper
+    return decorator
+
+class timer:
+    '''
+    Context manager that records one call to and the time spent in a block under name
+    '''
+    def __init__(self,name):
+        self.name = name
+
+    def __enter__(self):
+        if registry.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self,*exc_info):
+        if registry.enabled:
+            registry.add(self.name,time.perf_counter()-self.start)
+        return False
+
+def count(name,calls=1):
+    '''
+    Record calls under name without timing them, e.g. integrand evaluations
+    '''
+    if registry.enabled:
+        registry.add(name,calls=calls)
+
+@contextmanager
+def profile(reset=True):
+    '''
+    Enable instrumentation within a with block; yields the registry
+    reset: clear previous records first
+    '''
+    was_enabled = registry.enabled
+    if reset:
+        registry.reset()
+    registry.enabled = True
+    try:
+        yield registry
+    finally:
+        registry.enabled = was_enabled
@@ -0,0 +1,264 @@
+'''
+Structured solvers for casing current densities
+
+For a uniformly discretized casing, A = I/sigma_c - Gamma,
+where Gamma is a Toeplitz plus a Hankel matrix (see halfspace.gamma_casing_toeplitz_hankel).
+Products with A are computed with FFTs in O(N log N) time and O(N) memory,
+without forming A.
+
+For many casings (halfspace.form_A_many_casings, compression.form_A_many_casings_compressed),
+solve_many_casings uses Krylov iterations preconditioned with the factorized
+single-casing blocks, which avoids factorizing the full matrix.
+
+functions:
+
+casing_operator
+circulant_preconditioner
+solve_casing_fft
+block_jacobi_preconditioner
+solve_many_casings
+
+Uses e^(iwt) time dependence, like halfspace.form_A
+'''
+
+import numpy as np
+from .halfspace import gamma_casing_toeplitz_hankel, casing_diagonal
+from . import profiling
+
+def _next_fast_len(n):
+    from scipy.fft import next_fast_len
+    return next_fast_len(n)
+
+def casing_operator(frequency=0.125,
+                    background_conductivity=0.18,
+                    casing_conductivity=1.0e7,
+                    outer_radius=0.1095,
+                    inner_radius=0.1095-0.0134,
+                    casing_length=1365,
+                    num_segments=280,
+                    filter_name='key201',
+                    casing_areas=None,
+                    **kwargs):
+    '''
+    Matrix-free coefficient matrix for a single casing, as a scipy LinearOperator
+    Same matrix as halfspace.form_A, but stores only the 3N-1 distinct elements of Gamma
+    Matvecs use FFTs: O(N log N) per product
+    casing_conductivity and casing_areas can be per-segment, see halfspace.casing_diagonal
+
+    Also returns the Toeplitz and Hankel elements of Gamma (e^(iwt) convention)
+    Returns (operator, toeplitz, hankel)
+
+    kwargs are unused
+    '''
+    from scipy.sparse.linalg import LinearOperator
+    toeplitz, hankel = gamma_casing_toeplitz_hankel(
+        frequency=frequency,
+        background_conductivity=background_conductivity,
+        outer_radius=outer_radius,
+        inner_radius=inner_radius,
+        casing_length=casing_length,
+        num_segments=num_segments,
+        filter_name=filter_name)
+    # convert to e^(iwt) convention
+    toeplitz = np.conj(toeplitz)
+    hankel = np.conj(hankel)
+    n = num_segments
+    diagonal = casing_diagonal(casing_conductivity,
+                               num_segments=n,
+                               casing_areas=casing_areas,
+                               outer_radius=outer_radius,
+                               inner_radius=inner_radius)
+
+    # symmetric Toeplitz matvec: embed in a circulant matrix of size >= 2N-1
+    n_toeplitz = _next_fast_len(2*n-1)
+    circulant = np.zeros(n_toeplitz,dtype=complex)
+    circulant[:n] = toeplitz
+    circulant[n_toeplitz-n+1:] = toeplitz[:0:-1]
+    toeplitz_fft = np.fft.fft(circulant)
+    # Hankel matvec: (Hx)_i = sum_j h[i+j] x[j] is a convolution of h with reversed x
+    n_hankel = _next_fast_len(3*n-2)
+    hankel_fft = np.fft.fft(hankel,n_hankel)
+
+    def matmat(x):
+        x = x.reshape(n,-1)
+        tx = np.fft.ifft(toeplitz_fft[:,None]*np.fft.fft(x,n_toeplitz,axis=0),axis=0)[:n]
+        hx = np.fft.ifft(hankel_fft[:,None]*np.fft.fft(x[::-1],n_hankel,axis=0),axis=0)[n-1:2*n-1]
+        return diagonal[:,None]*x - tx - hx
+
+    def matvec(x):
+        return matmat(x).ravel()
+
+    operator = LinearOperator((n,n),matvec=matvec,matmat=matmat,dtype=complex)
+    return (operator,toeplitz,hankel)
+
+def circulant_preconditioner(toeplitz,casing_conductivity=1.0e7):
+    '''
+    Preconditioner for I/sigma_c - Gamma, as a scipy LinearOperator
+    Inverts Strang's circulant approximation to the Toeplitz part, I/sigma_c - T,
+    with FFTs; the Hankel (image) part is ignored
+    toeplitz is the first column of T in the e^(iwt) convention (see casing_operator)
+    '''
+    from scipy.sparse.linalg import LinearOperator
+    n = len(toeplitz)
+    circulant = toeplitz.copy()
+    circulant[n//2+1:] = toeplitz[1:n-n//2][::-1]
+    eigenvalues = 1/casing_conductivity - np.fft.fft(circulant)
+
+    def matmat(x):
+        x = x.reshape(n,-1)
+        return np.fft.ifft(np.fft.fft(x,axis=0)/eigenvalues[:,None],axis=0)
+
+    def matvec(x):
+        return matmat(x).ravel()
+
+    return LinearOperator((n,n),matvec=matvec,matmat=matmat,dtype=complex)
+
+@profiling.timed('solve_casing_fft')
+def solve_casing_fft(b,
+                     frequency=0.125,
+                     background_conductivity=0.18,
+                     casing_conductivity=1.0e7,
+                     outer_radius=0.1095,
+                     inner_radius=0.1095-0.0134,
+                     casing_length=1365,
+                     num_segments=280,
+                     rtol=1e-10,
+                     maxiter=None,
+                     restart=50,
+                     precondition=True,
+                     casing_areas=None,
+                     **kwargs):
+    '''
+    Solve A j = b for casing current densities of a single casing
+    with GMRES, FFT-accelerated matvecs and a circulant preconditioner
+    A is the matrix from halfspace.form_A, which is never formed
+    With per-segment casing properties (see casing_operator), the preconditioner
+    uses the mean of the diagonal
+    b is the RHS vector, e.g. from halfspace.form_b
+    Uses e^(iwt) time dependence
+
+    rtol, maxiter and restart are passed to scipy.sparse.linalg.gmres
+
+    Returns (j, stats), where stats is a dictionary with
+        'info': gmres exit code (0 if converged)
+        'iterations': number of inner iterations
+        'residual_norm': relative residual norm ||b - A j||/||b||
+
+    kwargs are passed to casing_operator
+    '''
+    from scipy.sparse.linalg import gmres
+    A, toeplitz, hankel = casing_operator(frequency=frequency,
+                                          background_conductivity=background_conductivity,
+                                          casing_conductivity=casing_conductivity,
+                                          outer_radius=outer_radius,
+                                          inner_radius=inner_radius,
+                                          casing_length=casing_length,
+                                          num_segments=num_segments,
+                                          casing_areas=casing_areas,
+                                          **kwargs)
+    if precondition:
+        diagonal = casing_diagonal(casing_conductivity,
+                                   num_segments=num_segments,
+                                   outer_radius=outer_radius,
+                                   inner_radius=inner_radius,
+                                   casing_areas=casing_areas)
+        M = circulant_preconditioner(toeplitz,casing_conductivity=1/np.mean(diagonal))
+    else:
+        M = None
+    iterations = [0]
+    def count(residual):
+        iterations[0] += 1
+    j, info = gmres(A,b,rtol=rtol,atol=0,restart=restart,maxiter=maxiter,M=M,
+                    callback=count,callback_type='pr_norm')
+    residual_norm = np.linalg.norm(b-A.matvec(j))/np.linalg.norm(b)
+    stats = {'info':info,
+             'iterations':iterations[0],
+             'residual_norm':residual_norm}
+    return (j,stats)
+
+def block_jacobi_preconditioner(diagonal_blocks,casing_blocks):
+    '''
+    Block-Jacobi preconditioner for many casings, as a scipy LinearOperator
+    Applies the inverse of each intra-casing block of A, via its LU factorization
+    diagonal_blocks: intra-casing blocks of A, one per casing
+        (blocks that are the same array are factorized once)
+    casing_blocks: slice of rows and columns of each casing
+    '''
+    from scipy.linalg import lu_factor, lu_solve
+    from scipy.sparse.linalg import LinearOperator
+    factorizations = {}
+    for A_block in diagonal_blocks:
+        if id(A_block) not in factorizations:
+            with profiling.timer('lu_factor'):
+                factorizations[id(A_block)] = lu_factor(A_block)
+    lus = [factorizations[id(A_block)] for A_block in diagonal_blocks]
+    n = casing_blocks[-1].stop
+
+    def matmat(x):
+        x = x.reshape(n,-1)
+        y = np.empty(x.shape,dtype=complex)
+        for (block,lu) in zip(casing_blocks,lus):
+            y[block] = lu_solve(lu,x[block])
+        return y
+
+    def matvec(x):
+        return matmat(x).ravel()
+
+    return LinearOperator((n,n),matvec=matvec,matmat=matmat,dtype=complex)
+
+@profiling.timed('solve_many_casings')
+def solve_many_casings(A,
+                       b,
+                       casing_blocks=None,
+                       method='gmres',
+                       rtol=1e-10,
+                       maxiter=None,
+                       restart=50,
+                       precondition=True):
+    '''
+    Solve A j = b for casing current densities of many casings
+    with GMRES or BiCGSTAB and a block-Jacobi preconditioner (see block_jacobi_preconditioner)
+    Uses e^(iwt) time dependence
+
+    A: a compression.CompressedCasingOperator, which is applied without forming A,
+        or a dense matrix from halfspace.form_A_many_casings
+    b: RHS vector, e.g. from halfspace.form_b_many_casings
+    casing_blocks: slice of rows and columns of each casing;
+        needed for dense A, taken from A for a CompressedCasingOperator
+    method: 'gmres' or 'bicgstab' (scipy.sparse.linalg)
+    rtol and maxiter are passed to the solver, restart only to gmres
+
+    Returns (j, stats), where stats is a dictionary with
+        'info': solver exit code (0 if converged)
+        'iterations': number of (inner) iterations
+        'residual_norm': relative residual norm ||b - A j||/||b||
+    '''
+    from scipy.sparse.linalg import gmres, bicgstab, aslinearoperator
+    if hasattr(A,'diagonal_blocks'):
+        casing_blocks = A.casing_blocks
+        diagonal_blocks = A.diagonal_blocks
+        operator = A.aslinearoperator()
+    else:
+        if casing_blocks is None:
+            raise ValueError('casing_blocks are needed for a dense A')
+        diagonal_blocks = [A[block,block] for block in casing_blocks]
+        operator = aslinearoperator(A)
+    if precondition:
+        M = block_jacobi_preconditioner(diagonal_blocks,casing_blocks)
+    else:
+        M = None
+    iterations = [0]
+    def count(*args):
+        iterations[0] += 1
+    if method=='gmres':
+        j, info = gmres(operator,b,rtol=rtol,atol=0,restart=restart,maxiter=maxiter,M=M,
+                        callback=count,callback_type='pr_norm')
+    elif method=='bicgstab':
+        j, info = bicgstab(operator,b,rtol=rtol,atol=0,maxiter=maxiter,M=M,callback=count)
+    else:
+        raise ValueError('method '+method+' not recognized')
+    residual_norm = np.linalg.norm(b-operator.matvec(j))/np.linalg.norm(b)
+    stats = {'info':info,
+             'iterations':iterations[0],
+             'residual_norm':residual_norm}
+    return (j,stats)
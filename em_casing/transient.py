@@ -0,0 +1,200 @@
+'''
+Time-domain (transient) responses of a casing in a halfspace
+
+Casing currents and surface fields are computed at the frequencies required by
+a frequency-to-time transform, then transformed to time series with empymod
+(digital linear filters by default; see empymod.utils.check_time for ft and ftarg).
+empymod is imported when a function is first called, not with this module.
+
+Frequencies are processed in chunks of frequency_chunk with halfspace.casing_currents_sweep,
+which computes segment offsets and filter abscissae once per chunk.
+Chunks can be run in parallel with n_workers processes or an existing executor.
+
+signal is as in empymod: 0 impulse response, 1 switch-on, -1 switch-off.
+
+functions:
+
+transient_frequencies
+to_time
+casing_currents_transient
+wire_e_field_casing_halfspace_transient
+
+Frequency responses use e^(iwt) time dependence, like halfspace.form_A and empymod
+'''
+
+import numpy as np
+from .halfspace import casing_currents_sweep
+from .halfspace_empymod import _wire_sources, _receiver_fields
+from . import profiling
+
+def transient_frequencies(times,signal=0,ft='dlf',ftarg=None):
+    '''
+    Frequencies required to compute responses at times with a frequency-to-time transform
+    ft and ftarg are as in empymod.bipole
+    Returns (times, frequencies, ft, ftarg), checked by empymod.utils.check_time
+    '''
+    from empymod.utils import check_time
+    if ftarg is None:
+        ftarg = {}
+    return check_time(np.atleast_1d(times),signal,ft,ftarg,0,new=True)[:4]
+
+@profiling.timed('to_time')
+def to_time(responses,times,frequencies,signal=0,ft='dlf',ftarg=None):
+    '''
+    Transform frequency-domain responses to the time domain
+    responses: array with frequencies along the first axis
+    times, frequencies, ft and ftarg are from transient_frequencies
+    Returns real array of shape (len(times),)+responses.shape[1:]
+    '''
+    from empymod.model import tem
+    responses = np.asarray(responses)
+    shape = responses.shape[1:]
+    responses = responses.reshape(len(frequencies),-1)
+    time_responses, _ = tem(responses,
+                            np.zeros(responses.shape[1]),
+                            frequencies,
+                            times,
+                            signal,
+                            ft,
+                            ftarg)
+    return time_responses.reshape((len(times),)+shape)
+
+def _frequency_chunk_response(frequencies,tx_path_x,tx_path_y,receivers=None,**casing_args):
+    '''
+    Casing current densities and, with receivers, fields for a chunk of frequencies
+    receivers: None, or a dictionary of rx_ex_locations, rx_ey_locations, srcpts and casing_method;
+        casing_args must then include wire_current and background_conductivity
+    Each source type is evaluated for the whole chunk at once (see halfspace_empymod._receiver_fields)
+    Module level so that it can be pickled for process pools
+    Returns (j, fields), with j of shape (len(frequencies), num_segments)
+    and fields None or of shape (len(frequencies), 6, number of receivers),
+    in the order of wire_e_field_casing_halfspace
+    '''
+    if receivers is None:
+        j = casing_currents_sweep(tx_path_x,tx_path_y,frequencies,**casing_args)[2]
+        return (j,None)
+    sources = _wire_sources(tx_path_x,tx_path_y,wire_current=casing_args['wire_current'])
+    A, b, j, zs, dz, area = casing_currents_sweep(sources['lx'],sources['ly'],frequencies,
+                                                  return_segments=True,**casing_args)
+    sources['zs'] = zs
+    sources['casing_moment'] = j*area*dz
+    fields = _receiver_fields(sources,
+                              receivers['rx_ex_locations'],
+                              receivers['rx_ey_locations'],
+                              frequencies,
+                              background_conductivity=casing_args['background_conductivity'],
+                              srcpts=receivers['srcpts'],
+                              casing_method=receivers['casing_method'])
+    return (j,np.stack(fields,axis=1))
+
+def _frequency_responses(frequencies,frequency_chunk=8,n_workers=None,executor=None,**kwargs):
+    '''
+    _frequency_chunk_response for all frequencies, one chunk at a time,
+    serially or with a pool of workers
+    Returns (j, fields) stacked along the frequency axis
+    '''
+    chunks = [frequencies[start:start+frequency_chunk]
+              for start in range(0,len(frequencies),frequency_chunk)]
+    if n_workers is None and executor is None:
+        results = [_frequency_chunk_response(chunk,**kwargs) for chunk in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=n_workers)
+        try:
+            futures = [executor.submit(_frequency_chunk_response,chunk,**kwargs) for chunk in chunks]
+            results = [future.result() for future in futures]
+        finally:
+            if own_executor:
+                executor.shutdown()
+    j = np.concatenate([result[0] for result in results])
+    if results[0][1] is None:
+        return (j,None)
+    return (j,np.concatenate([result[1] for result in results]))
+
+@profiling.timed('casing_currents_transient')
+def casing_currents_transient(wire_path_x,
+                              wire_path_y,
+                              times,
+                              signal=0,
+                              ft='dlf',
+                              ftarg=None,
+                              frequency_chunk=8,
+                              n_workers=None,
+                              executor=None,
+                              **kwargs):
+    '''
+    Casing current densities of a single casing at times, for a wire current
+    with the time dependence given by signal
+    Follows Tang et al., 2015, at each frequency (see halfspace.casing_currents_sweep)
+
+    ft, ftarg: frequency-to-time transform, see transient_frequencies
+    frequency_chunk: frequencies per casing_currents_sweep call (and per task with workers)
+    n_workers: number of processes in a concurrent.futures.ProcessPoolExecutor
+    executor: an existing concurrent.futures executor to use instead
+
+    Returns (times, j), with j of shape (len(times), num_segments)
+
+    kwargs are passed to halfspace.casing_currents_sweep
+    '''
+    times, frequencies, ft, ftarg = transient_frequencies(times,signal=signal,ft=ft,ftarg=ftarg)
+    j, _ = _frequency_responses(frequencies,
+                                frequency_chunk=frequency_chunk,
+                                n_workers=n_workers,
+                                executor=executor,
+                                tx_path_x=wire_path_x,
+                                tx_path_y=wire_path_y,
+                                **kwargs)
+    return (times,to_time(j,times,frequencies,signal=signal,ft=ft,ftarg=ftarg))
+
+@profiling.timed('wire_e_field_casing_halfspace_transient')
+def wire_e_field_casing_halfspace_transient(tx_path_x,
+                                            tx_path_y,
+                                            rx_ex_locations,
+                                            rx_ey_locations,
+                                            times,
+                                            signal=0,
+                                            ft='dlf',
+                                            ftarg=None,
+                                            srcpts=1,
+                                            casing_method='analytic',
+                                            frequency_chunk=8,
+                                            n_workers=None,
+                                            executor=None,
+                                            background_conductivity=0.18,
+                                            wire_current=1,
+                                            **kwargs):
+    '''
+    Time-domain electric field at receivers due to a wire in the presence of a steel casing
+    Transient counterpart of halfspace_empymod.wire_e_field_casing_halfspace
+
+    tx_path_x, tx_path_y, rx_ex_locations, rx_ey_locations, srcpts and casing_method
+        are as in wire_e_field_casing_halfspace ('analytic' by default, since
+        the casing field is needed at every frequency)
+    signal, ft, ftarg, frequency_chunk, n_workers and executor are as in casing_currents_transient
+    Per chunk of frequencies, wire fields take one bipole call per component,
+    and casing fields one casing_e_field_matrix (or bipole) call
+
+    Returns (times,
+             (field_x,field_y,field_x_wire,field_y_wire,field_x_casing,field_y_casing)),
+    where each field is of shape (len(times), number of receivers)
+
+    kwargs are passed to halfspace.casing_currents_sweep
+    '''
+    times, frequencies, ft, ftarg = transient_frequencies(times,signal=signal,ft=ft,ftarg=ftarg)
+    j, fields = _frequency_responses(frequencies,
+                                     frequency_chunk=frequency_chunk,
+                                     n_workers=n_workers,
+                                     executor=executor,
+                                     tx_path_x=tx_path_x,
+                                     tx_path_y=tx_path_y,
+                                     receivers={'rx_ex_locations':rx_ex_locations,
+                                                'rx_ey_locations':rx_ey_locations,
+                                                'srcpts':srcpts,
+                                                'casing_method':casing_method},
+                                     background_conductivity=background_conductivity,
+                                     wire_current=wire_current,
+                                     **kwargs)
+    fields = to_time(fields,times,frequencies,signal=signal,ft=ft,ftarg=ftarg)
+    return (times,tuple(np.moveaxis(fields,1,0)))
@@ -1,6 +1,12 @@
 import numpy as np
 import unittest
 from em_casing import halfspace as chs
+from em_casing import solvers
+from em_casing.cache import MatrixCache
+from em_casing.model import CasingModel
+from em_casing import compression
+from em_casing import halfspace_empymod as che
+from em_casing import transient
 from empymod import bipole,dipole
 
 freq = 0.125
@@ -21,6 +27,26 @@ class Test_halfspace(unittest.TestCase):
         result201 = outer_radius*chs.hankel_J1_201(funii,outer_radius)
         self.assertTrue(np.isclose(result140,result201,atol=1e-20).all())
 
+    def test_batched_dht(self):
+        print('Batched hankel_J1 agrees with a known transform pair and an explicit filter sum')
+        radii = np.array([inner_radius,outer_radius,1.0])
+        # integral 0 -> inf (lamda*exp(-lamda*z) * J1(r*lamda) * d lamda) = r/(z^2+r^2)^(3/2)
+        z = np.array([0.05,0.5,5.0])[:,None]
+        exact = radii/(z**2+radii**2)**1.5
+        for filter_name, rtol in [('key201',1e-12),('gs140',1e-9)]:
+            lamda = chs.hankel_lamda(radii,filter_name)
+            batched = chs.hankel_J1(lamda*np.exp(-lamda*z[...,None]),radii,filter_name)
+            self.assertTrue(np.allclose(batched,exact,rtol=rtol,atol=0))
+        # one radius at a time, with empymod's Key 201 base and J1 weights
+        from empymod.filters import Hankel
+        dlf201 = Hankel().key_201_2012
+        funii = lambda x:chs.fii(x,5,5,freq,con)
+        K = funii(chs.hankel_lamda(radii,'key201'))
+        batched = chs.hankel_J1(K,radii,'key201')
+        for (r,result) in zip(radii,batched):
+            expected = sum(funii(base/r)*weight for (base,weight) in zip(dlf201.base,dlf201.j1))/r
+            self.assertTrue(np.isclose(result,expected,rtol=1e-12,atol=0))
+
     def test_201_values(self):
         print('Check Key 201 filter values against empymod')
         from empymod.filters import key_201_2012
@@ -29,6 +55,38 @@ class Test_halfspace(unittest.TestCase):
         self.assertTrue(np.all(chs.Wab201[:,1]==dlf201.j0))
         self.assertTrue(np.all(chs.Wab201[:,2]==dlf201.j1))
 
+    def test_gamma_toeplitz(self):
+        print('Toeplitz-plus-Hankel Gamma assembly agrees with Gii/Gij loop')
+        gamma_args = {'frequency':freq,
+                      'background_conductivity':con,
+                      'outer_radius':outer_radius,
+                      'inner_radius':inner_radius,
+                      'casing_length':casing_length/10,
+                      'num_segments':num_segments//10}
+        G_toeplitz = chs.form_gamma_casing(assembly='toeplitz',**gamma_args)
+        G_loop = chs.form_gamma_casing(assembly='loop',**gamma_args)
+        self.assertTrue(np.allclose(G_toeplitz,G_loop,rtol=1e-9,atol=1e-20))
+
+    def test_frequency_sweep(self):
+        print('Frequency sweep agrees with form_A, form_b and solve at each frequency')
+        frequencies = [0.01,freq,10,1000]
+        casing_args = {'background_conductivity':con,
+                       'casing_conductivity':casing_con,
+                       'outer_radius':outer_radius,
+                       'inner_radius':inner_radius,
+                       'casing_length':casing_length,
+                       'num_segments':num_segments//5}
+        wire_path_x = np.array([0,1000])
+        wire_path_y = np.array([100,100])
+        A, b, j = chs.casing_currents_sweep(wire_path_x,wire_path_y,frequencies,
+                                            frequency_chunk=3,**casing_args)
+        for ifreq, frequency in enumerate(frequencies):
+            A_freq = chs.form_A(frequency=frequency,**casing_args)
+            b_freq = chs.form_b(wire_path_x,wire_path_y,frequency=frequency,**casing_args)
+            self.assertTrue(np.allclose(A[ifreq],A_freq,rtol=1e-12,atol=0))
+            self.assertTrue(np.allclose(b[ifreq],b_freq,rtol=1e-12,atol=0))
+            self.assertTrue(np.allclose(j[ifreq],np.linalg.solve(A_freq,b_freq),rtol=1e-10,atol=0))
+
     def test_intracasing_segment(self):
         print('VEB_Ez, Gij, and dipole agree for distant segments within one casing')
         zi = 52.5
@@ -112,6 +170,688 @@ class Test_halfspace(unittest.TestCase):
         self.assertTrue(np.isclose(epm_veb,chs_ved,rtol=1e-3,atol=1e-20))
         self.assertTrue(np.isclose(epm_veb*segment_length2,chs_veb,rtol=1e-3,atol=1e-20))
 
+    def test_VEB_Ez_analytic(self):
+        print('Analytic and quadrature casing-to-casing Gamma agree')
+        casing_args = {'frequency':freq,
+                       'background_conductivity':con,
+                       'outer_radius_1':outer_radius,
+                       'inner_radius_1':inner_radius,
+                       'outer_radius_2':outer_radius,
+                       'inner_radius_2':inner_radius,
+                       'both_interactions':True}
+        G12_analytic, G21_analytic = chs.form_gamma_casing_to_casing(
+            0,0,100,10,30,40,120,8,integration='analytic',**casing_args)
+        G12_quad, G21_quad = chs.form_gamma_casing_to_casing(
+            0,0,100,10,30,40,120,8,integration='quad',**casing_args)
+        self.assertTrue(np.allclose(G12_analytic,G12_quad,rtol=1e-8,atol=1e-20))
+        self.assertTrue(np.allclose(G21_analytic,G21_quad,rtol=1e-8,atol=1e-20))
+
+    def test_profile(self):
+        print('Profiling records calls only while enabled')
+        from em_casing import profiling
+        gamma_args = {'casing_length':casing_length/10,
+                      'num_segments':num_segments//10}
+        with chs.profile() as stats:
+            chs.form_A(**gamma_args)
+            chs.form_gamma_casing_to_casing(0,0,20,2,50,0,20,2,integration='quad')
+        self.assertEqual(stats.stats['form_A'][0],1)
+        self.assertEqual(stats.stats['complex_quad'][0],4)
+        self.assertTrue(stats.stats['complex_quad evaluations'][0]>0)
+        self.assertTrue('form_A' in stats.summary())
+        self.assertFalse(profiling.registry.enabled)
+        chs.form_A(**gamma_args)
+        self.assertEqual(stats.stats['form_A'][0],1)
+
+    def test_import_time(self):
+        print('Importing em_casing defers filters, scipy and empymod, and adds little startup time')
+        import json, os, subprocess, sys, time
+        modules = 'import em_casing.halfspace, em_casing.solvers, em_casing.halfspace_empymod\n'
+        script = ('import json, sys\n'+modules+
+                  'loaded = [m for m in ("em_casing.filters","scipy","empymod","tqdm") if m in sys.modules]\n'
+                  'print(json.dumps(loaded))\n')
+        package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable,'-c',script],capture_output=True,text=True,check=True,
+                                cwd=package_directory)
+        self.assertEqual(json.loads(output.stdout),[])
+        def startup_time(code):
+            # best of 3 fresh interpreters
+            times = []
+            for i in range(3):
+                start = time.perf_counter()
+                subprocess.run([sys.executable,'-c',code],check=True,cwd=package_directory)
+                times.append(time.perf_counter()-start)
+            return min(times)
+        # about 0.035 s over importing numpy alone; eagerly importing scipy.sparse.linalg
+        # or empymod would add about 0.45 s or 0.55 s
+        self.assertTrue(startup_time(modules)-startup_time('import numpy')<0.25)
+        self.assertTrue(np.all(chs.Wab201[:,0]==chs.dlf_filter('key201')[0]))
+        self.assertEqual(chs.W140.shape,(140,))
+
+    def test_parallel_many_casings(self):
+        print('Parallel and serial assembly of many casings agree')
+        casing_args = {'frequency':freq,
+                       'background_conductivities':con,
+                       'casing_lengths':casing_length/10,
+                       'nums_segments':num_segments//10}
+        xs = [0,50,400]
+        ys = [0,20,-100]
+        A_serial = chs.form_A_many_casings(xs,ys,**casing_args)
+        A_shared = chs.form_A_many_casings(xs,ys,n_workers=2,**casing_args)
+        A_pickled = chs.form_A_many_casings(xs,ys,n_workers=2,shared_memory=False,**casing_args)
+        self.assertTrue(np.array_equal(A_serial,A_shared))
+        # copied out of the released shared memory
+        self.assertTrue(A_shared.flags.owndata and A_shared.flags.writeable)
+        self.assertTrue(np.array_equal(A_serial,A_pickled))
+
+    def test_heterogeneous_many_casings(self):
+        print('Heterogeneous many-casing A agrees with block-by-block assembly')
+        xs = [0,60,300]
+        ys = [0,10,-50]
+        casing_lengths = [100,120,100]
+        nums_segments = [10,12,20]
+        outer_radii = [outer_radius,0.08,outer_radius]
+        inner_radii = [inner_radius,0.07,inner_radius]
+        A_full = chs.form_A_many_casings(xs,ys,
+                                         frequency=freq,
+                                         background_conductivities=con,
+                                         casing_lengths=casing_lengths,
+                                         nums_segments=nums_segments,
+                                         outer_radii=outer_radii,
+                                         inner_radii=inner_radii)
+        offsets = np.concatenate([[0],np.cumsum(nums_segments)])
+        for i1 in range(len(xs)):
+            rows = slice(offsets[i1],offsets[i1+1])
+            A_diag = chs.form_A(frequency=freq,
+                                background_conductivity=con,
+                                outer_radius=outer_radii[i1],
+                                inner_radius=inner_radii[i1],
+                                casing_length=casing_lengths[i1],
+                                num_segments=nums_segments[i1])
+            self.assertTrue(np.array_equal(A_full[rows,rows],A_diag))
+            for i2 in range(len(xs)):
+                if i1==i2:
+                    continue
+                columns = slice(offsets[i2],offsets[i2+1])
+                G = chs.form_gamma_casing_to_casing(xs[i1],ys[i1],casing_lengths[i1],nums_segments[i1],
+                                                    xs[i2],ys[i2],casing_lengths[i2],nums_segments[i2],
+                                                    frequency=freq,
+                                                    background_conductivity=con,
+                                                    outer_radius_1=outer_radii[i1],
+                                                    inner_radius_1=inner_radii[i1],
+                                                    outer_radius_2=outer_radii[i2],
+                                                    inner_radius_2=inner_radii[i2])
+                self.assertTrue(np.allclose(A_full[rows,columns],-G,rtol=1e-12,atol=0))
+
+
+    def test_segment_edges(self):
+        print('Gamma for non-uniform segments agrees with uniform and merged segments')
+        gamma_args = {'frequency':freq,
+                      'background_conductivity':con}
+        uniform_edges = np.linspace(0,casing_length,num_segments+1)
+        G = chs.form_gamma_casing(casing_length=casing_length,num_segments=num_segments,**gamma_args)
+        # relative to the largest element: far elements are differences of direct and image
+        # terms that cancel to about 1e-10 of it, so they agree to fewer digits
+        self.assertTrue(np.allclose(chs.form_gamma_casing(segment_edges=uniform_edges,**gamma_args),G,
+                                    rtol=0,atol=1e-11*abs(G).max()))
+        # merge pairs of segments: columns of merged segments are sums of columns
+        fine_edges = uniform_edges[:61]
+        coarse_edges = np.concatenate((fine_edges[:31],fine_edges[32:41:2],fine_edges[42:]))
+        G_fine = chs.gamma_casing_segments(fine_edges,**gamma_args)
+        G_coarse = chs.gamma_casing_segments(coarse_edges,**gamma_args)
+        unmerged = np.arange(30)
+        self.assertTrue(np.allclose(G_coarse[unmerged][:,unmerged],
+                                    G_fine[unmerged][:,unmerged],rtol=1e-12,atol=0))
+        self.assertTrue(np.allclose(G_coarse[unmerged,31],G_fine[unmerged,32]+G_fine[unmerged,33],
+                                    rtol=1e-12,atol=0))
+        graded_edges = chs.graded_segment_edges(casing_length,50,grading=0.8,lattice=800)
+        self.assertEqual(len(graded_edges),51)
+        self.assertTrue(np.diff(graded_edges)[0]<np.diff(graded_edges)[25])
+        with self.assertRaises(ValueError):
+            chs.graded_segment_edges(casing_length,50,grading=1,lattice=100)
+        b = chs.form_b(np.array([-500,800]),np.array([200,300]),segment_edges=graded_edges,**gamma_args)
+        zs = (graded_edges[:-1]+graded_edges[1:])/2
+        self.assertTrue(np.allclose(b,chs.HEB_Ez(0,0,zs,-500,800,200,300,
+                                                 conductivity=con,frequency=freq),
+                                    rtol=1e-12,atol=0))
+
+    def test_casing_currents_adaptive(self):
+        print('Adaptive refinement splits segments and returns a consistent solution')
+        casing_args = {'frequency':freq,
+                       'background_conductivity':con,
+                       'casing_length':casing_length}
+        wire_path_x = np.array([-500,800])
+        wire_path_y = np.array([200,300])
+        edges, j, converged = chs.casing_currents_adaptive(wire_path_x,wire_path_y,
+                                                           num_segments=10,rtol=0.1,
+                                                           **casing_args)
+        self.assertTrue(converged)
+        dz = np.diff(edges)
+        self.assertTrue(len(dz)>10)
+        self.assertTrue(dz.min()<dz.max())
+        j_direct = np.linalg.solve(chs.form_A(segment_edges=edges,**casing_args),
+                                   chs.form_b(wire_path_x,wire_path_y,segment_edges=edges,
+                                              **casing_args))
+        self.assertTrue(np.allclose(j,j_direct,rtol=1e-12,atol=0))
+        edges, j, converged = chs.casing_currents_adaptive(wire_path_x,wire_path_y,
+                                                           num_segments=10,rtol=1e-6,
+                                                           max_segments=40,**casing_args)
+        self.assertFalse(converged)
+        self.assertTrue(len(edges)-1<=40)
+
+    def test_form_b_segments(self):
+        print('RHS integrated along an L-shaped wire agrees with grounding-point RHS')
+        wire_path_x = np.array([-800,-800,600])
+        wire_path_y = np.array([-600,300,300])
+        b_args = {'frequency':np.array([freq,10]),
+                  'background_conductivity':con,
+                  'casing_length':casing_length,
+                  'num_segments':num_segments}
+        b_analytic = chs.form_b(wire_path_x,wire_path_y,**b_args)
+        b_segments = chs.form_b(wire_path_x,wire_path_y,method='segments',order=64,**b_args)
+        self.assertEqual(b_segments.shape,(2,num_segments))
+        self.assertTrue(np.allclose(b_segments,b_analytic,rtol=1e-10,atol=0))
+
+    def test_form_b_many_sources(self):
+        print('Batched RHS for many wires and casings agrees with single-wire RHS')
+        xp1 = np.array([-500,100,-1500])
+        yp1 = np.array([200,0,-700])
+        xp2 = np.array([800,2000,-100])
+        yp2 = np.array([300,0,400])
+        casing_args = {'casings_x':[0,150],
+                       'casings_y':[0,-40],
+                       'background_conductivities':con,
+                       'casing_lengths':[casing_length,1000],
+                       'nums_segments':[num_segments,100],
+                       'frequency':freq}
+        b_batch = chs.form_b_many_sources(xp1,yp1,xp2,yp2,wire_currents=[1,2,3],**casing_args)
+        self.assertEqual(b_batch.shape,(num_segments+100,3))
+        for ii in range(3):
+            b = chs.form_b_many_casings(np.array([xp1[ii],xp2[ii]]),np.array([yp1[ii],yp2[ii]]),
+                                        wire_current=ii+1,**casing_args)
+            self.assertTrue(np.allclose(b_batch[:,ii],b,rtol=1e-12,atol=0))
+        # each casing on its own, with the wire in coordinates centered on that casing
+        rows = [slice(0,num_segments),slice(num_segments,num_segments+100)]
+        for (casing,row) in enumerate(rows):
+            x = casing_args['casings_x'][casing]
+            y = casing_args['casings_y'][casing]
+            for ii in range(3):
+                b_single = chs.form_b_analytic(np.array([xp1[ii],xp2[ii]])-x,np.array([yp1[ii],yp2[ii]])-y,
+                                               wire_current=ii+1,frequency=freq,background_conductivity=con,
+                                               casing_length=casing_args['casing_lengths'][casing],
+                                               num_segments=casing_args['nums_segments'][casing])
+                self.assertTrue(np.allclose(b_batch[row,ii],b_single,rtol=1e-12,atol=0))
+
+
+class Test_solvers(unittest.TestCase):
+    def test_solve_casing_fft(self):
+        print('FFT-accelerated GMRES agrees with dense solve')
+        casing_args = {'frequency':freq,
+                       'background_conductivity':con,
+                       'casing_conductivity':casing_con,
+                       'outer_radius':outer_radius,
+                       'inner_radius':inner_radius,
+                       'casing_length':casing_length,
+                       'num_segments':num_segments}
+        A = chs.form_A(**casing_args)
+        b = chs.form_b(np.array([0,1000]),np.array([100,100]),**casing_args)
+        operator = solvers.casing_operator(**casing_args)[0]
+        x = np.linspace(-1,1,num_segments)+1j
+        self.assertTrue(np.allclose(operator.matvec(x),A.dot(x),rtol=1e-10,atol=0))
+        j_fft, stats = solvers.solve_casing_fft(b,rtol=1e-12,**casing_args)
+        self.assertEqual(stats['info'],0)
+        self.assertTrue(np.allclose(j_fft,np.linalg.solve(A,b),rtol=1e-8,atol=0))
+
+
+    def test_solve_many_casings(self):
+        print('Block-Jacobi preconditioned solves agree with dense solves for many casings')
+        casing_args = {'frequency':freq,
+                       'background_conductivities':con,
+                       'casing_lengths':1000,
+                       'nums_segments':[100,100,50]}
+        xs = [0,200,-150]
+        ys = [0,50,300]
+        A = chs.form_A_many_casings(xs,ys,**casing_args)
+        C = compression.form_A_many_casings_compressed(xs,ys,rtol=1e-10,**casing_args)
+        b = chs.form_b_many_casings(np.array([-500,800]),np.array([200,300]),xs,ys,
+                                    frequency=freq,
+                                    background_conductivities=con,
+                                    casing_lengths=1000,
+                                    nums_segments=[100,100,50])
+        j_dense = np.linalg.solve(A,b)
+        for method in ['gmres','bicgstab']:
+            j, stats = solvers.solve_many_casings(C,b,method=method,rtol=1e-10)
+            self.assertEqual(stats['info'],0)
+            self.assertTrue(stats['iterations']<20)
+            self.assertTrue(np.allclose(j,j_dense,rtol=1e-6,atol=0))
+        j, stats = solvers.solve_many_casings(A,b,casing_blocks=C.casing_blocks,rtol=1e-10)
+        self.assertEqual(stats['info'],0)
+        self.assertTrue(stats['residual_norm']<1e-9)
+        self.assertTrue(np.allclose(j,j_dense,rtol=1e-8,atol=0))
+        with self.assertRaises(ValueError):
+            solvers.solve_many_casings(A,b)
+
+
+class Test_model(unittest.TestCase):
+    def test_casing_model(self):
+        print('CasingModel batched solves agree with dense solves')
+        model_args = {'frequency':freq,
+                      'background_conductivity':con,
+                      'casing_length':casing_length,
+                      'num_segments':num_segments}
+        model = CasingModel(**model_args)
+        self.assertTrue(np.allclose(model.A,chs.form_A(**model_args),rtol=1e-12,atol=0))
+        wire_paths = [(np.array([-500,0,800]),np.array([200,250,300])),
+                      (np.array([100,2000]),np.array([0,0])),
+                      (np.array([-1500,-100]),np.array([-700,400]))]
+        j_batch = model.currents(wire_paths)
+        self.assertEqual(j_batch.shape,(num_segments,3))
+        for (ii,(wire_path_x,wire_path_y)) in enumerate(wire_paths):
+            j = np.linalg.solve(chs.form_A(**model_args),
+                                chs.form_b(wire_path_x,wire_path_y,**model_args))
+            self.assertTrue(np.allclose(j_batch[:,ii],j,rtol=1e-10,atol=0))
+        rx = np.linspace(50,2000,7)
+        ry = np.linspace(-300,300,7)
+        with self.assertRaises(ValueError):
+            model.casing_fields(wire_paths)
+        model.set_receivers(rx,ry,1e-3)
+        ex, ey = model.casing_fields(wire_paths)
+        Ex, Ey = chs.casing_e_field_matrix(rx,ry,1e-3,model.zs,conductivity=con,frequency=freq)
+        moments = j_batch*casing_area*segment_length
+        self.assertTrue(np.allclose(ex,Ex.dot(moments),rtol=1e-10,atol=0))
+        self.assertTrue(np.allclose(ey,Ey.dot(moments),rtol=1e-10,atol=0))
+        # wire fields of x- and y-directed point receivers, one bipole call per layout and direction
+        wire_fields = [np.stack([bipole(src=[x[:-1],x[1:],y[:-1],y[1:],1e-2,1e-2],
+                                        rec=[rx,ry,1e-3,azimuth,0],
+                                        depth=0,res=[2e14,1/con],freqtime=freq,
+                                        mrec=False,verb=0,squeeze=False)[0].sum(axis=-1)
+                                 for (x,y) in wire_paths],axis=-1)
+                       for azimuth in [0,90]]
+        ex_total, ey_total = model.total_fields(wire_paths,wire_fields)
+        self.assertTrue(np.allclose(ex_total,ex+wire_fields[0],rtol=1e-12,atol=0))
+        self.assertTrue(np.allclose(ey_total,ey+wire_fields[1],rtol=1e-12,atol=0))
+        with self.assertRaises(ValueError):
+            model.total_fields(wire_paths,(wire_fields[0][:,:2],wire_fields[1]))
+
+
+    def test_jacobian(self):
+        print('Adjoint Jacobian of CasingModel agrees with finite differences')
+        model_args = {'frequency':freq,
+                      'background_conductivity':con,
+                      'casing_length':1000,
+                      'num_segments':100}
+        wire_paths = [(np.array([-500,0,800]),np.array([200,250,300])),
+                      (np.array([100,2000]),np.array([0,0]))]
+        rx = np.linspace(50,2000,5)
+        ry = np.linspace(-300,300,5)
+        model = CasingModel(**model_args)
+        with self.assertRaises(ValueError):
+            model.jacobian(wire_paths)
+        model.set_receivers(rx,ry,1e-3)
+        derivatives = model.jacobian(wire_paths)
+        self.assertEqual(derivatives['segment_conductivity'].shape,(2,5,100,2))
+
+        def fields(**changes):
+            perturbed = CasingModel(**{**model_args,**changes})
+            perturbed.set_receivers(rx,ry,1e-3)
+            return np.array(perturbed.casing_fields(wire_paths))
+
+        for (name,value) in [('background_conductivity',con),('casing_conductivity',casing_con)]:
+            step = 1e-5*value
+            fd = (fields(**{name:value+step})-fields(**{name:value-step}))/(2*step)
+            self.assertTrue(np.allclose(derivatives[name],fd,rtol=1e-4,atol=1e-4*abs(fd).max()))
+        # one segment: perturb one diagonal element of A
+        k = 30
+        step = 1e-5*casing_con
+        fd = []
+        for sign in [1,-1]:
+            A = model.A.copy()
+            A[k,k] = 1/(casing_con+sign*step)-model.gamma[k,k]
+            j = np.linalg.solve(A,model.form_b(wire_paths))
+            fd.append(model.receiver_matrix.dot(model.moments(j)))
+        fd = (fd[0]-fd[1])/(2*step)
+        self.assertTrue(np.allclose(derivatives['segment_conductivity'][:,:,k],fd,
+                                    rtol=1e-4,atol=1e-4*abs(fd).max()))
+
+
+    def test_casing_profile(self):
+        print('Per-segment casing profiles: Woodbury updates agree with dense solves')
+        model_args = {'frequency':freq,
+                      'background_conductivity':con,
+                      'casing_length':1000,
+                      'num_segments':100}
+        # corroded interval: lower conductivity and half the area
+        conductivity = np.full(100,casing_con)
+        conductivity[40:45] = 0.3*casing_con
+        areas = np.full(100,casing_area)
+        areas[40:45] = casing_area/2
+        A = chs.form_A(casing_conductivity=conductivity,casing_areas=areas,**model_args)
+        A_uniform = chs.form_A(**model_args)
+        diagonal = np.diag(A-A_uniform)
+        self.assertTrue(np.allclose(diagonal[40:45],1/(0.15*casing_con)-1/casing_con,rtol=1e-12))
+        self.assertTrue(np.all(diagonal[:40]==0))
+        wire_paths = [(np.array([-500,0,800]),np.array([200,250,300])),
+                      (np.array([100,2000]),np.array([0,0]))]
+        model = CasingModel(**model_args)
+        b = model.form_b(wire_paths)
+        j = model.solve_profile(b,casing_conductivity=conductivity,casing_areas=areas)
+        self.assertTrue(np.allclose(j,np.linalg.solve(A,b),rtol=1e-10,atol=0))
+        self.assertTrue(np.allclose(model.A,A_uniform,rtol=1e-14,atol=0))
+        gamma = model.gamma
+        model.set_casing_profile(casing_conductivity=conductivity,casing_areas=areas)
+        self.assertIs(model.gamma,gamma)
+        self.assertTrue(np.allclose(model.A,A,rtol=1e-14,atol=0))
+        self.assertTrue(np.allclose(model.solve(b),j,rtol=1e-10,atol=0))
+        self.assertTrue(np.allclose(model.solve_profile(b,casing_conductivity=casing_con,
+                                                        casing_areas=np.full(100,casing_area)),
+                                    np.linalg.solve(A_uniform,b),rtol=1e-10,atol=0))
+        # fields with a profile: dense and FFT solves agree
+        rx = np.linspace(50,2000,5)
+        ry = np.linspace(-300,300,5)
+        fields = [che.wire_e_field_casing_halfspace(*wire_paths[0],
+                                                    [rx-5,rx+5,ry,ry,1e-3,1e-3],
+                                                    [rx,rx,ry-5,ry+5,1e-3,1e-3],
+                                                    freq,
+                                                    background_conductivity=con,
+                                                    casing_length=1000,
+                                                    num_segments=100,
+                                                    casing_conductivity=conductivity,
+                                                    casing_areas=areas,
+                                                    solver=solver,
+                                                    casing_method='analytic')
+                  for solver in ['dense','fft']]
+        for (field_dense,field_fft) in zip(*fields):
+            self.assertTrue(np.allclose(field_dense,field_fft,rtol=1e-7,atol=0))
+        # many casings with per-casing profiles, areas folded into an effective conductivity
+        A_many = chs.form_A_many_casings([0,300],[0,0],casing_lengths=1000,nums_segments=100,
+                                         casing_conductivities=[conductivity*areas/casing_area,casing_con])
+        self.assertTrue(np.allclose(A_many[:100,:100],A,rtol=1e-12,atol=0))
+        self.assertTrue(np.allclose(A_many[100:,100:],A_uniform,rtol=1e-12,atol=0))
+
+
+class Test_compression(unittest.TestCase):
+    def test_aca(self):
+        print('ACA recovers a low-rank matrix from sampled rows and columns')
+        rng = np.random.default_rng(0)
+        M = (rng.normal(size=(60,5))+1j*rng.normal(size=(60,5))).dot(rng.normal(size=(5,40)))
+        U, V = compression.aca(lambda i: M[i],lambda j: M[:,j],M.shape,rtol=1e-12)
+        self.assertEqual(U.shape[1],5)
+        self.assertTrue(np.allclose(U.dot(V),M,rtol=0,atol=1e-10*abs(M).max()))
+
+    def test_compressed_many_casings(self):
+        print('Compressed many-casing operator agrees with dense assembly and solves')
+        from scipy.sparse.linalg import gmres
+        casing_args = {'frequency':freq,
+                       'background_conductivities':[con,con,con,0.1],
+                       'casing_lengths':[1000,1000,800,1000],
+                       'nums_segments':[100,100,50,100]}
+        xs = [0,200,-150,50]
+        ys = [0,50,300,-400]
+        A = chs.form_A_many_casings(xs,ys,**casing_args)
+        C = compression.form_A_many_casings_compressed(xs,ys,rtol=1e-10,**casing_args)
+        off_diagonal = A.copy()
+        for block in C.casing_blocks:
+            off_diagonal[block,block] = 0
+        self.assertTrue(np.allclose(C.todense(),A,rtol=0,atol=1e-7*abs(off_diagonal).max()))
+        self.assertTrue(C.nbytes()<A.nbytes)
+        self.assertTrue(all(rank is not None and rank<50 for rank in C.ranks()))
+        b = chs.form_b_many_casings(np.array([-500,800]),np.array([200,300]),xs,ys,
+                                    frequency=freq,
+                                    background_conductivities=casing_args['background_conductivities'],
+                                    casing_lengths=casing_args['casing_lengths'],
+                                    nums_segments=casing_args['nums_segments'])
+        self.assertTrue(np.allclose(C.matvec(b),A.dot(b),rtol=1e-8,atol=0))
+        j, info = gmres(C.aslinearoperator(),b,rtol=1e-12,atol=0,restart=200)
+        self.assertEqual(info,0)
+        self.assertTrue(np.allclose(j,np.linalg.solve(A,b),rtol=1e-6,atol=0))
+
+
+class Test_transient(unittest.TestCase):
+    def test_transient(self):
+        print('Transient wire fields agree with empymod, and switch-on plus switch-off is constant')
+        from concurrent.futures import ThreadPoolExecutor
+        wire = (np.array([-500,0,800]),np.array([200,250,300]))
+        rx = np.linspace(100,1000,4)
+        rx_ex_locations = [rx-5,rx+5,0*rx,0*rx,1e-3,1e-3]
+        rx_ey_locations = [rx,rx,-5+0*rx,5+0*rx,1e-3,1e-3]
+        times = np.logspace(-3,0,4)
+        casing_args = {'background_conductivity':con,
+                       'casing_length':500,
+                       'num_segments':40}
+        times_out, fields = transient.wire_e_field_casing_halfspace_transient(
+            *wire,rx_ex_locations,rx_ey_locations,times,signal=-1,**casing_args)
+        self.assertTrue(np.allclose(times_out,times))
+        self.assertEqual(len(fields),6)
+        self.assertEqual(fields[0].shape,(len(times),len(rx)))
+        epm_wire = bipole(src=[wire[0][:-1],wire[0][1:],wire[1][:-1],wire[1][1:],1e-2,1e-2],
+                          rec=rx_ex_locations,
+                          depth=[0],
+                          res=[1e20,1/con],
+                          freqtime=times,
+                          signal=-1,
+                          verb=0,
+                          epermH=[0,1],
+                          epermV=[0,1])
+        epm_wire = np.dot(epm_wire,np.hypot(np.diff(wire[0]),np.diff(wire[1])))
+        self.assertTrue(np.allclose(fields[2],epm_wire,rtol=1e-10,atol=1e-10*abs(epm_wire).max()))
+        self.assertTrue(np.allclose(fields[0],fields[2]+fields[4]))
+        # switch-on plus switch-off response is the DC response at all times
+        j_on = transient.casing_currents_transient(*wire,times,signal=1,**casing_args)[1]
+        with ThreadPoolExecutor(2) as executor:
+            j_off = transient.casing_currents_transient(*wire,times,signal=-1,executor=executor,
+                                                        **casing_args)[1]
+        j_dc = j_on+j_off
+        self.assertTrue(np.allclose(j_dc,j_dc[0],rtol=0,atol=2e-5*abs(j_dc).max()))
+        self.assertTrue(abs(j_on[0]).max()<1e-4*abs(j_off[0]).max())
+
+
+class Test_cache(unittest.TestCase):
+    def test_matrix_cache(self):
+        print('Cached form_A agrees with form_A, and cache evicts least recently used')
+        import os, tempfile
+        casing_args = {'frequency':freq,
+                       'background_conductivity':con,
+                       'casing_conductivity':casing_con,
+                       'outer_radius':outer_radius,
+                       'inner_radius':inner_radius,
+                       'casing_length':casing_length/10,
+                       'num_segments':num_segments//10}
+        matrix_bytes = 16*casing_args['num_segments']**2
+        with tempfile.TemporaryDirectory() as directory:
+            cache = MatrixCache(directory,max_bytes=2*matrix_bytes+1000)
+            A = chs.form_A(**casing_args)
+            self.assertTrue(np.array_equal(chs.form_A(cache=cache,**casing_args),A))
+            self.assertEqual(len(cache.files()),1)
+            # loaded from cache
+            self.assertTrue(np.array_equal(chs.form_A(cache=cache,**casing_args),A))
+            self.assertEqual(len(cache.files()),1)
+            gamma_args = {key:casing_args[key] for key in ['frequency','background_conductivity','outer_radius',
+                                                             'inner_radius','casing_length','num_segments']}
+            G = chs.form_gamma_casing(cache=cache,**gamma_args)
+            self.assertTrue(G.flags.writeable and not isinstance(G,np.memmap))
+            key = os.path.basename(cache.files()[0][0])[:-len('.npy')]
+            G = MatrixCache(directory,mmap_mode='r').load(key)
+            self.assertTrue(isinstance(G,np.memmap) and not G.flags.writeable)
+            # fill over the size cap
+            for frequency in [1,10]:
+                chs.form_A(cache=cache,**dict(casing_args,frequency=frequency))
+            self.assertEqual(len(cache.files()),2)
+            self.assertTrue(cache.size()<=cache.max_bytes)
+
+    def test_kernel_memo(self):
+        print('Memoized Gij agrees with direct evaluation and counts hits and misses')
+        from em_casing.cache import KernelMemo
+        memo = KernelMemo(maxsize=2)
+        import inspect
+        Gij_unwrapped = inspect.unwrap(chs.Gij)
+        Gij = memo(Gij_unwrapped)
+        gij_args = {'frequency':freq,'background_conductivity':con}
+        direct = Gij_unwrapped(52.5,1352.5,5,**gij_args)
+        self.assertEqual(Gij(52.5,1352.5,5,**gij_args),direct)
+        self.assertEqual(Gij(52.5,1352.5+1e-14,5,**gij_args),direct)
+        self.assertEqual(memo.info()['hits'],1)
+        self.assertEqual(memo.info()['misses'],1)
+        Gij(57.5,1352.5,5,**gij_args)
+        Gij(62.5,1352.5,5,**gij_args)
+        self.assertEqual(memo.info()['size'],2)
+        # first entry was evicted
+        Gij(52.5,1352.5,5,**gij_args)
+        self.assertEqual(memo.info()['misses'],4)
+
+    def test_toeplitz_kernel_memo(self):
+        print('Toeplitz/Hankel kernels are memoized per frequency once kernel_memo is enabled')
+        casing_args = {'background_conductivity':con,
+                       'casing_length':1000,
+                       'num_segments':50}
+        # off by default
+        self.assertEqual(chs.kernel_memo.maxsize,0)
+        A_direct = chs.form_A(frequency=10,**casing_args)
+        self.assertEqual(chs.kernel_memo.info()['size'],0)
+        chs.kernel_memo.clear()
+        chs.kernel_memo.resize(256)
+        try:
+            A = chs.form_A(frequency=freq,**casing_args)
+            self.assertEqual(chs.kernel_memo.info()['misses'],1)
+            self.assertTrue(np.array_equal(chs.form_A(frequency=freq,**casing_args),A))
+            self.assertEqual(chs.kernel_memo.info()['hits'],1)
+            # a sweep only computes the frequencies it has not seen
+            frequencies = [freq,1,10]
+            A_sweep = chs.casing_currents_sweep(np.array([-500,800]),np.array([200,300]),
+                                                frequencies,**casing_args)[0]
+            self.assertEqual(chs.kernel_memo.info()['misses'],3)
+        finally:
+            chs.kernel_memo.resize(0)
+            chs.kernel_memo.clear()
+        self.assertTrue(np.array_equal(A_sweep[0],A))
+        self.assertTrue(np.array_equal(A_sweep[2],A_direct))
+
+
+class Test_halfspace_empymod(unittest.TestCase):
+    def test_casing_field(self):
+        print('Batched casing field agrees with one dipole per casing segment')
+        rx = np.linspace(50,2000,5)
+        ry = np.linspace(-300,300,5)
+        rx_ex_locations = [rx-5,rx+5,ry,ry,1e-3,1e-3]
+        rx_ey_locations = [rx,rx,ry-5,ry+5,1e-3,1e-3]
+        num_segments_field = 40
+        fields = che.wire_e_field_casing_halfspace(np.array([-500,0,800]),
+                                                   np.array([200,250,300]),
+                                                   rx_ex_locations,
+                                                   rx_ey_locations,
+                                                   freq,
+                                                   background_conductivity=con,
+                                                   casing_length=casing_length,
+                                                   num_segments=num_segments_field)
+        field_x_casing, field_y_casing = fields[4:]
+        casing_args = {'frequency':freq,
+                       'background_conductivity':con,
+                       'casing_length':casing_length,
+                       'num_segments':num_segments_field}
+        j_casing = np.linalg.solve(chs.form_A(**casing_args),
+                                   chs.form_b(np.array([-500,0,800]),np.array([200,250,300]),
+                                              **casing_args))
+        dz = casing_length/num_segments_field
+        zs = dz*(np.arange(num_segments_field)+0.5)
+        casing_moment = j_casing*np.pi*(0.1095**2-(0.1095-0.0134)**2)*dz
+        dipole_args = {'depth':[0],
+                       'res':[1e20,1/con],
+                       'freqtime':freq,
+                       'verb':0,
+                       'epermH':[0,1],
+                       'epermV':[0,1]}
+        field_x = np.array([dipole([0,0,z],[rx,ry,1e-3],ab=13,**dipole_args) for z in zs]).T
+        field_y = np.array([dipole([0,0,z],[rx,ry,1e-3],ab=23,**dipole_args) for z in zs]).T
+        self.assertTrue(np.allclose(field_x.dot(casing_moment),field_x_casing,rtol=1e-10,atol=0))
+        self.assertTrue(np.allclose(field_y.dot(casing_moment),field_y_casing,rtol=1e-10,atol=0))
+
+
+    def test_casing_field_analytic(self):
+        print('Closed-form casing segment fields agree with empymod')
+        rx = np.linspace(50,2000,5)
+        ry = np.linspace(-300,300,5)
+        zs = np.array([100,500,900])
+        Ex, Ey = chs.casing_e_field_matrix(rx,ry,1e-3,zs,conductivity=con,frequency=freq)
+        dipole_args = {'depth':[0],
+                       'res':[1e20,1/con],
+                       'freqtime':freq,
+                       'verb':0,
+                       'epermH':[0,1],
+                       'epermV':[0,1]}
+        field_x = np.array([dipole([0,0,z],[rx,ry,1e-3],ab=13,**dipole_args) for z in zs]).T
+        field_y = np.array([dipole([0,0,z],[rx,ry,1e-3],ab=23,**dipole_args) for z in zs]).T
+        self.assertTrue(np.allclose(Ex,field_x,rtol=1e-8,atol=0))
+        self.assertTrue(np.allclose(Ey,field_y,rtol=1e-8,atol=0))
+        # bipoles agree with Gauss-Legendre integration of dipoles
+        dz = 40
+        Ex_bipole, Ey_bipole = chs.casing_e_field_matrix(rx,ry,1e-3,zs,dz=dz,
+                                                         conductivity=con,frequency=freq)
+        nodes, weights = np.polynomial.legendre.leggauss(20)
+        Ex_quad = sum(w/2*chs.casing_e_field_matrix(rx,ry,1e-3,zs+n*dz/2,
+                                                    conductivity=con,frequency=freq)[0]
+                      for (n,w) in zip(nodes,weights))
+        self.assertTrue(np.allclose(Ex_bipole,Ex_quad,rtol=1e-10,atol=0))
+        # fields from a wire and casing
+        rx_ex_locations = [rx-5,rx+5,ry,ry,1e-3,1e-3]
+        rx_ey_locations = [rx,rx,ry-5,ry+5,1e-3,1e-3]
+        fields = [che.wire_e_field_casing_halfspace(np.array([-500,0,800]),np.array([200,250,300]),
+                                                    rx_ex_locations,rx_ey_locations,freq,
+                                                    background_conductivity=con,
+                                                    num_segments=40,
+                                                    casing_method=method)
+                  for method in ['empymod','analytic']]
+        for (field_empymod,field_analytic) in zip(*fields):
+            self.assertTrue(np.allclose(field_empymod,field_analytic,rtol=1e-8,atol=0))
+
+    def test_casing_h_field(self):
+        print('Closed-form casing segment magnetic fields agree with empymod')
+        rx = np.linspace(50,2000,5)
+        ry = np.linspace(-300,300,5)
+        zs = np.array([100,500,900])
+        Hx, Hy, Hz = chs.casing_h_field_matrix(rx,ry,300,zs,conductivity=con,frequency=freq)
+        dipole_args = {'depth':[0],
+                       'res':[1e20,1/con],
+                       'freqtime':freq,
+                       'verb':0,
+                       'epermH':[0,1],
+                       'epermV':[0,1]}
+        field_x = np.array([dipole([0,0,z],[rx,ry,300],ab=43,**dipole_args) for z in zs]).T
+        field_y = np.array([dipole([0,0,z],[rx,ry,300],ab=53,**dipole_args) for z in zs]).T
+        self.assertTrue(np.allclose(Hx,field_x,rtol=1e-8,atol=0))
+        self.assertTrue(np.allclose(Hy,field_y,rtol=1e-8,atol=0))
+        self.assertTrue(np.all(Hz==0))
+        # fields from a wire and casing
+        fields = [che.wire_h_field_casing_halfspace(np.array([-500,0,800]),np.array([200,250,300]),
+                                                    [rx,ry,300],freq,
+                                                    background_conductivity=con,
+                                                    num_segments=40,
+                                                    casing_method=method)
+                  for method in ['empymod','analytic']]
+        for (field_empymod,field_analytic) in zip(*fields):
+            self.assertTrue(np.allclose(field_empymod,field_analytic,rtol=1e-8,atol=1e-20))
+
+    def test_casing_field_chunks(self):
+        print('Chunked fields written to a memmap agree with unchunked fields')
+        import os, tempfile
+        rx = np.linspace(50,2000,23)
+        ry = np.linspace(-300,300,23)
+        rx_ex_locations = [rx-5,rx+5,ry,ry,1e-3,1e-3]
+        rx_ey_locations = [rx,rx,ry-5,ry+5,1e-3,1e-3]
+        field_args = {'background_conductivity':con,
+                      'casing_length':casing_length,
+                      'num_segments':40}
+        wire = (np.array([-500,0,800]),np.array([200,250,300]))
+        field_x, field_y = che.wire_e_field_casing_halfspace(*wire,rx_ex_locations,rx_ey_locations,
+                                                             freq,**field_args)[:2]
+        with tempfile.TemporaryDirectory() as directory:
+            out = np.lib.format.open_memmap(os.path.join(directory,'fields.npy'),mode='w+',
+                                            dtype=complex,shape=(2,len(rx)))
+            chunks = list(che.wire_e_field_casing_halfspace_chunks(*wire,rx_ex_locations,rx_ey_locations,
+                                                                   freq,chunk_size=10,out=out,
+                                                                   **field_args))
+            self.assertEqual([c[0] for c in chunks],[slice(0,10),slice(10,20),slice(20,23)])
+            self.assertTrue(np.allclose(out[0],field_x,rtol=1e-12,atol=0))
+            self.assertTrue(np.allclose(out[1],field_y,rtol=1e-12,atol=0))
+            self.assertTrue(np.allclose(chunks[1][2],field_y[10:20],rtol=1e-12,atol=0))
+            del out
 
 if __name__ == '__main__':
   unittest.main()